@@ -0,0 +1,202 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from posts.models import ArchivedPost, Follow, Group, Post, User
+
+from .serializers import POST_FIELDS, ApiError, post_rows
+
+# в кэше пост хранится без автора и группы: имя, видимость и slug берутся
+# из своих записей, чтобы переименование и удаление не ждали истечения кэша
+POST_CACHE_FIELDS = tuple(
+    name for name in POST_FIELDS if name not in ('author', 'group')
+)
+USER_COLUMNS = ('id', 'username', 'first_name', 'last_name', 'is_active')
+
+
+def post_key(post_id):
+    return f'api:batch:post:{post_id}'
+
+
+def user_key(user_id):
+    return f'api:batch:user:{user_id}'
+
+
+def username_key(username):
+    return f'api:batch:username:{username}'
+
+
+def group_key(group_id):
+    return f'api:batch:group:{group_id}'
+
+
+def parse_ids(value):
+    try:
+        ids = [int(item) for item in value.split(',') if item.strip()]
+    except ValueError:
+        raise ApiError('posts: список id через запятую')
+    return list(dict.fromkeys(ids))
+
+
+def parse_names(value):
+    return list(dict.fromkeys(
+        item.strip() for item in value.split(',') if item.strip()
+    ))
+
+
+def check_size(*groups):
+    if sum(len(group) for group in groups) > settings.API_BATCH_LIMIT:
+        raise ApiError(
+            f'Не больше {settings.API_BATCH_LIMIT} объектов за запрос'
+        )
+
+
+def cached(keys, load):
+    """
+    get_many по ключам, промахи - одним запросом через load(пропущенные),
+    который возвращает {ключ: значение}; найденное кладётся в кэш.
+    """
+    found = cache.get_many(list(keys))
+    missing = [key for key in keys if key not in found]
+    if missing:
+        loaded = load(missing)
+        if loaded:
+            cache.set_many(loaded, settings.API_BATCH_CACHE_SECONDS)
+        found.update(loaded)
+    return found
+
+
+def load_posts(ids):
+    """Посты по id: горячая таблица одним IN, недостающие - из архива."""
+    def load(keys):
+        wanted = {int(key.rsplit(':', 1)[1]) for key in keys}
+        loaded = {}
+        for model in (Post, ArchivedPost):
+            if not wanted:
+                break
+            rows = post_rows(
+                model.objects.filter(pk__in=wanted),
+                POST_CACHE_FIELDS,
+                extra=('author_id', 'group_id'),
+            )
+            for _, item in rows:
+                loaded[post_key(item['id'])] = item
+                wanted.discard(item['id'])
+        return loaded
+
+    found = cached([post_key(post_id) for post_id in ids], load)
+    return {
+        post_id: found[post_key(post_id)]
+        for post_id in ids if post_key(post_id) in found
+    }
+
+
+def user_record(row):
+    return {
+        'id': row['id'],
+        'username': row['username'],
+        'full_name': f"{row['first_name']} {row['last_name']}".strip(),
+        'is_active': row['is_active'],
+    }
+
+
+def load_users_by_id(ids):
+    def load(keys):
+        wanted = [int(key.rsplit(':', 1)[1]) for key in keys]
+        return {
+            user_key(row['id']): user_record(row)
+            for row in User.objects.filter(pk__in=wanted).values(
+                *USER_COLUMNS
+            )
+        }
+
+    found = cached([user_key(user_id) for user_id in ids], load)
+    return {
+        user['id']: user for user in found.values() if user['is_active']
+    }
+
+
+def load_users_by_name(names):
+    def load(keys):
+        wanted = [key.split(':', 3)[3] for key in keys]
+        return {
+            username_key(row['username']): user_record(row)
+            for row in User.objects.filter(username__in=wanted).values(
+                *USER_COLUMNS
+            )
+        }
+
+    found = cached([username_key(name) for name in names], load)
+    return {
+        user['username']: user
+        for user in found.values() if user['is_active']
+    }
+
+
+def load_group_slugs(ids):
+    def load(keys):
+        wanted = [int(key.rsplit(':', 1)[1]) for key in keys]
+        return {
+            group_key(group_id): slug
+            for group_id, slug in Group.objects.filter(
+                pk__in=wanted
+            ).values_list('id', 'slug')
+        }
+
+    found = cached([group_key(group_id) for group_id in ids], load)
+    return {
+        group_id: found[group_key(group_id)]
+        for group_id in ids if group_key(group_id) in found
+    }
+
+
+def followed(viewer, author_ids):
+    """Подписки зрителя на авторов одним IN, без кэша: они у каждого свои."""
+    if not viewer.is_authenticated or not author_ids:
+        return set()
+    return set(Follow.objects.filter(
+        user=viewer, author_id__in=author_ids
+    ).values_list('author_id', flat=True))
+
+
+def resolve(viewer, post_ids, usernames, fields):
+    posts = load_posts(post_ids)
+    authors = load_users_by_id({post['author_id'] for post in posts.values()})
+    groups = load_group_slugs({
+        post['group_id'] for post in posts.values()
+        if post['group_id'] is not None
+    }) if 'group' in fields else {}
+    users = load_users_by_name(usernames)
+    following = followed(
+        viewer, set(authors) | {user['id'] for user in users.values()}
+    )
+    known = viewer.is_authenticated
+    result = {'posts': [], 'users': [], 'missing': {'posts': [], 'users': []}}
+    for post_id in post_ids:
+        post = posts.get(post_id)
+        author = post and authors.get(post['author_id'])
+        if author is None:
+            result['missing']['posts'].append(post_id)
+            continue
+        item = {}
+        for name in fields:
+            if name == 'author':
+                item[name] = author['username']
+            elif name == 'group':
+                item[name] = groups.get(post['group_id'])
+            else:
+                item[name] = post[name]
+        item['following'] = (
+            post['author_id'] in following if known else None
+        )
+        result['posts'].append(item)
+    for username in usernames:
+        user = users.get(username)
+        if user is None:
+            result['missing']['users'].append(username)
+            continue
+        result['users'].append({
+            'username': user['username'],
+            'full_name': user['full_name'],
+            'following': user['id'] in following if known else None,
+        })
+    return result
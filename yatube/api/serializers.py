@@ -0,0 +1,165 @@
+import base64
+import binascii
+import heapq
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from posts.models import ArchivedPost, Comment, unpack_text
+
+# поле ответа -> столбец values() горячей и архивной таблиц
+POST_FIELDS = {
+    'id': ('id', 'id'),
+    'text': ('text', 'body'),
+    'pub_date': ('pub_date', 'pub_date'),
+    'updated': ('updated', 'archived'),
+    'author': ('author__username', 'author__username'),
+    'group': ('group__slug', 'group__slug'),
+    'image': ('image', 'image'),
+}
+ORDERING = ('-pub_date', '-id')
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 1000
+
+
+class ApiError(ValueError):
+    """Ошибка параметров запроса, отдаётся клиенту как 400."""
+
+
+def parse_fields(value):
+    if not value:
+        return tuple(POST_FIELDS)
+    fields = tuple(dict.fromkeys(
+        name.strip() for name in value.split(',') if name.strip()
+    ))
+    unknown = [name for name in fields if name not in POST_FIELDS]
+    if unknown or not fields:
+        raise ApiError(
+            'Неизвестные поля: {}; доступны: {}'.format(
+                ', '.join(unknown), ', '.join(POST_FIELDS)
+            )
+        )
+    return fields
+
+
+def parse_limit(value):
+    if not value:
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ApiError('limit должен быть числом')
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ApiError(f'limit должен быть от 1 до {MAX_LIMIT}')
+    return limit
+
+
+def encode_cursor(pub_date, pk):
+    raw = f'{pub_date.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+        pub_date, pk = raw.decode().split('|')
+        cursor = parse_datetime(pub_date), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        cursor = None, None
+    if cursor[0] is None:
+        raise ApiError('Некорректный cursor')
+    return cursor
+
+
+def after(queryset, cursor):
+    """Посты строго старше курсора в порядке (-pub_date, -id)."""
+    if cursor is None:
+        return queryset
+    pub_date, pk = cursor
+    return queryset.filter(
+        Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+    )
+
+
+def post_rows(queryset, fields, extra=()):
+    """
+    Словари полей без создания экземпляров моделей. Первым элементом
+    идёт ключ сортировки, чтобы слить горячую и архивную ленты; столбцы
+    extra попадают в словарь как есть.
+    """
+    archived = queryset.model is ArchivedPost
+    columns = {
+        POST_FIELDS[name][archived] for name in fields
+    } | {'id', 'pub_date'} | set(extra)
+    if archived and 'text' in fields:
+        columns.add('compressed')
+    for row in queryset.values(*columns).iterator():
+        item = {}
+        for name in fields:
+            value = row[POST_FIELDS[name][archived]]
+            if name == 'text' and archived:
+                value = unpack_text(value, row['compressed'])
+            elif name == 'image':
+                value = settings.MEDIA_URL + value if value else None
+            item[name] = value
+        for column in extra:
+            item[column] = row[column]
+        yield (row['pub_date'], row['id']), item
+
+
+def feed_items(querysets, fields, limit, cursor):
+    """Не больше limit + 1 постов из всех таблиц ленты, новые первыми."""
+    sources = [
+        post_rows(after(queryset, cursor).order_by(*ORDERING)[:limit + 1],
+                  fields)
+        for queryset in querysets
+    ]
+    merged = heapq.merge(*sources, key=lambda pair: pair[0], reverse=True)
+    for number, pair in enumerate(merged):
+        if number > limit:
+            return
+        yield pair
+
+
+def stream_feed(querysets, fields, limit, cursor):
+    """
+    Отдаёт страницу кусками: посты сериализуются по одному по мере чтения
+    из базы, ссылка на следующую страницу пишется последней.
+    """
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    yield '{"results": ['
+    last_key = None
+    has_next = False
+    for number, (key, item) in enumerate(
+        feed_items(querysets, fields, limit, cursor)
+    ):
+        if number == limit:
+            has_next = True
+            break
+        yield (',' if number else '') + encoder.encode(item)
+        last_key = key
+    next_cursor = encode_cursor(*last_key) if has_next else None
+    yield '], "next": ' + json.dumps(next_cursor) + '}'
+
+
+def comment_rows(queryset):
+    archived = queryset.model is not Comment
+    columns = ['id', 'author__username', 'created']
+    columns += ['body', 'compressed'] if archived else ['text']
+    for row in queryset.order_by('created', 'id').values(
+        *columns
+    ).iterator():
+        yield {
+            'id': row['id'],
+            'author': row['author__username'],
+            'text': (
+                unpack_text(row['body'], row['compressed'])
+                if archived else row['text']
+            ),
+            'created': row['created'],
+        }
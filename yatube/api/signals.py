@@ -0,0 +1,43 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from posts.models import ArchivedPost, Group, Post, User
+
+from .batch import group_key, post_key, user_key, username_key
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=ArchivedPost)
+def forget_post(sender, instance, **kwargs):
+    cache.delete(post_key(instance.pk))
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, update_fields=None, **kwargs):
+    """Прежнее имя нужно, чтобы после переименования сбросить его ключ."""
+    if instance.pk is None or (
+        update_fields is not None and 'username' not in update_fields
+    ):
+        return
+    instance._batch_old_username = User.objects.filter(
+        pk=instance.pk
+    ).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_user(sender, instance, **kwargs):
+    keys = [user_key(instance.pk), username_key(instance.username)]
+    old_username = getattr(instance, '_batch_old_username', None)
+    if old_username:
+        keys.append(username_key(old_username))
+    cache.delete_many(keys)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def forget_group(sender, instance, **kwargs):
+    # посты в кэше хранят только group_id, slug берётся по этому ключу
+    cache.delete(group_key(instance.pk))
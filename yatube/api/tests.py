@@ -0,0 +1,290 @@
+import json
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.signals import post_init
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.archive import archive_posts, get_cutoff
+from posts.deletion import delete_group, hide_user
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ApiTestClass(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='api', description='Описание'
+        )
+        self.posts = []
+        for number in range(7):
+            post = Post.objects.create(
+                author=self.author, group=self.group, text=f'Пост {number}'
+            )
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=timezone.now() - timedelta(days=400 - number)
+            )
+            self.posts.append(post)
+        self.newest = Post.objects.create(author=self.author, text='Новый')
+        Comment.objects.create(
+            post=self.posts[0], author=self.reader, text='Комментарий'
+        )
+        self.client = Client()
+
+    def get_json(self, url, **params):
+        response = self.client.get(url, params)
+        return response, json.loads(b''.join(response.streaming_content)
+                                    if response.streaming
+                                    else response.content)
+
+    def collect(self, url, **params):
+        ids, cursor = [], None
+        while True:
+            if cursor:
+                params['cursor'] = cursor
+            response, data = self.get_json(url, **params)
+            self.assertEqual(response.status_code, 200)
+            ids += [item['id'] for item in data['results']]
+            cursor = data['next']
+            if cursor is None:
+                return ids
+
+    def test_cursor_paging_over_hot_and_archive(self):
+        """Курсор проходит горячую и архивную таблицы без пропусков"""
+        self.assertEqual(archive_posts(get_cutoff(397)), (4, 1))
+        expected = [self.newest.id] + [
+            post.id for post in reversed(self.posts)
+        ]
+        url = reverse('api:profile', args=(self.author.username,))
+        self.assertEqual(self.collect(url, limit=3), expected)
+        url = reverse('api:group_posts', args=(self.group.slug,))
+        self.assertEqual(self.collect(url, limit=2), expected[1:])
+
+    def test_sparse_fields_without_model_instances(self):
+        """fields= ограничивает ответ, экземпляры моделей не создаются"""
+        created = []
+
+        def count(sender, **kwargs):
+            created.append(sender)
+
+        post_init.connect(count, sender=Post)
+        self.addCleanup(post_init.disconnect, count, sender=Post)
+        response, data = self.get_json(
+            reverse('api:index'), fields='id,author', limit=2
+        )
+        self.assertEqual(
+            data['results'][0], {'id': self.newest.id, 'author': 'author'}
+        )
+        self.assertEqual(created, [])
+        response, data = self.get_json(reverse('api:index'), fields='secret')
+        self.assertEqual(response.status_code, 400)
+
+    def test_etag(self):
+        """Повторный запрос с ETag получает 304, другие поля - новый ETag"""
+        url = reverse('api:index')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            url, {'fields': 'id'}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_cheap_validator(self):
+        """
+        ETag ленты без COUNT и без соединения с авторами, группа ищется
+        один раз, а 304 отдаётся без выборки постов
+        """
+        url = reverse('api:group_posts', args=(self.group.slug,))
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        statements = [query['sql'] for query in queries]
+        self.assertEqual(
+            [sql for sql in statements if 'FROM "posts_group"' in sql
+             and 'WHERE "posts_group"."slug"' in sql], statements[:1]
+        )
+        for sql in statements:
+            self.assertNotIn('COUNT(', sql)
+            self.assertNotIn('auth_user', sql)
+
+    def test_validator_follows_changes(self):
+        """Удаление поста, скрытие автора и подписка меняют ETag"""
+        self.client.force_login(self.reader)
+        urls = (reverse('api:index'), reverse('api:follow'))
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.client.get(
+            urls[1], HTTP_IF_NONE_MATCH=etags[urls[1]]
+        )
+        self.assertEqual(response.status_code, 200)
+        self.posts[0].delete()
+        response = self.client.get(
+            urls[0], HTTP_IF_NONE_MATCH=etags[urls[0]]
+        )
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        hide_user(self.author)
+        response = self.client.get(urls[0], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_follow_feed(self):
+        """Лента подписок требует входа"""
+        response, data = self.get_json(reverse('api:follow'))
+        self.assertEqual(response.status_code, 401)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.reader)
+        self.assertEqual(len(self.collect(reverse('api:follow'))), 8)
+
+    def test_post_detail(self):
+        """Пост с комментариями читается и из архива, 404 - JSON"""
+        archive_posts(get_cutoff(365))
+        response, data = self.get_json(
+            reverse('api:post_detail', args=(self.posts[0].id,)),
+            fields='text',
+        )
+        self.assertEqual(data['post'], {'text': 'Пост 0'})
+        self.assertEqual(data['comments'][0]['text'], 'Комментарий')
+        response, data = self.get_json(
+            reverse('api:post_detail', args=(10 ** 6,))
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('error', data)
+
+
+class BatchApiTestClass(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        self.other = User.objects.create_user(username='other')
+        self.reader = User.objects.create_user(username='reader')
+        self.post = Post.objects.create(author=self.author, text='Первый')
+        self.other_post = Post.objects.create(author=self.other, text='Второй')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.url = reverse('api:batch')
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def batch(self, **params):
+        response = self.client.get(self.url, params)
+        return response, json.loads(response.content)
+
+    def test_posts_and_users_with_follow_status(self):
+        """Посты и пользователи приходят вместе с подпиской зрителя."""
+        response, data = self.batch(
+            posts=f'{self.post.pk},{self.other_post.pk},999',
+            users='author,other,nobody',
+            fields='id,text,author',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(data['posts'], [
+            {'id': self.post.pk, 'text': 'Первый', 'author': 'author',
+             'following': True},
+            {'id': self.other_post.pk, 'text': 'Второй', 'author': 'other',
+             'following': False},
+        ])
+        self.assertEqual(data['users'], [
+            {'username': 'author', 'full_name': 'Лев Толстой',
+             'following': True},
+            {'username': 'other', 'full_name': '', 'following': False},
+        ])
+        self.assertEqual(
+            data['missing'], {'posts': [999], 'users': ['nobody']}
+        )
+
+    def test_anonymous_has_no_follow_status(self):
+        """У анонима поле following равно null."""
+        self.client.logout()
+        _, data = self.batch(posts=str(self.post.pk), users='author')
+        self.assertIsNone(data['posts'][0]['following'])
+        self.assertIsNone(data['users'][0]['following'])
+
+    def test_queries_cold_and_warm(self):
+        """
+        Холодный кэш - по одному IN на посты, авторов, пользователей и
+        подписки; прогретый - только подписки. Ещё два запроса - сессия
+        и пользователь сессии.
+        """
+        params = {
+            'posts': f'{self.post.pk},{self.other_post.pk}',
+            'users': 'author,other',
+        }
+        self.batch(**params)
+        with self.assertNumQueries(3):
+            _, data = self.batch(**params)
+        self.assertEqual(len(data['posts']), 2)
+        cache.clear()
+        # сессия, пользователь сессии, посты, авторы, имена, подписки
+        with self.assertNumQueries(6):
+            self.batch(**params)
+
+    def test_archived_post(self):
+        """Пост из архива отдаётся тем же запросом."""
+        Post.objects.filter(pk=self.post.pk).update(
+            pub_date=timezone.now() - timedelta(days=400)
+        )
+        archive_posts(get_cutoff(365))
+        _, data = self.batch(posts=str(self.post.pk), fields='id,text')
+        self.assertEqual(data['posts'], [
+            {'id': self.post.pk, 'text': 'Первый', 'following': True}
+        ])
+
+    def test_invalidation(self):
+        """Правка поста и скрытие автора сбрасывают кэш."""
+        params = {'posts': str(self.post.pk), 'fields': 'text'}
+        self.batch(**params)
+        self.post.text = 'Исправленный'
+        self.post.save()
+        _, data = self.batch(**params)
+        self.assertEqual(data['posts'][0]['text'], 'Исправленный')
+        hide_user(self.author)
+        _, data = self.batch(users='author', **params)
+        self.assertEqual(data['posts'], [])
+        self.assertEqual(
+            data['missing'], {'posts': [self.post.pk], 'users': ['author']}
+        )
+
+    def test_rename_user_forgets_old_name(self):
+        """После переименования старое имя не находится из кэша."""
+        self.batch(users='author')
+        self.author.username = 'renamed'
+        self.author.save()
+        _, data = self.batch(users='author,renamed')
+        self.assertEqual(data['missing']['users'], ['author'])
+        self.assertEqual(data['users'][0]['username'], 'renamed')
+
+    def test_group_changes_reach_cached_posts(self):
+        """Смена slug и удаление группы видны в закэшированном посте."""
+        group = Group.objects.create(title='Группа', slug='first')
+        self.post.group = group
+        self.post.save()
+        params = {'posts': str(self.post.pk), 'fields': 'group'}
+        _, data = self.batch(**params)
+        self.assertEqual(data['posts'][0]['group'], 'first')
+        group.slug = 'second'
+        group.save()
+        _, data = self.batch(**params)
+        self.assertEqual(data['posts'][0]['group'], 'second')
+        # посты отвязываются UPDATE пачками, сигналы постов не приходят
+        delete_group(group.pk, pause=0)
+        _, data = self.batch(**params)
+        self.assertIsNone(data['posts'][0]['group'])
+
+    def test_limits(self):
+        """Слишком большой или кривой запрос - 400."""
+        with self.settings(API_BATCH_LIMIT=2):
+            response, _ = self.batch(posts='1,2', users='author')
+        self.assertEqual(response.status_code, 400)
+        response, _ = self.batch(posts='1,x')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,204 @@
+import hashlib
+from functools import wraps
+
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_GET
+
+from posts.conditions import (
+    COMMENT_MODELS, RELATED_KEY, feed_versions, follow_feed, get_stamps,
+    group_feed, index_feed, post_stats, profile_feed
+)
+from posts.models import Follow, Group, Post, User
+from posts.utils import memoized
+
+from .batch import check_size, parse_ids, parse_names, resolve
+from .serializers import (
+    ApiError, comment_rows, decode_cursor, parse_fields, parse_limit,
+    post_rows, stream_feed
+)
+
+JSON_PARAMS = {'ensure_ascii': False}
+
+
+def api_view(view):
+    """Только GET, ошибки - JSON с кодом 400/401/404 вместо HTML."""
+    @require_GET
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return JsonResponse(
+                {'error': 'Не найдено'}, status=404,
+                json_dumps_params=JSON_PARAMS,
+            )
+        except ApiError as error:
+            return JsonResponse(
+                {'error': str(error)}, status=400,
+                json_dumps_params=JSON_PARAMS,
+            )
+    return wrapper
+
+
+def make_etag(request, parts):
+    # параметры входят в ETag: fields и cursor меняют тело ответа
+    raw = ':'.join([str(part) for part in parts] + [request.GET.urlencode()])
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def feed_condition(get_feed):
+    """
+    ETag по дешёвой версии ленты, как у главной: максимумы по индексам
+    и метки, без COUNT по всей ленте и без соединения с авторами.
+    """
+    def etag(request, *args, **kwargs):
+        feed = get_feed(request, *args, **kwargs)
+        if feed is None:
+            return None
+        return make_etag(request, feed_versions(request, feed['versions']))
+    return condition(etag_func=etag)
+
+
+def feed_response(request, querysets, private=False):
+    fields = parse_fields(request.GET.get('fields'))
+    limit = parse_limit(request.GET.get('limit'))
+    cursor = decode_cursor(request.GET.get('cursor'))
+    response = StreamingHttpResponse(
+        stream_feed(querysets, fields, limit, cursor),
+        content_type='application/json',
+    )
+    # кэш обязан перепроверить ETag, лента подписок - только у клиента
+    patch_cache_control(
+        response, max_age=0, must_revalidate=True,
+        **{'private' if private else 'public': True}
+    )
+    return response
+
+
+# feed - выборки для ответа, versions - те же посты без фильтра по автору
+# для ETag; группа и автор ищутся один раз на запрос
+
+
+@memoized
+def get_index(request):
+    return {'feed': index_feed(), 'versions': (Post.objects.all(),)}
+
+
+@memoized
+def get_group(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return {
+        'feed': group_feed(group),
+        'versions': (group.posts.all(), group.archived_posts.all()),
+    }
+
+
+@memoized
+def get_profile(request, username):
+    author = get_object_or_404(User, username=username, is_active=True)
+    feed = profile_feed(author)
+    return {'feed': feed, 'versions': feed}
+
+
+@memoized
+def get_follow(request):
+    if not request.user.is_authenticated:
+        return None
+    return {
+        'feed': follow_feed(request.user),
+        'versions': (
+            Post.objects.filter(author__following__user=request.user),
+            Follow.objects.filter(user=request.user),
+        ),
+    }
+
+
+@api_view
+@feed_condition(get_index)
+def index(request):
+    return feed_response(request, get_index(request)['feed'])
+
+
+@api_view
+@feed_condition(get_group)
+def group_posts(request, slug):
+    return feed_response(request, get_group(request, slug)['feed'])
+
+
+@api_view
+@feed_condition(get_profile)
+def profile(request, username):
+    return feed_response(request, get_profile(request, username)['feed'])
+
+
+@api_view
+@feed_condition(get_follow)
+def follow(request):
+    feed = get_follow(request)
+    if feed is None:
+        return JsonResponse(
+            {'error': 'Требуется вход'}, status=401,
+            json_dumps_params=JSON_PARAMS,
+        )
+    return feed_response(request, feed['feed'], private=True)
+
+
+def post_etag(request, post_id):
+    stats = post_stats(request, post_id)
+    if stats is None:
+        return None
+    comments = stats['comments']
+    # в посте и комментариях имена авторов и slug группы
+    return make_etag(request, (
+        stats['model'], post_id, stats['version'],
+        comments['count'], comments['newest'],
+        get_stamps(request, RELATED_KEY)[0].value,
+    ))
+
+
+@api_view
+@condition(etag_func=post_etag)
+def post_detail(request, post_id):
+    fields = parse_fields(request.GET.get('fields'))
+    for model, comment_model in COMMENT_MODELS.items():
+        rows = post_rows(
+            model.objects.filter(pk=post_id, author__is_active=True), fields
+        )
+        found = next(rows, None)
+        if found is not None:
+            break
+    else:
+        raise Http404
+    response = JsonResponse(
+        {
+            'post': found[1],
+            'comments': list(comment_rows(
+                comment_model.objects.filter(post_id=post_id)
+            )),
+        },
+        json_dumps_params=JSON_PARAMS,
+    )
+    patch_cache_control(response, public=True, max_age=0,
+                        must_revalidate=True)
+    return response
+
+
+@api_view
+def batch(request):
+    """
+    Несколько постов и пользователей за один запрос вместе с подпиской
+    зрителя на каждого автора: ?posts=1,2&users=leo,anna&fields=...
+    """
+    post_ids = parse_ids(request.GET.get('posts', ''))
+    usernames = parse_names(request.GET.get('users', ''))
+    check_size(post_ids, usernames)
+    fields = parse_fields(request.GET.get('fields'))
+    response = JsonResponse(
+        resolve(request.user, post_ids, usernames, fields),
+        json_dumps_params=JSON_PARAMS,
+    )
+    # в ответе подписки конкретного зрителя
+    patch_cache_control(response, private=True, max_age=0)
+    return response
@@ -0,0 +1,47 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import OutgoingEmail, Task
+from .task_queue import enqueue
+from .tasks import send_spooled_mail
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'name',
+        'status',
+        'priority',
+        'attempts',
+        'run_at',
+        'finished',
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'dedupe_key')
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'subject',
+        'recipients',
+        'status',
+        'attempts',
+        'created',
+        'sent',
+    )
+    list_filter = ('status',)
+    search_fields = ('subject', 'recipients')
+    exclude = ('message',)
+    actions = ('retry',)
+
+    def retry(self, request, queryset):
+        count = queryset.filter(status=OutgoingEmail.DEAD).update(
+            status=OutgoingEmail.QUEUED, attempts=0, run_at=timezone.now()
+        )
+        if count:
+            enqueue(send_spooled_mail)
+        self.message_user(request, f'Возвращено в очередь: {count}')
+    retry.short_description = 'Отправить недоставленные заново'
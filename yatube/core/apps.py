@@ -1,5 +1,19 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.utils.module_loading import autodiscover_modules
+
+        from . import slow_queries, sqlite, template_profiling
+
+        connection_created.connect(sqlite.apply_pragmas)
+        connection_created.connect(slow_queries.install)
+        if settings.TEMPLATE_PROFILING:
+            template_profiling.enable()
+        # регистрирует задачи очереди из tasks.py всех приложений
+        autodiscover_modules('tasks')
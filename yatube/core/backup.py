@@ -0,0 +1,111 @@
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import time
+from contextlib import closing
+
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.utils import timezone
+
+CHUNK_SIZE = 1024 * 1024
+SQLITE_BUSY = 5
+SQLITE_LOCKED = 6
+
+
+class BackupProgress:
+    """Пауза между шагами backup API, чтобы писатели успевали работать."""
+
+    def __init__(self, pause, busy_timeout):
+        self.pause = pause
+        self.busy_timeout = busy_timeout
+        self.busy_since = None
+        self.steps = 0
+        self.restarts = 0
+        self.remaining = None
+        self.total = 0
+
+    def __call__(self, status, remaining, total):
+        if status in (SQLITE_BUSY, SQLITE_LOCKED):
+            now = time.monotonic()
+            self.busy_since = self.busy_since or now
+            if now - self.busy_since > self.busy_timeout:
+                raise sqlite3.OperationalError(
+                    'Исходная база заблокирована дольше '
+                    f'{self.busy_timeout} с'
+                )
+            return
+        self.busy_since = None
+        if self.remaining is not None and remaining > self.remaining:
+            # исходная база изменилась другим подключением, копия начата заново
+            self.restarts += 1
+        self.remaining = remaining
+        self.total = total
+        self.steps += 1
+        if self.pause and remaining:
+            time.sleep(self.pause)
+
+
+def online_backup(target_path, alias='default', pages=256, pause=0.0,
+                  busy_timeout=30.0):
+    """Согласованная копия базы по pages страниц за шаг."""
+    progress = BackupProgress(pause, busy_timeout)
+    source = connections[alias]
+    source.ensure_connection()
+    if os.path.exists(target_path):
+        os.remove(target_path)
+    with closing(sqlite3.connect(target_path)) as target:
+        source.connection.backup(target, pages=pages, progress=progress)
+        target.execute('PRAGMA journal_mode = DELETE')
+    return progress
+
+
+def compress(source_path, target_path, level=6):
+    with open(source_path, 'rb') as source:
+        with gzip.open(target_path, 'wb', compresslevel=level) as target:
+            shutil.copyfileobj(source, target, CHUNK_SIZE)
+
+
+def snapshot_images(snapshot):
+    """
+    Картинки горячих и архивных постов из самого снимка, а не из живой
+    базы: манифест описывает ровно те файлы, на которые ссылается копия.
+    """
+    from posts.models import ArchivedPost, Post
+
+    with closing(sqlite3.connect(f'file:{snapshot}?mode=ro', uri=True)) as db:
+        for model in (Post, ArchivedPost):
+            field = model._meta.get_field('image').column
+            rows = db.execute(
+                f'SELECT id, "{field}" FROM "{model._meta.db_table}" '
+                f'WHERE "{field}" != \'\' ORDER BY id'
+            )
+            for post_id, name in rows:
+                yield model._meta.label_lower, post_id, name
+
+
+def media_manifest(path, snapshot):
+    """Список файлов картинок снимка с размерами, строится потоком."""
+    count = missing = 0
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('{"created": %s, "images": [' % json.dumps(
+            timezone.now().isoformat()
+        ))
+        for index, (model, post_id, name) in enumerate(
+            snapshot_images(snapshot)
+        ):
+            exists = default_storage.exists(name)
+            missing += not exists
+            count += 1
+            file.write(',' if index else '')
+            file.write(json.dumps({
+                'model': model,
+                'post': post_id,
+                'name': name,
+                'exists': exists,
+                'size': default_storage.size(name) if exists else None,
+            }, ensure_ascii=False))
+        file.write(']}\n')
+    return count, missing
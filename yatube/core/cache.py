@@ -0,0 +1,32 @@
+from django.core.cache.backends.locmem import LocMemCache
+
+from . import instrumentation, metrics
+
+_missing = object()
+
+
+class InstrumentedLocMemCache(LocMemCache):
+    """LocMemCache, считающий попадания и промахи текущего запроса."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version=version)
+        stats = instrumentation.current()
+        if value is _missing:
+            metrics.record_cache(0, 1)
+            if stats is not None:
+                stats.cache_misses += 1
+            return default
+        metrics.record_cache(1, 0)
+        if stats is not None:
+            stats.cache_hits += 1
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version=version)
+        metrics.record_cache(len(found), len(keys) - len(found))
+        stats = instrumentation.current()
+        if stats is not None:
+            stats.cache_hits += len(found)
+            stats.cache_misses += len(keys) - len(found)
+        return found
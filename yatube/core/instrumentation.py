@@ -0,0 +1,73 @@
+import threading
+import time
+
+_local = threading.local()
+
+
+class RequestStats:
+    """Счётчики одного запроса: SQL, кэш, шаблоны и миниатюры."""
+
+    __slots__ = (
+        'started', 'sql_count', 'sql_time', 'cache_hits', 'cache_misses',
+        'template_time', 'thumbnail_count', 'thumbnail_time',
+        'template_profile',
+    )
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_time = 0.0
+        self.thumbnail_count = 0
+        self.thumbnail_time = 0.0
+        self.template_profile = None
+
+    def as_dict(self):
+        return {
+            'sql_count': self.sql_count,
+            'sql_ms': round(self.sql_time * 1000, 3),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'template_ms': round(self.template_time * 1000, 3),
+            'thumbnail_count': self.thumbnail_count,
+            'thumbnail_ms': round(self.thumbnail_time * 1000, 3),
+            'template_profile': self.template_profile and {
+                name: {'calls': calls, 'ms': round(duration * 1000, 3)}
+                for name, (calls, duration) in self.template_profile.items()
+            },
+        }
+
+
+def current():
+    return getattr(_local, 'stats', None)
+
+
+def current_request():
+    return getattr(_local, 'request', None)
+
+
+def set_request(request):
+    _local.request = request
+
+
+def start():
+    _local.stats = RequestStats()
+    return _local.stats
+
+
+def stop():
+    _local.stats = None
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    stats = current()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.sql_count += 1
+        stats.sql_time += time.perf_counter() - started
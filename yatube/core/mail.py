@@ -0,0 +1,170 @@
+import datetime
+import email
+import json
+import logging
+import traceback
+from email.generator import BytesGenerator
+from email.header import decode_header, make_header
+from io import BytesIO
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger('yatube.mail')
+
+
+class SpooledMIME(email.message.Message):
+    # smtp-бэкенд Django передаёт linesep, которого нет у Message.as_bytes
+    def as_bytes(self, unixfrom=False, linesep='\n'):
+        buffer = BytesIO()
+        generator = BytesGenerator(buffer, mangle_from_=False, maxheaderlen=0)
+        generator.flatten(self, unixfrom=unixfrom, linesep=linesep)
+        return buffer.getvalue()
+
+
+class SpooledMessage(EmailMessage):
+    """Письмо из очереди: отдаёт бэкендам сохранённый MIME как есть."""
+
+    def __init__(self, outgoing):
+        super().__init__(
+            subject=outgoing.subject,
+            from_email=outgoing.from_email,
+            to=json.loads(outgoing.recipients),
+        )
+        self.raw = bytes(outgoing.message)
+
+    def recipients(self):
+        return self.to
+
+    def message(self):
+        return email.message_from_bytes(self.raw, _class=SpooledMIME)
+
+
+class SpoolEmailBackend(BaseEmailBackend):
+    """
+    EMAIL_BACKEND представлений: письмо сохраняется в таблицу, а отправку
+    через MAIL_SPOOL_BACKEND выполняет задача в обработчике очереди.
+    """
+
+    def send_messages(self, email_messages):
+        from .tasks import send_spooled_mail
+        from .task_queue import enqueue
+
+        spooled = []
+        for message in email_messages:
+            recipients = message.recipients()
+            if not recipients:
+                continue
+            mime = message.message()
+            spooled.append(OutgoingEmail(
+                subject=str(make_header(decode_header(
+                    mime.get('Subject', '')
+                )))[:255],
+                from_email=message.from_email,
+                recipients=json.dumps(recipients),
+                message=mime.as_bytes(),
+            ))
+        if spooled:
+            with transaction.atomic():
+                OutgoingEmail.objects.bulk_create(spooled)
+                enqueue(send_spooled_mail)
+        return len(spooled)
+
+
+def backoff(attempts):
+    return min(
+        settings.TASK_RETRY_BACKOFF * 2 ** (attempts - 1),
+        settings.TASK_RETRY_BACKOFF_MAX,
+    )
+
+
+def claim(limit):
+    now = timezone.now()
+    ids = list(OutgoingEmail.objects.filter(
+        status=OutgoingEmail.QUEUED, run_at__lte=now
+    ).order_by('run_at', 'id').values_list('id', flat=True)[:limit])
+    if not ids:
+        return []
+    OutgoingEmail.objects.filter(
+        id__in=ids, status=OutgoingEmail.QUEUED
+    ).update(status=OutgoingEmail.SENDING, locked_at=now)
+    return list(OutgoingEmail.objects.filter(
+        id__in=ids, status=OutgoingEmail.SENDING, locked_at=now
+    ).order_by('id'))
+
+
+def fail(outgoing, error):
+    """Повтор с паузой или, после MAIL_MAX_ATTEMPTS, в недоставленные."""
+    attempts = outgoing.attempts + 1
+    if attempts < settings.MAIL_MAX_ATTEMPTS:
+        fields = {
+            'status': OutgoingEmail.QUEUED,
+            'run_at': timezone.now() + datetime.timedelta(
+                seconds=backoff(attempts)
+            ),
+        }
+    else:
+        logger.error('Письмо %s не доставлено:\n%s', outgoing.pk, error)
+        fields = {'status': OutgoingEmail.DEAD}
+    OutgoingEmail.objects.filter(pk=outgoing.pk).update(
+        attempts=attempts, locked_at=None, last_error=error, **fields
+    )
+
+
+def deliver_batch(limit=None):
+    """
+    Отправляет пачку писем через одно соединение MAIL_SPOOL_BACKEND.
+    Возвращает число отправленных или None, если пачка пуста или
+    соединение не открылось.
+    """
+    batch = claim(limit or settings.MAIL_BATCH_SIZE)
+    if not batch:
+        return None
+    connection = get_connection(settings.MAIL_SPOOL_BACKEND)
+    try:
+        connection.open()
+    except Exception:
+        error = traceback.format_exc()
+        for outgoing in batch:
+            fail(outgoing, error)
+        return None
+    sent = []
+    try:
+        for outgoing in batch:
+            try:
+                connection.send_messages([SpooledMessage(outgoing)])
+            except Exception:
+                fail(outgoing, traceback.format_exc())
+            else:
+                sent.append(outgoing.pk)
+    finally:
+        connection.close()
+        OutgoingEmail.objects.filter(pk__in=sent).update(
+            status=OutgoingEmail.SENT,
+            attempts=F('attempts') + 1,
+            sent=timezone.now(),
+            locked_at=None,
+        )
+    return len(sent)
+
+
+def requeue_stale():
+    deadline = timezone.now() - datetime.timedelta(
+        seconds=settings.TASK_LOCK_TIMEOUT
+    )
+    return OutgoingEmail.objects.filter(
+        status=OutgoingEmail.SENDING, locked_at__lt=deadline
+    ).update(status=OutgoingEmail.QUEUED, locked_at=None)
+
+
+def next_retry():
+    """Когда созреет ближайшее отложенное письмо, или None."""
+    return OutgoingEmail.objects.filter(
+        status=OutgoingEmail.QUEUED
+    ).order_by('run_at').values_list('run_at', flat=True).first()
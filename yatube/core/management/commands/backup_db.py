@@ -0,0 +1,94 @@
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.backup import compress, media_manifest, online_backup
+
+
+class Command(BaseCommand):
+    help = (
+        'Снимок базы SQLite через online backup API по шагам, не блокируя '
+        'запись, с потоковым сжатием и манифестом медиафайлов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Файл снимка, например db.gz')
+        parser.add_argument('--database', default='default')
+        parser.add_argument(
+            '--pages', type=int, default=256,
+            help='Страниц за один шаг копирования'
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0.005,
+            help='Пауза между шагами в секундах'
+        )
+        parser.add_argument(
+            '--no-compress', action='store_true',
+            help='Сохранить снимок без gzip'
+        )
+        parser.add_argument(
+            '--level', type=int, default=6, choices=range(1, 10),
+            help='Степень сжатия gzip'
+        )
+        parser.add_argument(
+            '--manifest', action='store_true',
+            help='Записать рядом манифест картинок постов из снимка'
+        )
+
+    def handle(self, *args, **options):
+        if connections[options['database']].vendor != 'sqlite':
+            raise CommandError('Команда работает только с SQLite')
+        output = os.path.abspath(options['output'])
+        directory = os.path.dirname(output)
+        started = time.perf_counter()
+        if options['no_compress']:
+            snapshot = output
+        else:
+            handle, snapshot = tempfile.mkstemp(
+                dir=directory, suffix='.sqlite3'
+            )
+            os.close(handle)
+        try:
+            progress = online_backup(
+                snapshot, options['database'], options['pages'],
+                options['pause'],
+            )
+            copied = time.perf_counter()
+            size = os.path.getsize(snapshot)
+            self.stdout.write(
+                'Скопировано {:.1f} МБ за {:.2f} с ({:.1f} МБ/с), шагов {}, '
+                'перезапусков {}'.format(
+                    size / 2 ** 20, copied - started,
+                    size / 2 ** 20 / max(copied - started, 1e-9),
+                    progress.steps, progress.restarts,
+                )
+            )
+            if not options['no_compress']:
+                compress(snapshot, output, options['level'])
+                compressed = time.perf_counter()
+                self.stdout.write(
+                    'Сжато до {:.1f} МБ за {:.2f} с ({:.1f} МБ/с)'.format(
+                        os.path.getsize(output) / 2 ** 20,
+                        compressed - copied,
+                        size / 2 ** 20 / max(compressed - copied, 1e-9),
+                    )
+                )
+            if options['manifest']:
+                # по самому снимку, пока его несжатая копия не удалена
+                count, missing = media_manifest(
+                    f'{output}.manifest.json', snapshot
+                )
+                self.stdout.write(
+                    f'Манифест: {count} файлов, отсутствуют {missing}'
+                )
+        finally:
+            if snapshot != output and os.path.exists(snapshot):
+                os.remove(snapshot)
+        self.stdout.write(self.style.SUCCESS(
+            'Снимок {} готов за {:.2f} с'.format(
+                output, time.perf_counter() - started
+            )
+        ))
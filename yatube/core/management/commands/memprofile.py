@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from core.memory import profile_url
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет адреса через приложение под tracemalloc и выводит пиковую '
+        'память и основные места выделений для каждого представления'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='*', help='Адреса для проверки')
+        parser.add_argument(
+            '--urls-file', help='Файл со списком адресов, по одному в строке'
+        )
+        parser.add_argument(
+            '--user', help='Имя пользователя, от которого идут запросы'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=1,
+            help='Сколько раз запрашивать каждый адрес'
+        )
+        parser.add_argument(
+            '--top', type=int, default=10,
+            help='Сколько мест выделений показывать'
+        )
+        parser.add_argument(
+            '--no-warmup', action='store_true',
+            help='Не делать прогревочный запрос перед измерением'
+        )
+        parser.add_argument(
+            '--group-by', choices=('lineno', 'filename', 'traceback'),
+            default='lineno',
+        )
+
+    def handle(self, *args, **options):
+        urls = list(options['urls'])
+        if options['urls_file']:
+            with open(options['urls_file']) as file:
+                urls.extend(line.strip() for line in file if line.strip())
+        if not urls:
+            raise CommandError('Не указано ни одного адреса')
+        client = Client()
+        if options['user']:
+            try:
+                client.force_login(
+                    User.objects.get(username=options['user'])
+                )
+            except User.DoesNotExist:
+                raise CommandError(
+                    f'Пользователь {options["user"]} не найден'
+                )
+        for url in urls:
+            if not options['no_warmup']:
+                client.get(url)
+            result = profile_url(
+                client, url, options['repeat'], options['top'],
+                options['group_by'],
+            )
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                '{url} [{view}] {status}: пик {peak:.1f} КБ, '
+                'осталось {retained:.1f} КБ'.format(
+                    url=url,
+                    view=result['view'] or '-',
+                    status=result['status'],
+                    peak=result['peak'] / 1024,
+                    retained=result['retained'] / 1024,
+                )
+            ))
+            for stat in result['top']:
+                self.stdout.write('  {:>10.1f} КБ {:>+8d} {}'.format(
+                    stat['size_diff'] / 1024,
+                    stat['count_diff'],
+                    stat['location'],
+                ))
@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.replicas import refresh_replicas
+
+
+class Command(BaseCommand):
+    help = 'Обновляет файлы реплик SQLite копией основной базы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=256)
+        parser.add_argument(
+            '--pause', type=float, default=0.005,
+            help='Пауза между шагами копирования в секундах'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять каждые N секунд, не реже REPLICA_REFRESH_SECONDS'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError(
+                'Реплики не настроены: задайте DB_REPLICA_NAMES'
+            )
+        if options['interval'] > settings.REPLICA_REFRESH_SECONDS:
+            # кука закрепления рассчитана на REPLICA_REFRESH_SECONDS: при
+            # редком обновлении пользователь не увидит свою запись
+            raise CommandError(
+                'Интервал больше REPLICA_REFRESH_SECONDS = '
+                f'{settings.REPLICA_REFRESH_SECONDS}'
+            )
+        while True:
+            started = time.perf_counter()
+            for alias, path in refresh_replicas(
+                options['pages'], options['pause']
+            ):
+                self.stdout.write(f'{alias}: {path}')
+            self.stdout.write(self.style.SUCCESS(
+                'Реплики обновлены за {:.2f} с'.format(
+                    time.perf_counter() - started
+                )
+            ))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
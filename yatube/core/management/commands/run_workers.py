@@ -0,0 +1,120 @@
+import json
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import task_queue
+from core.models import Task
+
+
+def run_worker(number, options, results):
+    stopping = []
+
+    def stop(*args):
+        stopping.append(True)
+
+    # текущая задача дорабатывает, новые не берутся
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        results.put(task_queue.work(
+            number,
+            burst=options['burst'],
+            batch=options['batch'],
+            poll=options['poll'],
+            stop=lambda: bool(stopping),
+        ))
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Запускает N процессов-обработчиков очереди задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-n', '--workers', type=int, default=1,
+            help='Количество процессов-обработчиков'
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Выйти, когда готовых задач не останется'
+        )
+        parser.add_argument(
+            '--batch', type=int, default=10,
+            help='Сколько задач обработчик забирает за раз'
+        )
+        parser.add_argument(
+            '--poll', type=float,
+            help='Интервал опроса пустой очереди в секундах'
+        )
+        parser.add_argument(
+            '--purge-days', type=int,
+            help='Перед запуском удалить выполненные задачи старше N дней'
+        )
+        parser.add_argument(
+            '--benchmark', type=int, default=0,
+            help='Поставить N пустых задач и замерить пропускную способность'
+        )
+
+    def handle(self, *args, **options):
+        if options['purge_days'] is not None:
+            self.stdout.write(
+                f'Удалено задач: {task_queue.purge(options["purge_days"])}'
+            )
+        if options['benchmark']:
+            return self.benchmark(options)
+        done, failed = self.run(options)
+        self.stdout.write(f'Выполнено: {done}, с ошибкой: {failed}')
+
+    def run(self, options):
+        workers = options['workers']
+        if workers <= 1:
+            return task_queue.work(
+                burst=options['burst'],
+                batch=options['batch'],
+                poll=options['poll'],
+            )
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        processes = [
+            context.Process(
+                target=run_worker, args=(number, options, results)
+            )
+            for number in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        totals = [0, 0]
+        for _ in processes:
+            done, failed = results.get()
+            totals[0] += done
+            totals[1] += failed
+        for process in processes:
+            process.join()
+        return tuple(totals)
+
+    def benchmark(self, options):
+        count = options['benchmark']
+        payload = json.dumps({'args': [], 'kwargs': {}})
+        Task.objects.bulk_create(
+            Task(name='core.noop', payload=payload) for _ in range(count)
+        )
+        options['burst'] = True
+        started = time.perf_counter()
+        done, failed = self.run(options)
+        elapsed = time.perf_counter() - started
+        deleted = Task.objects.filter(
+            name='core.noop', status=Task.DONE
+        ).delete()[0]
+        self.stdout.write(self.style.SUCCESS(
+            'Процессов: {}, пачка: {}: {} задач за {:.2f} с, {:.0f} в секунду '
+            '(ошибок: {}, удалено после замера: {})'.format(
+                options['workers'], options['batch'], done, elapsed,
+                done / elapsed, failed, deleted,
+            )
+        ))
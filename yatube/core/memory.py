@@ -0,0 +1,117 @@
+import gc
+import threading
+import tracemalloc
+from datetime import datetime
+
+from django.urls import Resolver404, resolve
+
+FRAMES = 10
+
+
+def format_stats(stats, limit):
+    return [
+        {
+            'location': str(stat.traceback[0]),
+            'traceback': stat.traceback.format()[-FRAMES:],
+            'size': stat.size,
+            'size_diff': getattr(stat, 'size_diff', stat.size),
+            'count': stat.count,
+            'count_diff': getattr(stat, 'count_diff', stat.count),
+        }
+        for stat in stats[:limit]
+    ]
+
+
+def view_name(path):
+    try:
+        return resolve(path.split('?', 1)[0]).view_name
+    except Resolver404:
+        return ''
+
+
+def profile_url(client, url, repeat=1, limit=10, key_type='lineno'):
+    """Прогоняет url через тестовый клиент и собирает места выделений."""
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(FRAMES)
+    try:
+        gc.collect()
+        tracemalloc.clear_traces()
+        baseline = tracemalloc.get_traced_memory()[0]
+        before = tracemalloc.take_snapshot()
+        status = None
+        for _ in range(repeat):
+            status = client.get(url).status_code
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        if started:
+            tracemalloc.stop()
+    return {
+        'url': url,
+        'view': view_name(url),
+        'status': status,
+        'peak': peak - baseline,
+        'retained': current - baseline,
+        'top': format_stats(after.compare_to(before, key_type), limit),
+    }
+
+
+class MemoryWatch:
+    """Снимки tracemalloc до и после N живых запросов."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.remaining = 0
+        self.started_tracing = False
+        self.before = None
+        self.requested = 0
+        self.started_at = None
+        self.result = None
+
+    @property
+    def active(self):
+        return self.remaining > 0
+
+    def start(self, requests, limit=25):
+        with self._lock:
+            if self.active:
+                return False
+            self.started_tracing = not tracemalloc.is_tracing()
+            if self.started_tracing:
+                tracemalloc.start(FRAMES)
+            gc.collect()
+            self.before = tracemalloc.take_snapshot()
+            self.requested = self.remaining = requests
+            self.limit = limit
+            self.started_at = datetime.now()
+            return True
+
+    def tick(self):
+        if not self.remaining:
+            return
+        with self._lock:
+            if not self.remaining:
+                return
+            self.remaining -= 1
+            if self.remaining:
+                return
+            gc.collect()
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if self.started_tracing:
+                tracemalloc.stop()
+            diff = after.compare_to(self.before, 'traceback')
+            self.before = None
+            self.result = {
+                'requests': self.requested,
+                'started_at': self.started_at,
+                'finished_at': datetime.now(),
+                'traced': current,
+                'peak': peak,
+                'growth': sum(stat.size_diff for stat in diff),
+                'top': format_stats(diff, self.limit),
+            }
+
+
+watch = MemoryWatch()
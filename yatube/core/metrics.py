@@ -0,0 +1,286 @@
+import atexit
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+import weakref
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+DESCRIPTIONS = {
+    'yatube_requests_total': ('counter', 'Количество запросов'),
+    'yatube_request_latency_seconds': (
+        'histogram', 'Время обработки запроса по представлениям'
+    ),
+    'yatube_responses_total': ('counter', 'Ответы по кодам статуса'),
+    'yatube_db_queries_total': ('counter', 'Количество SQL-запросов'),
+    'yatube_cache_requests_total': ('counter', 'Обращения к кэшу'),
+    'yatube_cache_hit_ratio': ('gauge', 'Доля попаданий в кэш'),
+    'yatube_thumbnail_seconds': (
+        'histogram', 'Время получения миниатюр'
+    ),
+}
+# итог завершившихся процессов пишется как файл процесса с этим именем:
+# их счётчики не должны пропадать из суммы
+RETIRED_NAME = 'retired'
+LOCK_NAME = 'retired.lock'
+
+
+class ShardOwner:
+    # живёт в threading.local потока и умирает вместе с потоком
+    __slots__ = ('__weakref__',)
+
+
+class Registry:
+    """
+    Счётчики и гистограммы процесса.
+
+    Каждый поток пишет в собственный шард без блокировок, блокировка
+    берётся только при регистрации нового потока, при его завершении
+    и при чтении. Шард завершившегося потока сливается в общий итог.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._last_flush = 0.0
+        self._pid = None
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            self._local.owner = owner = ShardOwner()
+            weakref.finalize(owner, self._release, shard)
+        return shard
+
+    def _release(self, shard):
+        with self._lock:
+            self._shards = [item for item in self._shards if item is not shard]
+            for key, value in shard.items():
+                merge_value(self._retired, key, value)
+
+    def inc(self, name, labels=(), value=1):
+        shard = self._shard()
+        key = (name, labels)
+        shard[key] = shard.get(key, 0) + value
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        shard = self._shard()
+        key = (name, labels)
+        histogram = shard.get(key)
+        if histogram is None:
+            histogram = shard[key] = [0] * (len(buckets) + 2)
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                histogram[index] += 1
+                break
+        histogram[-2] += value
+        histogram[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            shards = [self._retired.copy()]
+            shards.extend(shard.copy() for shard in self._shards)
+        merged = {}
+        for shard in shards:
+            for key, value in shard.items():
+                merge_value(merged, key, value)
+        return merged
+
+    def maybe_flush(self):
+        directory = settings.METRICS_MULTIPROC_DIR
+        now = time.monotonic()
+        if not directory or now - self._last_flush < 1.0:
+            return
+        self._last_flush = now
+        pid = os.getpid()
+        if self._pid != pid:
+            # файл с тем же pid мог остаться от завершившегося процесса
+            self._pid = pid
+            retire_snapshot(directory, pid)
+            atexit.register(self.retire, directory, pid)
+        write_snapshot(directory, pid, self.snapshot())
+
+    def retire(self, directory, pid):
+        # обработчики atexit наследуются при fork, чужой pid не трогаем
+        if os.getpid() == pid:
+            retire_snapshot(directory, pid, self.snapshot())
+
+
+def merge_value(merged, key, value):
+    if isinstance(value, list):
+        current = merged.get(key)
+        if current is None:
+            merged[key] = list(value)
+        else:
+            merged[key] = [a + b for a, b in zip(current, value)]
+    else:
+        merged[key] = merged.get(key, 0) + value
+
+
+def write_snapshot(directory, pid, snapshot):
+    os.makedirs(directory, exist_ok=True)
+    rows = [[name, list(labels), value]
+            for (name, labels), value in snapshot.items()]
+    fd, path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as file:
+        json.dump(rows, file)
+    os.replace(path, os.path.join(directory, f'{pid}.json'))
+
+
+def read_file(path):
+    try:
+        with open(path) as file:
+            rows = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return {
+        (name, tuple(tuple(label) for label in labels)): value
+        for name, labels, value in rows
+    }
+
+
+def locked(directory, operation):
+    os.makedirs(directory, exist_ok=True)
+    lock = open(os.path.join(directory, LOCK_NAME), 'a')
+    fcntl.flock(lock, operation)
+    return lock
+
+
+def retire_snapshot(directory, pid, snapshot=None):
+    """
+    Переносит счётчики процесса в общий итог и удаляет его файл: иначе
+    процесс с тем же pid затёр бы их своими. Без snapshot переносится
+    то, что лежит в файле.
+    """
+    path = os.path.join(directory, f'{pid}.json')
+    with locked(directory, fcntl.LOCK_EX):
+        if snapshot is None:
+            snapshot = read_file(path)
+            if not snapshot:
+                return
+        retired = read_file(os.path.join(directory, f'{RETIRED_NAME}.json'))
+        for key, value in snapshot.items():
+            merge_value(retired, key, value)
+        write_snapshot(directory, RETIRED_NAME, retired)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def read_snapshots(directory, skip_pid):
+    merged = {}
+    # итог и файл процесса меняются под блокировкой, сумма не двоится
+    with locked(directory, fcntl.LOCK_SH):
+        for filename in os.listdir(directory):
+            if (
+                not filename.endswith('.json')
+                or filename == f'{skip_pid}.json'
+            ):
+                continue
+            path = os.path.join(directory, filename)
+            for key, value in read_file(path).items():
+                merge_value(merged, key, value)
+    return merged
+
+
+registry = Registry()
+
+
+def record_request(view, method, status, duration, stats=None):
+    view_label = (('view', view or '<unresolved>'),)
+    registry.inc('yatube_requests_total', view_label + (('method', method),))
+    registry.observe('yatube_request_latency_seconds', view_label, duration)
+    registry.inc(
+        'yatube_responses_total', view_label + (('status', str(status)),)
+    )
+    if stats is not None:
+        registry.inc('yatube_db_queries_total', view_label, stats.sql_count)
+    registry.maybe_flush()
+
+
+def record_cache(hits, misses):
+    if hits:
+        registry.inc('yatube_cache_requests_total', (('result', 'hit'),), hits)
+    if misses:
+        registry.inc(
+            'yatube_cache_requests_total', (('result', 'miss'),), misses
+        )
+
+
+def record_thumbnail(duration):
+    registry.observe('yatube_thumbnail_seconds', (), duration)
+
+
+def collect():
+    snapshot = registry.snapshot()
+    directory = settings.METRICS_MULTIPROC_DIR
+    if directory and os.path.isdir(directory):
+        for key, value in read_snapshots(directory, os.getpid()).items():
+            merge_value(snapshot, key, value)
+    hits = snapshot.get(
+        ('yatube_cache_requests_total', (('result', 'hit'),)), 0
+    )
+    misses = snapshot.get(
+        ('yatube_cache_requests_total', (('result', 'miss'),)), 0
+    )
+    if hits or misses:
+        snapshot[('yatube_cache_hit_ratio', ())] = hits / (hits + misses)
+    return snapshot
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('"', '\\"'))
+        for name, value in labels
+    )
+    return '{' + pairs + '}'
+
+
+def render(snapshot, buckets=LATENCY_BUCKETS):
+    """Текстовый формат экспозиции Prometheus."""
+    lines = []
+    for metric in DESCRIPTIONS:
+        kind, help_text = DESCRIPTIONS[metric]
+        series = sorted(
+            (labels, value) for (name, labels), value in snapshot.items()
+            if name == metric
+        )
+        if not series:
+            continue
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} {kind}')
+        for labels, value in series:
+            if kind != 'histogram':
+                lines.append(f'{metric}{format_labels(labels)} {value}')
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, value):
+                cumulative += count
+                lines.append('{}_bucket{} {}'.format(
+                    metric, format_labels(labels + (('le', bound),)),
+                    cumulative,
+                ))
+            lines.append('{}_bucket{} {}'.format(
+                metric, format_labels(labels + (('le', '+Inf'),)), value[-1]
+            ))
+            lines.append(f'{metric}_sum{format_labels(labels)} {value[-2]}')
+            lines.append(
+                f'{metric}_count{format_labels(labels)} {value[-1]}'
+            )
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,165 @@
+import json
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import Resolver404, resolve
+
+from . import (instrumentation, memory, metrics, prerender, profiling,
+               routers, template_profiling)
+from .replicas import reconnect_replaced_replicas
+
+logger = logging.getLogger('yatube.requests')
+
+
+def get_view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else ''
+
+
+class ServerTimingMiddleware:
+    """
+    Замеряет стоимость запроса и отдаёт её в заголовке Server-Timing
+    и структурированной строкой лога.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.SERVER_TIMING_SAMPLE_RATE
+
+    def __call__(self, request):
+        instrumentation.set_request(request)
+        try:
+            return self.process(request)
+        finally:
+            instrumentation.set_request(None)
+            memory.watch.tick()
+
+    def process(self, request):
+        started = time.perf_counter()
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            response = self.get_response(request)
+            metrics.record_request(
+                get_view_name(request), request.method,
+                response.status_code, time.perf_counter() - started,
+            )
+            return response
+        # запросы к базе считает instrumentation.sql_wrapper, который
+        # slow_queries.install ставит каждому подключению
+        stats = instrumentation.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.stop()
+        total = time.perf_counter() - started
+        view_name = get_view_name(request)
+        metrics.record_request(
+            view_name, request.method, response.status_code, total, stats
+        )
+        response['Server-Timing'] = self.format_header(stats, total)
+        logger.info(json.dumps({
+            'view': view_name,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 3),
+            **stats.as_dict(),
+        }))
+        return response
+
+    @staticmethod
+    def format_header(stats, total):
+        profile = []
+        if stats.template_profile:
+            profile = [
+                f'tprof{index};dur={duration * 1000:.2f};'
+                f'desc="{name} x{calls}"'
+                for index, (name, (calls, duration)) in enumerate(
+                    template_profiling.top(stats.template_profile, 5)
+                )
+            ]
+        return ', '.join((
+            f'total;dur={total * 1000:.2f}',
+            f'db;dur={stats.sql_time * 1000:.2f};'
+            f'desc="{stats.sql_count} queries"',
+            f'cache;desc="hit={stats.cache_hits} miss={stats.cache_misses}"',
+            f'tpl;dur={stats.template_time * 1000:.2f}',
+            f'thumb;dur={stats.thumbnail_time * 1000:.2f};'
+            f'desc="{stats.thumbnail_count} lookups"',
+            *profile,
+        ))
+
+
+class ProfilingMiddleware:
+    """
+    Запускает запрос под cProfile по флагу ?_profile=1 или заголовку
+    X-Profile: 1 от сотрудника, либо для каждого N-го запроса к представлению.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if profiling.is_requested(request) and request.user.is_staff:
+            return profiling.run(self.get_response, request)
+        if settings.PROFILING_SAMPLE_EVERY > 0:
+            try:
+                view_name = resolve(request.path_info).view_name
+            except Resolver404:
+                view_name = ''
+            if profiling.is_sampled(view_name):
+                return profiling.run(self.get_response, request)
+        return self.get_response(request)
+
+
+class ReplicaMiddleware:
+    """
+    Разрешает чтение из реплик для представлений из REPLICA_READ_VIEWS
+    и ставит куку закрепления за основной базой после записи.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        routers.reset()
+        reconnect_replaced_replicas()
+        try:
+            response = self.get_response(request)
+            if routers.wrote():
+                response.set_cookie(
+                    settings.REPLICA_STICKY_COOKIE, '1',
+                    max_age=settings.REPLICA_STICKY_SECONDS,
+                    httponly=True,
+                )
+            return response
+        finally:
+            routers.reset()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.resolver_match.view_name in settings.REPLICA_READ_VIEWS:
+            routers.allow_replica(
+                pinned=settings.REPLICA_STICKY_COOKIE in request.COOKIES
+            )
+
+
+class PrerenderMiddleware:
+    """
+    Отдаёт анонимным запросам готовые страницы из PRERENDER_DIR, минуя
+    представление, ORM и шаблоны. Запросы с кукой сессии идут дальше.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PRERENDER_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = prerender.serve(request)
+        if response is None:
+            response = self.get_response(request)
+        return response
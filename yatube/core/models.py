@@ -0,0 +1,92 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """Отложенная задача: имя из реестра core.task_queue и аргументы."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField('Задача', max_length=200)
+    payload = models.TextField('Аргументы', default='{}')
+    priority = models.SmallIntegerField('Приоритет', default=0)
+    status = models.CharField(
+        'Состояние', max_length=10, choices=STATUSES, default=QUEUED
+    )
+    dedupe_key = models.CharField(
+        'Ключ дедупликации', max_length=200, blank=True, null=True
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField(
+        'Максимум попыток', default=3
+    )
+    run_at = models.DateTimeField('Выполнить не раньше', default=timezone.now)
+    locked_by = models.CharField('Обработчик', max_length=100, blank=True)
+    locked_at = models.DateTimeField('Взята в работу', blank=True, null=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+    finished = models.DateTimeField('Завершена', blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_at']),
+        ]
+        constraints = [
+            # одна незавершённая задача на ключ, выполненные не мешают
+            models.UniqueConstraint(
+                fields=['dedupe_key'],
+                condition=models.Q(status__in=['queued', 'running']),
+                name='unique_pending_dedupe_key',
+            ),
+        ]
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+
+    def __str__(self) -> str:
+        return f'{self.name} #{self.pk}'
+
+
+class OutgoingEmail(models.Model):
+    """Письмо в очереди отправки: готовый MIME и адреса конверта."""
+    QUEUED = 'queued'
+    SENDING = 'sending'
+    SENT = 'sent'
+    DEAD = 'dead'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (SENDING, 'Отправляется'),
+        (SENT, 'Отправлено'),
+        (DEAD, 'Не доставлено'),
+    )
+
+    subject = models.CharField('Тема', max_length=255, blank=True)
+    from_email = models.CharField('Отправитель', max_length=255)
+    recipients = models.TextField('Получатели')
+    message = models.BinaryField('Письмо')
+    status = models.CharField(
+        'Состояние', max_length=10, choices=STATUSES, default=QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    run_at = models.DateTimeField('Отправить не раньше', default=timezone.now)
+    locked_at = models.DateTimeField('Взято в работу', blank=True, null=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Создано', auto_now_add=True)
+    sent = models.DateTimeField('Отправлено', blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+        ]
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+
+    def __str__(self) -> str:
+        return self.subject
@@ -0,0 +1,177 @@
+import hashlib
+import io
+import logging
+import os
+import posixpath
+import sys
+import tempfile
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.core.handlers.wsgi import WSGIRequest
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+logger = logging.getLogger('yatube.prerender')
+
+# запрос генератора: быстрый путь его пропускает, чтобы страница
+# строилась представлением, а не читалась из старого файла
+MARKER_HEADER = 'HTTP_X_PRERENDER'
+PAGE_NAME = 'index.html'
+
+_handler = None
+
+
+def get_handler():
+    """Обработчик со всеми middleware, как у WSGI, но без сети."""
+    global _handler
+    if _handler is None:
+        _handler = BaseHandler()
+        _handler.load_middleware()
+    return _handler
+
+
+def file_path(path):
+    """
+    Файл страницы для пути запроса или None, если путь не может быть
+    страницей: с '..', без завершающего '/' и прочие.
+    """
+    if not path.startswith('/') or not path.endswith('/'):
+        return None
+    normalized = posixpath.normpath(path)
+    if normalized != path.rstrip('/') and path != '/':
+        return None
+    if '\\' in path or '\x00' in path:
+        return None
+    return os.path.join(
+        settings.PRERENDER_DIR, *filter(None, path.split('/')), PAGE_NAME
+    )
+
+
+def build_request(path):
+    """
+    Анонимный GET к path от имени SITE_URL. Кука закрепления за основной
+    базой не даёт прочитать из отстающей реплики то, что только что
+    изменилось.
+    """
+    site = urlsplit(settings.SITE_URL)
+    return WSGIRequest({
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'SCRIPT_NAME': '',
+        'QUERY_STRING': '',
+        'SERVER_NAME': site.hostname,
+        'SERVER_PORT': str(
+            site.port or (443 if site.scheme == 'https' else 80)
+        ),
+        'HTTP_HOST': site.netloc,
+        'HTTP_COOKIE': f'{settings.REPLICA_STICKY_COOKIE}=1',
+        MARKER_HEADER: '1',
+        'wsgi.url_scheme': site.scheme,
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+    })
+
+
+def write(target, content):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    handle, temp = tempfile.mkstemp(
+        dir=os.path.dirname(target), suffix='.tmp'
+    )
+    try:
+        with os.fdopen(handle, 'wb') as output:
+            output.write(content)
+        os.chmod(temp, 0o644)
+        os.replace(temp, target)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+
+def remove(path):
+    target = file_path(path)
+    if target is None:
+        return
+    try:
+        os.remove(target)
+    except FileNotFoundError:
+        pass
+
+
+def render(path):
+    """
+    Строит анонимную страницу и кладёт её в PRERENDER_DIR. Страница,
+    которой больше нет (404), удаляется; ответы с куками или не HTML
+    не сохраняются, их по-прежнему отдаёт представление.
+    Возвращает код ответа.
+    """
+    target = file_path(path)
+    if target is None:
+        raise ValueError(f'Путь {path!r} не может быть страницей')
+    response = get_handler().get_response(build_request(path))
+    content_type = response.get('Content-Type', '')
+    if (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and content_type.startswith('text/html')
+    ):
+        write(target, response.content)
+    else:
+        remove(path)
+        if response.status_code not in (404, 410):
+            logger.warning(
+                'Страница %s не сохранена: %s %s',
+                path, response.status_code, content_type,
+            )
+    return response.status_code
+
+
+def bypass(request):
+    """Страница для этого запроса должна строиться представлением."""
+    return (
+        request.method not in ('GET', 'HEAD')
+        or request.META.get('QUERY_STRING')
+        or MARKER_HEADER in request.META
+        or any(name in request.COOKIES for name in (
+            settings.SESSION_COOKIE_NAME,
+            settings.REPLICA_STICKY_COOKIE,
+            'messages',
+        ))
+    )
+
+
+def serve(request):
+    """
+    Готовая страница для анонимного запроса или None. ETag и
+    Last-Modified - по файлу, повторный запрос получает 304.
+    """
+    if bypass(request):
+        return None
+    target = file_path(request.path_info)
+    if target is None:
+        return None
+    try:
+        with open(target, 'rb') as page:
+            stat = os.fstat(page.fileno())
+            content = page.read()
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    etag = '"{}"'.format(hashlib.md5(
+        f'{stat.st_mtime_ns}-{stat.st_size}'.encode()
+    ).hexdigest())
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if response is None:
+        response = HttpResponse(content)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    # вошедший пользователь получает другую страницу по той же ссылке
+    response['Vary'] = 'Cookie'
+    response['X-Frame-Options'] = getattr(
+        settings, 'X_FRAME_OPTIONS', 'SAMEORIGIN'
+    ).upper()
+    return response
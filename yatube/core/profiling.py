@@ -0,0 +1,80 @@
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import re
+import threading
+from datetime import datetime
+
+from django.conf import settings
+
+PROFILE_NAME_RE = re.compile(r'^[\w.-]+\.prof$')
+
+_counters = {}
+_counters_lock = threading.Lock()
+
+
+def is_requested(request):
+    return (
+        request.GET.get('_profile') == '1'
+        or request.META.get('HTTP_X_PROFILE') == '1'
+    )
+
+
+def is_sampled(view_name):
+    """Каждый N-й запрос к представлению профилируется автоматически."""
+    every = settings.PROFILING_SAMPLE_EVERY
+    if every <= 0:
+        return False
+    counter = _counters.get(view_name)
+    if counter is None:
+        with _counters_lock:
+            counter = _counters.setdefault(view_name, itertools.count(1))
+    return next(counter) % every == 0
+
+
+def run(get_response, request):
+    profiler = cProfile.Profile()
+    response = profiler.runcall(get_response, request)
+    save(profiler, request)
+    return response
+
+
+def save(profiler, request):
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    slug = re.sub(r'[^\w-]+', '-', request.path).strip('-') or 'root'
+    filename = '{}_{}.prof'.format(
+        datetime.now().strftime('%Y%m%d-%H%M%S-%f'), slug[:100]
+    )
+    profiler.dump_stats(os.path.join(settings.PROFILING_DIR, filename))
+    return filename
+
+
+def get_path(filename):
+    if not PROFILE_NAME_RE.match(filename):
+        return None
+    path = os.path.join(settings.PROFILING_DIR, filename)
+    return path if os.path.isfile(path) else None
+
+
+def list_profiles():
+    if not os.path.isdir(settings.PROFILING_DIR):
+        return []
+    profiles = []
+    for entry in os.scandir(settings.PROFILING_DIR):
+        if entry.is_file() and PROFILE_NAME_RE.match(entry.name):
+            stat = entry.stat()
+            profiles.append({
+                'name': entry.name,
+                'size': stat.st_size,
+                'created': datetime.fromtimestamp(stat.st_mtime),
+            })
+    return sorted(profiles, key=lambda item: item['name'], reverse=True)
+
+
+def format_stats(path, sort='cumulative', limit=60):
+    stream = io.StringIO()
+    stats = pstats.Stats(path, stream=stream)
+    stats.sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
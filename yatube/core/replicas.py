@@ -0,0 +1,50 @@
+import os
+
+from django.conf import settings
+from django.db import connections
+
+from .backup import online_backup
+
+
+def copy_database(target_path, alias='default', pages=256, pause=0.0):
+    """Копирует базу через backup API и атомарно подменяет файл реплики."""
+    temporary = f'{target_path}.tmp'
+    online_backup(temporary, alias, pages, pause)
+    os.replace(temporary, target_path)
+
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def reconnect_if_replaced(wrapper, path):
+    """
+    Закрывает подключение, если файл реплики подменили: открытый
+    дескриптор продолжает читать старый файл после os.replace.
+    """
+    signature = file_signature(path)
+    if getattr(wrapper, 'replica_signature', None) != signature:
+        wrapper.close()
+        wrapper.replica_signature = signature
+
+
+def reconnect_replaced_replicas():
+    for alias in settings.DATABASE_REPLICAS:
+        # следить можно только за репликой-файлом SQLite
+        path = settings.DATABASES.get(alias, {}).get('PATH')
+        if path:
+            reconnect_if_replaced(connections[alias], path)
+
+
+def refresh_replicas(pages=256, pause=0.0):
+    refreshed = []
+    for alias in settings.DATABASE_REPLICAS:
+        path = settings.DATABASES[alias]['PATH']
+        copy_database(path, pages=pages, pause=pause)
+        connections[alias].close()
+        refreshed.append((alias, path))
+    return refreshed
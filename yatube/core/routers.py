@@ -0,0 +1,58 @@
+import random
+import threading
+
+from django.conf import settings
+
+REPLICATED_APPS = {'posts', 'auth'}
+
+_state = threading.local()
+
+
+def reset():
+    _state.allowed = False
+    _state.pinned = False
+    _state.wrote = False
+
+
+def allow_replica(pinned=False):
+    _state.allowed = True
+    _state.pinned = pinned
+
+
+def mark_primary():
+    """После записи чтения до конца запроса идут в основную базу."""
+    _state.wrote = True
+
+
+def wrote():
+    return getattr(_state, 'wrote', False)
+
+
+class ReplicaRouter:
+    """
+    Чтения лент из REPLICA_READ_VIEWS уходят в реплики, запись и остальные
+    чтения - в default. После собственной записи пользователь на
+    REPLICA_STICKY_SECONDS закрепляется за основной базой.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            not settings.DATABASE_REPLICAS
+            or model._meta.app_label not in REPLICATED_APPS
+            or not getattr(_state, 'allowed', False)
+            or getattr(_state, 'pinned', False)
+            or wrote()
+        ):
+            return None
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label in REPLICATED_APPS:
+            mark_primary()
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+from django.conf import settings
+
+from . import instrumentation
+
+logger = logging.getLogger('yatube.slow_queries')
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER_RE = re.compile(r'%s|\?')
+IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+SPACE_RE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Нормализует запрос: литералы и списки параметров заменяются на ?."""
+    normalized = STRING_RE.sub('?', sql)
+    normalized = NUMBER_RE.sub('?', normalized)
+    normalized = PLACEHOLDER_RE.sub('?', normalized)
+    normalized = IN_LIST_RE.sub('(...)', normalized)
+    normalized = SPACE_RE.sub(' ', normalized).strip()
+    digest = hashlib.md5(normalized.encode()).hexdigest()[:12]
+    return digest, normalized
+
+
+def template_source():
+    """Ищет в стеке узел шаблона, рендеринг которого вызвал запрос."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            token = getattr(node, 'token', None)
+            origin = getattr(node, 'origin', None)
+            if token is not None:
+                return {
+                    'template': getattr(origin, 'template_name', None),
+                    'line': token.lineno,
+                    'node': token.contents,
+                }
+        frame = frame.f_back
+    return None
+
+
+def explain(connection, sql, params):
+    if connection.vendor != 'sqlite' or not sql.lstrip().upper().startswith(
+        'SELECT'
+    ):
+        return None
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+    except Exception as error:
+        return [f'EXPLAIN failed: {error}']
+    finally:
+        cursor.close()
+
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS
+    if not threshold:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = (time.perf_counter() - started) * 1000
+        if duration >= threshold:
+            log_query(sql, params, many, context['connection'], duration)
+
+
+def log_query(sql, params, many, connection, duration):
+    request = instrumentation.current_request()
+    match = getattr(request, 'resolver_match', None)
+    digest, normalized = fingerprint(sql)
+    logger.warning(json.dumps({
+        'fingerprint': digest,
+        'statement': normalized,
+        'sql': sql,
+        'params': None if many else [str(param) for param in params or ()],
+        'duration_ms': round(duration, 3),
+        'view': match.view_name if match else None,
+        'path': request.path if request is not None else None,
+        'source': template_source(),
+        'plan': None if many else explain(connection, sql, params),
+    }, ensure_ascii=False))
+
+
+def install(sender, connection, **kwargs):
+    """
+    Обёртки ставятся один раз на подключение и в постоянном порядке.
+    execute_wrapper() на время запроса снимает последнюю обёртку, а не
+    свою, и при подключении посреди запроса сбивал бы список.
+    """
+    for wrapper in (slow_query_wrapper, instrumentation.sql_wrapper):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+
+def read_log(path):
+    paths = [path] + [f'{path}.{index}' for index in range(1, 10)]
+    for log_path in paths:
+        if not os.path.isfile(log_path):
+            continue
+        with open(log_path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def top_offenders(entries, limit=50):
+    groups = {}
+    for entry in entries:
+        group = groups.get(entry['fingerprint'])
+        if group is None:
+            group = groups[entry['fingerprint']] = {
+                'fingerprint': entry['fingerprint'],
+                'statement': entry['statement'],
+                'count': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+                'views': Counter(),
+                'sources': Counter(),
+                'example': entry,
+            }
+        group['count'] += 1
+        group['total_ms'] += entry['duration_ms']
+        if entry['duration_ms'] > group['max_ms']:
+            group['max_ms'] = entry['duration_ms']
+            group['example'] = entry
+        group['views'][entry['view'] or '-'] += 1
+        source = entry.get('source')
+        if source:
+            group['sources'][
+                '{template}:{line} {{{node}}}'.format(**source)
+            ] += 1
+    for group in groups.values():
+        group['avg_ms'] = group['total_ms'] / group['count']
+        group['views'] = group['views'].most_common(3)
+        group['sources'] = group['sources'].most_common(3)
+    return sorted(
+        groups.values(), key=lambda group: group['total_ms'], reverse=True
+    )[:limit]
@@ -0,0 +1,13 @@
+from django.conf import settings
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """Настраивает новое подключение к SQLite по SQLITE_PRAGMAS."""
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRODUCTION_PROFILE:
+        return
+    read_only = connection.settings_dict.get('READ_ONLY', False)
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            if read_only and name in ('journal_mode', 'synchronous'):
+                continue
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,186 @@
+import datetime
+import json
+import logging
+import os
+import random
+import socket
+import time
+import traceback
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger('yatube.tasks')
+
+registry = {}
+
+
+def task(name=None, priority=0, max_attempts=3):
+    """
+    Регистрирует функцию как задачу. Модули tasks.py приложений
+    импортируются в CoreConfig.ready, поэтому реестр одинаков в
+    веб-процессе и в обработчиках run_workers.
+    """
+    def decorator(func):
+        func.task_name = name or f'{func.__module__}.{func.__name__}'
+        func.task_options = {
+            'priority': priority, 'max_attempts': max_attempts
+        }
+        registry[func.task_name] = func
+        return func
+    return decorator
+
+
+def enqueue(func, *args, priority=None, dedupe_key=None, delay=0, **kwargs):
+    """
+    Ставит задачу в очередь в текущей транзакции. Если незавершённая задача
+    с тем же dedupe_key уже есть, возвращает её вместо новой.
+    """
+    name = getattr(func, 'task_name', func)
+    if name not in registry:
+        raise KeyError(f'Задача {name} не зарегистрирована')
+    options = registry[name].task_options
+    fields = {
+        'name': name,
+        'payload': json.dumps({'args': args, 'kwargs': kwargs}),
+        'priority': options['priority'] if priority is None else priority,
+        'max_attempts': options['max_attempts'],
+        'dedupe_key': dedupe_key,
+        'run_at': timezone.now() + datetime.timedelta(seconds=delay),
+    }
+    if dedupe_key is None:
+        return Task.objects.create(**fields)
+    try:
+        with transaction.atomic():
+            return Task.objects.create(**fields)
+    except IntegrityError:
+        existing = Task.objects.filter(
+            dedupe_key=dedupe_key, status__in=(Task.QUEUED, Task.RUNNING)
+        ).first()
+        if existing is None:
+            raise
+        return existing
+
+
+def backoff(attempts):
+    """Экспоненциальная пауза перед повтором со случайным разбросом."""
+    delay = min(
+        settings.TASK_RETRY_BACKOFF * 2 ** (attempts - 1),
+        settings.TASK_RETRY_BACKOFF_MAX,
+    )
+    return delay * random.uniform(0.5, 1.0)
+
+
+def claim(worker, limit=1):
+    """
+    Забирает до limit готовых задач в порядке приоритета. Условие
+    status=queued в UPDATE не даёт двум обработчикам взять одну задачу,
+    поэтому обходимся без SELECT FOR UPDATE, которого нет в SQLite.
+    """
+    now = timezone.now()
+    ids = list(Task.objects.filter(
+        status=Task.QUEUED, run_at__lte=now
+    ).order_by('-priority', 'run_at', 'id').values_list(
+        'id', flat=True
+    )[:limit])
+    if not ids:
+        return []
+    Task.objects.filter(id__in=ids, status=Task.QUEUED).update(
+        status=Task.RUNNING,
+        locked_by=worker,
+        locked_at=now,
+        attempts=F('attempts') + 1,
+    )
+    return list(Task.objects.filter(
+        id__in=ids, status=Task.RUNNING, locked_by=worker, locked_at=now
+    ).order_by('-priority', 'run_at', 'id'))
+
+
+def execute(task_obj):
+    func = registry.get(task_obj.name)
+    try:
+        if func is None:
+            raise KeyError(f'Задача {task_obj.name} не зарегистрирована')
+        payload = json.loads(task_obj.payload)
+        func(*payload['args'], **payload['kwargs'])
+    except Exception:
+        error = traceback.format_exc()
+        if task_obj.attempts < task_obj.max_attempts:
+            logger.warning('%s: попытка %s не удалась', task_obj,
+                           task_obj.attempts)
+            Task.objects.filter(pk=task_obj.pk).update(
+                status=Task.QUEUED,
+                run_at=timezone.now() + datetime.timedelta(
+                    seconds=backoff(task_obj.attempts)
+                ),
+                locked_by='',
+                locked_at=None,
+                last_error=error,
+            )
+        else:
+            logger.error('%s: попытки исчерпаны\n%s', task_obj, error)
+            Task.objects.filter(pk=task_obj.pk).update(
+                status=Task.FAILED,
+                finished=timezone.now(),
+                last_error=error,
+            )
+        return False
+    Task.objects.filter(pk=task_obj.pk).update(
+        status=Task.DONE, finished=timezone.now()
+    )
+    return True
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи упавших обработчиков."""
+    deadline = timezone.now() - datetime.timedelta(
+        seconds=settings.TASK_LOCK_TIMEOUT
+    )
+    return Task.objects.filter(
+        status=Task.RUNNING, locked_at__lt=deadline
+    ).update(status=Task.QUEUED, locked_by='', locked_at=None)
+
+
+def worker_name(number=0):
+    return f'{socket.gethostname()}:{os.getpid()}:{number}'
+
+
+def work(number=0, burst=False, batch=10, poll=None, stop=None):
+    """
+    Цикл обработчика. В режиме burst выходит, когда готовых задач не
+    осталось; иначе ждёт новых, опрашивая таблицу каждые poll секунд.
+    Возвращает (выполнено, с ошибкой).
+    """
+    poll = settings.TASK_QUEUE_POLL_INTERVAL if poll is None else poll
+    name = worker_name(number)
+    done = failed = 0
+    last_requeue = 0.0
+    while stop is None or not stop():
+        close_old_connections()
+        if time.monotonic() - last_requeue > settings.TASK_LOCK_TIMEOUT:
+            requeue_stale()
+            last_requeue = time.monotonic()
+        tasks = claim(name, batch)
+        if not tasks:
+            if burst:
+                break
+            time.sleep(poll)
+            continue
+        for task_obj in tasks:
+            if execute(task_obj):
+                done += 1
+            else:
+                failed += 1
+    return done, failed
+
+
+def purge(days=7):
+    """Удаляет выполненные задачи старше days дней."""
+    deadline = timezone.now() - datetime.timedelta(days=days)
+    return Task.objects.filter(
+        status=Task.DONE, finished__lt=deadline
+    ).delete()[0]
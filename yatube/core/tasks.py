@@ -0,0 +1,29 @@
+from django.utils import timezone
+
+from . import mail
+from .task_queue import enqueue, task
+
+
+@task(name='core.noop')
+def noop(*args, **kwargs):
+    """Пустая задача для замера пропускной способности очереди."""
+
+
+@task(name='core.send_mail', priority=10)
+def send_spooled_mail():
+    """
+    Отправляет очередь писем пачками, пока готовые не кончатся, и
+    планирует себя на момент ближайшего повтора.
+    """
+    mail.requeue_stale()
+    while mail.deliver_batch() is not None:
+        pass
+    retry_at = mail.next_retry()
+    if retry_at is not None:
+        delay = max((retry_at - timezone.now()).total_seconds(), 0)
+        # ключ со временем: сама эта задача может быть mail-retry
+        enqueue(
+            send_spooled_mail,
+            delay=delay,
+            dedupe_key=f'mail-retry-{int(retry_at.timestamp())}',
+        )
@@ -0,0 +1,118 @@
+import functools
+import time
+
+from django.template.base import FilterExpression, Node, Template, TokenType
+
+from . import instrumentation
+
+_originals = {}
+
+
+def record(bucket, name, duration):
+    entry = bucket.get(name)
+    if entry is None:
+        bucket[name] = [1, duration]
+    else:
+        entry[0] += 1
+        entry[1] += duration
+
+
+def get_profile(stats):
+    if stats.template_profile is None:
+        stats.template_profile = {}
+    return stats.template_profile
+
+
+def profiled_render(self, context):
+    stats = instrumentation.current()
+    if stats is None:
+        return _originals['render'](self, context)
+    started = time.perf_counter()
+    try:
+        return _originals['render'](self, context)
+    finally:
+        record(
+            get_profile(stats),
+            self.origin.template_name or '<string>',
+            time.perf_counter() - started,
+        )
+
+
+def profiled_render_annotated(self, context):
+    stats = instrumentation.current()
+    token = getattr(self, 'token', None)
+    if (
+        stats is None
+        or token is None
+        or token.token_type != TokenType.BLOCK
+    ):
+        return _originals['render_annotated'](self, context)
+    started = time.perf_counter()
+    try:
+        return _originals['render_annotated'](self, context)
+    finally:
+        record(
+            get_profile(stats),
+            'tag:' + token.contents.split()[0],
+            time.perf_counter() - started,
+        )
+
+
+def profiled_filter(func):
+    name = 'filter:' + getattr(func, '_filter_name', func.__name__)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stats = instrumentation.current()
+        if stats is None:
+            return func(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record(get_profile(stats), name, time.perf_counter() - started)
+    return wrapper
+
+
+def profiled_filter_init(self, token, parser):
+    _originals['filter_init'](self, token, parser)
+    self.filters = [
+        (profiled_filter(func), args) for func, args in self.filters
+    ]
+
+
+def enable():
+    """
+    Подменяет методы движка шаблонов. Фильтры оборачиваются при компиляции,
+    поэтому включать профилирование нужно до загрузки шаблонов.
+    """
+    if _originals:
+        return
+    _originals['render'] = Template._render
+    _originals['render_annotated'] = Node.render_annotated
+    _originals['filter_init'] = FilterExpression.__init__
+    Template._render = profiled_render
+    Node.render_annotated = profiled_render_annotated
+    FilterExpression.__init__ = profiled_filter_init
+
+
+def is_enabled():
+    return bool(_originals)
+
+
+def disable():
+    if not _originals:
+        return
+    if Template._render is profiled_render:
+        Template._render = _originals['render']
+    if Node.render_annotated is profiled_render_annotated:
+        Node.render_annotated = _originals['render_annotated']
+    if FilterExpression.__init__ is profiled_filter_init:
+        FilterExpression.__init__ = _originals['filter_init']
+    _originals.clear()
+
+
+def top(profile, limit=10):
+    return sorted(
+        profile.items(), key=lambda item: item[1][1], reverse=True
+    )[:limit]
@@ -1,7 +1,51 @@
-from django.test import Client, TestCase
+import atexit
+import gzip
+import io
+import json
+import logging
+import os
+import shutil
+import smtplib
+import sqlite3
+import tempfile
+import threading
+from contextlib import closing
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.mail import send_mail
+from django.core.mail.backends import locmem
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.template import engines
+from django.template.base import Node
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+from django.utils import timezone
 
 from http import HTTPStatus
 
+from posts.archive import archive_posts, get_cutoff
+from posts.forms import CommentForm
+from posts.models import Follow, Group, Post
+
+from . import (backup, instrumentation, memory, metrics, profiling, routers,
+               slow_queries, task_queue, template_profiling)
+from .middleware import ServerTimingMiddleware
+from .models import OutgoingEmail, Task
+from .replicas import copy_database, reconnect_if_replaced
+from .routers import ReplicaRouter
+from .write_queue import WriteQueue, write_queue
+
+User = get_user_model()
+
 
 class ViewTestClass(TestCase):
 
@@ -22,3 +66,671 @@ class ViewTestClass(TestCase):
             msg_prefix='Запрошенный адрес не '
                        'соответствует ожидаемому шаблону'
         )
+
+
+class ServerTimingTestClass(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1.0)
+    def test_server_timing_header(self):
+        """Ответ содержит заголовок Server-Timing"""
+        with self.assertLogs('yatube.requests', 'INFO'):
+            response = self.client.get('/')
+        header = response.get('Server-Timing', '')
+        for metric in ('total;dur=', 'db;dur=', 'cache;', 'tpl;dur='):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, header)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1.0)
+    def test_request_summary_logged(self):
+        """Сводка запроса попадает в лог при уровнях по умолчанию"""
+        self.assertTrue(
+            logging.getLogger('yatube.requests').isEnabledFor(logging.INFO)
+        )
+        with self.assertLogs('yatube.requests', 'INFO') as logs:
+            self.client.get('/about/author/')
+        self.assertEqual(
+            json.loads(logs.records[0].getMessage())['path'], '/about/author/'
+        )
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_server_timing_disabled(self):
+        """При нулевой доле выборки заголовок не добавляется"""
+        response = self.client.get('/about/author/')
+        self.assertNotIn('Server-Timing', response)
+
+
+@override_settings(SERVER_TIMING_SAMPLE_RATE=1.0)
+class ServerTimingReconnectTestClass(TransactionTestCase):
+
+    def test_connection_opened_during_request(self):
+        """
+        Подключение, открытое посреди запроса, не сбивает обёртки: счётчик
+        запросов не растёт, медленные запросы по-прежнему пишутся
+        """
+        author = User.objects.create_user(username='author')
+        Post.objects.create(author=author, text='Пост')
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'requests.sqlite3')
+        copy_database(path)
+        # файловая база: в отличие от тестовой в памяти, close() её
+        # действительно закрывает, как при CONN_MAX_AGE = 0
+        original = connections['default']
+        database = DatabaseWrapper({
+            **connection.settings_dict, 'NAME': path,
+        }, alias='default')
+        connections['default'] = database
+        try:
+            client = Client()
+            headers = []
+            with self.assertLogs('yatube.requests', 'INFO'):
+                for _ in range(3):
+                    database.close()
+                    headers.append(client.get(
+                        f'/profile/{author.username}/'
+                    )['Server-Timing'].split(', ')[1].split(';desc=')[1])
+            self.assertEqual(len(set(headers)), 1, headers)
+            self.assertEqual(database.execute_wrappers, [
+                slow_queries.slow_query_wrapper, instrumentation.sql_wrapper,
+            ])
+        finally:
+            database.close()
+            connections['default'] = original
+
+
+class MetricsTestClass(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_metrics_page(self):
+        """Метрики отдаются в формате Prometheus"""
+        self.client.get('/about/tech/')
+        response = self.client.get('/metrics', REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        content = response.content.decode()
+        for line in (
+            '# TYPE yatube_request_latency_seconds histogram',
+            'yatube_requests_total{view="about:tech",method="GET"}',
+            'yatube_responses_total{view="about:tech",status="200"}',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, content)
+
+    def test_metrics_page_forbidden(self):
+        """Метрики недоступны посторонним адресам"""
+        response = self.client.get('/metrics', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+    def test_multiprocess_aggregation(self):
+        """Метрики других процессов суммируются из общего каталога"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        metrics.write_snapshot(directory, 0, {
+            ('yatube_requests_total', (('view', 'x'), ('method', 'GET'))): 3,
+        })
+        with override_settings(METRICS_MULTIPROC_DIR=directory):
+            snapshot = metrics.collect()
+        self.assertEqual(
+            snapshot[
+                ('yatube_requests_total', (('view', 'x'), ('method', 'GET')))
+            ],
+            3,
+        )
+
+    def test_thread_shards_are_released(self):
+        """Шард завершившегося потока сливается в итог и не копится"""
+        registry = metrics.Registry()
+        threads = [
+            threading.Thread(target=registry.inc, args=('requests',))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+            thread.join()
+        self.assertEqual(registry._shards, [])
+        self.assertEqual(registry.snapshot(), {('requests', ()): 5})
+
+    def test_worker_file_is_retired(self):
+        """
+        Файл процесса с тем же pid и файл завершившегося процесса
+        переносятся в общий итог, сумма не теряется и не двоится
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        key = ('yatube_requests_total', (('view', 'x'), ('method', 'GET')))
+        pid = os.getpid()
+        metrics.write_snapshot(directory, pid, {key: 3})
+        registry = metrics.Registry()
+        self.addCleanup(atexit.unregister, registry.retire)
+        registry.inc(*key, value=2)
+        with override_settings(METRICS_MULTIPROC_DIR=directory):
+            registry.maybe_flush()
+        self.assertEqual(metrics.read_snapshots(directory, None), {key: 5})
+        registry.retire(directory, pid)
+        self.assertFalse(os.path.exists(
+            os.path.join(directory, f'{pid}.json')
+        ))
+        self.assertEqual(metrics.read_snapshots(directory, None), {key: 5})
+
+
+class ProfilingTestClass(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.settings_override = override_settings(
+            PROFILING_DIR=self.directory
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.staff = User.objects.create_user(username='staff', is_staff=True)
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def test_staff_profile_request(self):
+        """Флаг ?_profile=1 сотрудника сохраняет профиль запроса"""
+        self.staff_client.get('/about/tech/?_profile=1')
+        profiles = profiling.list_profiles()
+        self.assertEqual(len(profiles), 1)
+        name = profiles[0]['name']
+        response = self.staff_client.get(f'/debug/profiles/{name}/')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'function calls')
+
+    def test_guest_profile_flag_ignored(self):
+        """Флаг профилирования от посетителя игнорируется"""
+        Client().get('/about/tech/?_profile=1')
+        self.assertEqual(profiling.list_profiles(), [])
+
+    def test_sampled_profiling(self):
+        """Каждый N-й запрос к представлению профилируется"""
+        with override_settings(PROFILING_SAMPLE_EVERY=2):
+            for _ in range(4):
+                Client().get('/about/author/')
+        self.assertEqual(len(profiling.list_profiles()), 2)
+
+
+class SlowQueryTestClass(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        Post.objects.create(
+            author=self.author,
+            text='Пост',
+            group=Group.objects.create(
+                title='Группа', slug='slow', description='Описание'
+            ),
+        )
+
+    def test_fingerprint(self):
+        """Запросы с разными литералами получают один отпечаток"""
+        first, normalized = slow_queries.fingerprint(
+            'SELECT * FROM t WHERE id IN (%s, %s) AND name = \'a\''
+        )
+        second, _ = slow_queries.fingerprint(
+            'SELECT * FROM t WHERE id IN (%s) AND name = \'bb\''
+        )
+        self.assertEqual(first, second)
+        self.assertEqual(
+            normalized, 'SELECT * FROM t WHERE id IN (...) AND name = ?'
+        )
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0.000001)
+    def test_slow_query_logged_with_context(self):
+        """Медленный запрос логируется с представлением, шаблоном и планом"""
+        with self.assertLogs('yatube.slow_queries', 'WARNING') as logs:
+            Client().get(f'/profile/{self.author.username}/')
+        entries = [
+            json.loads(record.getMessage()) for record in logs.records
+        ]
+        from_template = [
+            entry for entry in entries
+            if entry['source'] and 'post.group' in entry['source']['node']
+        ]
+        self.assertTrue(from_template)
+        entry = from_template[0]
+        self.assertEqual(entry['view'], 'posts:profile')
+        self.assertEqual(entry['source']['template'], 'posts/profile.html')
+        self.assertTrue(entry['plan'])
+
+
+class TemplateProfilingTestClass(TestCase):
+
+    def setUp(self):
+        if not template_profiling.is_enabled():
+            template_profiling.enable()
+            self.addCleanup(template_profiling.disable)
+
+    def test_tags_filters_and_templates_recorded(self):
+        """Профилировщик учитывает шаблоны, теги и фильтры"""
+        template = engines['django'].from_string(
+            '{% load user_filters %}'
+            '{% for i in items %}{% url "posts:index" %}{% endfor %}'
+            '{{ form.text|addclass:"form-control" }}'
+            '{% include "includes/footer.html" %}'
+        )
+        stats = instrumentation.start()
+        self.addCleanup(instrumentation.stop)
+        template.render({'items': range(3), 'form': CommentForm()})
+        profile = stats.template_profile
+        self.assertEqual(profile['tag:url'][0], 3)
+        self.assertIn('tag:include', profile)
+        self.assertEqual(profile['filter:addclass'][0], 1)
+        self.assertEqual(profile['includes/footer.html'][0], 1)
+        self.assertIn('tprof0;dur=', ServerTimingMiddleware.format_header(
+            stats, 0.01
+        ))
+
+    def test_disable_restores_engine(self):
+        """После отключения движок шаблонов возвращается в исходный вид"""
+        template_profiling.disable()
+        self.addCleanup(template_profiling.enable)
+        self.assertIsNot(Node.render_annotated,
+                         template_profiling.profiled_render_annotated)
+
+
+class MemoryProfilingTestClass(TestCase):
+
+    def setUp(self):
+        self.staff = User.objects.create_user(username='staff', is_staff=True)
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def test_memprofile_command(self):
+        """Команда memprofile выводит пик памяти по представлениям"""
+        out = io.StringIO()
+        call_command('memprofile', '/about/tech/', '--top', '2', stdout=out)
+        self.assertIn('/about/tech/ [about:tech] 200', out.getvalue())
+
+    def test_memory_watch(self):
+        """Снимки памяти сравниваются после N живых запросов"""
+        self.staff_client.post('/debug/memory/', {'requests': 2})
+        self.assertTrue(memory.watch.active)
+        self.staff_client.get('/about/tech/')
+        self.staff_client.get('/about/author/')
+        self.assertFalse(memory.watch.active)
+        response = self.staff_client.get('/debug/memory/')
+        self.assertContains(response, 'Результат за 2 запросов')
+
+
+class SQLiteProfileTestClass(TestCase):
+
+    @override_settings(SQLITE_PRODUCTION_PROFILE=True)
+    def test_pragmas_applied(self):
+        """Профиль SQLite выставляет pragma при подключении"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        wrapper = DatabaseWrapper({
+            **connection.settings_dict,
+            'NAME': os.path.join(directory, 'profile.sqlite3'),
+        }, alias='profile_test')
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            for pragma, expected in (
+                ('journal_mode', 'wal'),
+                ('synchronous', 1),
+                ('temp_store', 2),
+                ('busy_timeout', 5000),
+            ):
+                with self.subTest(pragma=pragma):
+                    cursor.execute(f'PRAGMA {pragma}')
+                    self.assertEqual(cursor.fetchone()[0], expected)
+
+
+class WriteQueueTestClass(TransactionTestCase):
+
+    def test_batch_isolates_failures(self):
+        """Ошибка одной записи не откатывает остальные в пачке"""
+        queue = WriteQueue()
+        ok = queue.submit(User.objects.create, username='first')
+        failing = queue.submit(User.objects.create, username='first')
+        other = queue.submit(User.objects.create, username='second')
+        self.assertEqual(ok.result(timeout=5).username, 'first')
+        with self.assertRaises(IntegrityError):
+            failing.result(timeout=5)
+        self.assertEqual(other.result(timeout=5).username, 'second')
+        self.assertEqual(User.objects.count(), 2)
+
+    @override_settings(WRITE_QUEUE_ENABLED=True)
+    def test_follow_through_queue_is_visible_after_redirect(self):
+        """Подписка через очередь видна сразу после редиректа"""
+        user = User.objects.create_user(username='reader')
+        author = User.objects.create_user(username='writer')
+        client = Client()
+        client.force_login(user)
+        response = client.get(f'/profile/{author.username}/follow/')
+        self.assertRedirects(response, f'/profile/{author.username}/')
+        self.assertTrue(
+            Follow.objects.filter(user=user, author=author).exists()
+        )
+
+    @override_settings(WRITE_QUEUE_ENABLED=True)
+    def test_post_create_is_one_write(self):
+        """Пост с картинкой и задача миниатюр уходят писателю одной записью"""
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        submitted = []
+        submit = write_queue.submit
+
+        def counting_submit(func, *args, **kwargs):
+            submitted.append(func)
+            return submit(func, *args, **kwargs)
+
+        write_queue.submit = counting_submit
+        self.addCleanup(delattr, write_queue, 'submit')
+        client = Client()
+        client.force_login(User.objects.create_user(username='writer'))
+        image = SimpleUploadedFile(
+            'small.gif',
+            b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff'
+            b'\xff!\xf9\x04\x00\x00\x00\x00\x00,\x00\x00\x00\x00'
+            b'\x01\x00\x01\x00\x00\x02\x02D\x01\x00;',
+            content_type='image/gif',
+        )
+        with self.settings(MEDIA_ROOT=media):
+            client.post(
+                reverse('posts:post_create'),
+                {'text': 'Пост с картинкой', 'image': image},
+            )
+        self.assertEqual(len(submitted), 1)
+        post = Post.objects.get()
+        self.assertTrue(Task.objects.filter(
+            dedupe_key=f'thumbnails-{post.pk}'
+        ).exists())
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTestClass(TestCase):
+
+    def setUp(self):
+        routers.reset()
+        self.addCleanup(routers.reset)
+        self.router = ReplicaRouter()
+
+    def test_reads_routed_only_for_feed_views(self):
+        """В реплику идут только чтения разрешённых представлений"""
+        self.assertIsNone(self.router.db_for_read(Follow))
+        routers.allow_replica()
+        self.assertEqual(self.router.db_for_read(Follow), 'replica1')
+        self.assertIsNone(self.router.db_for_read(Session))
+
+    def test_pinned_after_write(self):
+        """После записи и с кукой закрепления чтения идут в default"""
+        routers.allow_replica()
+        self.assertEqual(self.router.db_for_write(Follow), 'default')
+        self.assertIsNone(self.router.db_for_read(Follow))
+        routers.reset()
+        routers.allow_replica(pinned=True)
+        self.assertIsNone(self.router.db_for_read(Follow))
+
+    def test_sticky_cookie_after_comment(self):
+        """После комментария ставится кука закрепления за основной базой"""
+        user = User.objects.create_user(username='reader')
+        post = Post.objects.create(author=user, text='Текст')
+        client = Client()
+        client.force_login(user)
+        response = client.post(
+            f'/posts/{post.pk}/comment/', {'text': 'Комментарий'}
+        )
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+
+    def test_copy_database(self):
+        """Копия базы для реплики содержит таблицы основной"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'replica.sqlite3')
+        copy_database(path)
+        with closing(sqlite3.connect(path)) as replica:
+            tables = {row[0] for row in replica.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            )}
+        self.assertIn('posts_post', tables)
+
+    def test_sticky_window_covers_refresh_interval(self):
+        """Закрепление за основной базой дольше интервала обновления"""
+        self.assertGreater(
+            settings.REPLICA_STICKY_SECONDS,
+            settings.REPLICA_REFRESH_SECONDS,
+        )
+        with self.assertRaises(CommandError):
+            call_command(
+                'refresh_replicas',
+                interval=settings.REPLICA_REFRESH_SECONDS + 1,
+            )
+
+
+class ReplicaRefreshTestClass(TransactionTestCase):
+
+    def test_reconnect_after_replica_refresh(self):
+        """После подмены файла реплики подключение открывается заново"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'replica.sqlite3')
+        copy_database(path)
+        replica = DatabaseWrapper({
+            **connection.settings_dict,
+            'NAME': f'file:{path}?mode=ro',
+            'READ_ONLY': True,
+        }, alias='replica_test')
+        self.addCleanup(replica.close)
+
+        def count():
+            reconnect_if_replaced(replica, path)
+            with replica.cursor() as cursor:
+                cursor.execute('SELECT COUNT(*) FROM auth_user')
+                return cursor.fetchone()[0]
+
+        self.assertEqual(count(), 0)
+        User.objects.create_user(username='fresh')
+        copy_database(path)
+        self.assertEqual(count(), 1)
+
+
+class BackupTestClass(TransactionTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.user = User.objects.create_user(username='author')
+
+    def create_post(self, name):
+        return Post.objects.create(
+            author=self.user, text='Текст', image=SimpleUploadedFile(
+                name, b'GIF89a', content_type='image/gif'
+            )
+        )
+
+    def test_backup_command(self):
+        """Снимок сжат, читается как SQLite и сопровождается манифестом"""
+        with override_settings(MEDIA_ROOT=self.directory):
+            old = self.create_post('old.gif')
+            post = self.create_post('small.gif')
+            Post.objects.filter(pk=old.pk).update(
+                pub_date=timezone.now() - timedelta(days=400)
+            )
+            archive_posts(get_cutoff(365))
+            output = os.path.join(self.directory, 'snapshot.gz')
+            call_command(
+                'backup_db', output, '--manifest', '--pages', '4',
+                stdout=io.StringIO(),
+            )
+        with gzip.open(output, 'rb') as snapshot:
+            self.assertEqual(snapshot.read(15), b'SQLite format 3')
+        with open(f'{output}.manifest.json', encoding='utf-8') as file:
+            manifest = json.load(file)
+        self.assertEqual(
+            [(image['model'], image['post']) for image in manifest['images']],
+            [('posts.post', post.pk), ('posts.archivedpost', old.pk)],
+        )
+        self.assertTrue(all(image['exists'] for image in manifest['images']))
+
+    def test_manifest_follows_snapshot(self):
+        """Манифест перечисляет картинки снимка, а не текущей базы"""
+        snapshot = os.path.join(self.directory, 'snapshot.sqlite3')
+        path = os.path.join(self.directory, 'manifest.json')
+        with override_settings(MEDIA_ROOT=self.directory):
+            post = self.create_post('before.gif')
+            backup.online_backup(snapshot)
+            self.create_post('after.gif')
+            self.assertEqual(backup.media_manifest(path, snapshot), (1, 0))
+        with open(path, encoding='utf-8') as file:
+            manifest = json.load(file)
+        self.assertEqual(
+            [image['post'] for image in manifest['images']], [post.pk]
+        )
+
+
+calls = []
+
+
+@task_queue.task(name='core.tests.record', priority=1)
+def record(value):
+    calls.append(value)
+
+
+@task_queue.task(name='core.tests.flaky', max_attempts=2)
+def flaky():
+    raise ValueError('сбой')
+
+
+class TaskQueueTestClass(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_priority_and_delay(self):
+        """Задачи выполняются по приоритету, отложенные ждут своего часа"""
+        task_queue.enqueue(record, 'low', priority=0)
+        task_queue.enqueue(record, 'high', priority=10)
+        task_queue.enqueue(record, 'later', delay=60)
+        self.assertEqual(task_queue.work(burst=True), (2, 0))
+        self.assertEqual(calls, ['high', 'low'])
+        self.assertEqual(Task.objects.filter(status=Task.QUEUED).count(), 1)
+
+    def test_dedupe_key(self):
+        """Незавершённая задача с тем же ключом не дублируется"""
+        first = task_queue.enqueue(record, 1, dedupe_key='same')
+        self.assertEqual(task_queue.enqueue(record, 2, dedupe_key='same'),
+                         first)
+        task_queue.work(burst=True)
+        self.assertEqual(calls, [1])
+        second = task_queue.enqueue(record, 3, dedupe_key='same')
+        self.assertNotEqual(second, first)
+
+    def test_retry_with_backoff(self):
+        """Упавшая задача откладывается, после последней попытки - failed"""
+        task = task_queue.enqueue(flaky)
+        with self.assertLogs('yatube.tasks', 'WARNING'):
+            self.assertEqual(task_queue.work(burst=True), (0, 1))
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.QUEUED, 1))
+        self.assertGreater(task.run_at, timezone.now())
+        self.assertIn('ValueError', task.last_error)
+        Task.objects.filter(pk=task.pk).update(run_at=timezone.now())
+        with self.assertLogs('yatube.tasks', 'ERROR'):
+            task_queue.work(burst=True)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 2))
+
+    def test_stale_task_requeued(self):
+        """Задача упавшего обработчика возвращается в очередь"""
+        task = task_queue.enqueue(record, 1)
+        task_queue.claim('dead-worker')
+        Task.objects.filter(pk=task.pk).update(
+            locked_at=timezone.now() - timedelta(days=1)
+        )
+        self.assertEqual(task_queue.requeue_stale(), 1)
+        self.assertEqual(task_queue.work(burst=True), (1, 0))
+
+    def test_unknown_task_rejected(self):
+        """Незарегистрированную задачу нельзя поставить в очередь"""
+        with self.assertRaises(KeyError):
+            task_queue.enqueue('core.tests.missing')
+
+    def test_benchmark(self):
+        """Замер выполняет пустые задачи и убирает их за собой"""
+        output = io.StringIO()
+        call_command('run_workers', benchmark=20, stdout=output)
+        self.assertIn('20 задач', output.getvalue())
+        self.assertFalse(Task.objects.exists())
+
+
+class CountingBackend(locmem.EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return super().open()
+
+
+class BrokenBackend(locmem.EmailBackend):
+
+    def send_messages(self, messages):
+        raise smtplib.SMTPServerDisconnected('нет связи')
+
+
+@override_settings(
+    EMAIL_BACKEND='core.mail.SpoolEmailBackend',
+    MAIL_SPOOL_BACKEND='core.tests.CountingBackend',
+)
+class MailSpoolTestClass(TestCase):
+
+    def setUp(self):
+        CountingBackend.opened = 0
+
+    def test_password_reset_is_spooled(self):
+        """Письмо сброса пароля ждёт обработчика, а не отправляется сразу"""
+        User.objects.create_user(
+            username='user', email='user@example.com', password='secret-1'
+        )
+        response = Client().post(
+            reverse('users:password_reset_form'),
+            {'email': 'user@example.com'},
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertEqual(mail.outbox, [])
+        outgoing = OutgoingEmail.objects.get()
+        self.assertEqual(outgoing.status, OutgoingEmail.QUEUED)
+        task_queue.work(burst=True)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['user@example.com'])
+        self.assertIn(b'/auth/reset/', mail.outbox[0].message().as_bytes())
+        outgoing.refresh_from_db()
+        self.assertEqual(outgoing.status, OutgoingEmail.SENT)
+
+    def test_batch_uses_one_connection(self):
+        """Пачка писем уходит через одно соединение"""
+        for number in range(3):
+            send_mail(f'Тема {number}', 'Текст', None, ['to@example.com'])
+        task_queue.work(burst=True)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(mail.outbox[2].subject, 'Тема 2')
+
+    @override_settings(
+        MAIL_SPOOL_BACKEND='core.tests.BrokenBackend', MAIL_MAX_ATTEMPTS=2
+    )
+    def test_retry_then_dead_letter(self):
+        """Недоставленное письмо повторяется, затем помечается мёртвым"""
+        send_mail('Тема', 'Текст', None, ['to@example.com'])
+        task_queue.work(burst=True)
+        outgoing = OutgoingEmail.objects.get()
+        self.assertEqual(
+            (outgoing.status, outgoing.attempts), (OutgoingEmail.QUEUED, 1)
+        )
+        self.assertIn('нет связи', outgoing.last_error)
+        retry = Task.objects.get(status=Task.QUEUED)
+        self.assertLess(
+            abs(retry.run_at - outgoing.run_at), timedelta(seconds=1)
+        )
+        OutgoingEmail.objects.update(run_at=timezone.now())
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('yatube.mail', 'ERROR'):
+            task_queue.work(burst=True)
+        outgoing.refresh_from_db()
+        self.assertEqual(outgoing.status, OutgoingEmail.DEAD)
+        self.assertEqual(mail.outbox, [])
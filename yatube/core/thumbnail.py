@@ -0,0 +1,21 @@
+import time
+
+from sorl.thumbnail.base import ThumbnailBackend
+
+from . import instrumentation, metrics
+
+
+class InstrumentedThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, считающий обращения к миниатюрам."""
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        started = time.perf_counter()
+        try:
+            return super().get_thumbnail(file_, geometry_string, **options)
+        finally:
+            duration = time.perf_counter() - started
+            metrics.record_thumbnail(duration)
+            stats = instrumentation.current()
+            if stats is not None:
+                stats.thumbnail_count += 1
+                stats.thumbnail_time += duration
@@ -0,0 +1,26 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'core'
+
+urlpatterns = [
+    path('metrics', views.metrics_view, name='metrics'),
+    path('debug/profiles/', views.profile_list, name='profile_list'),
+    path(
+        'debug/profiles/<str:filename>/',
+        views.profile_detail,
+        name='profile_detail'
+    ),
+    path(
+        'debug/profiles/<str:filename>/download/',
+        views.profile_download,
+        name='profile_download'
+    ),
+    path(
+        'debug/slow-queries/',
+        views.slow_query_list,
+        name='slow_query_list'
+    ),
+    path('debug/memory/', views.memory_watch, name='memory_watch'),
+]
@@ -1,4 +1,10 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404, HttpResponse
+from django.shortcuts import redirect, render
+
+from . import memory, metrics, profiling, slow_queries
 
 
 def page_not_found(request, exception):
@@ -22,3 +28,87 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+def metrics_view(request):
+    if (
+        request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS
+        and not request.user.is_staff
+    ):
+        raise PermissionDenied
+    return HttpResponse(
+        metrics.render(metrics.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+@staff_member_required
+def profile_list(request):
+    return render(
+        request,
+        'core/profile_list.html',
+        {
+            'profiles': profiling.list_profiles(),
+        }
+    )
+
+
+@staff_member_required
+def profile_detail(request, filename):
+    path = profiling.get_path(filename)
+    if path is None:
+        raise Http404
+    sort = request.GET.get('sort', 'cumulative')
+    if sort not in ('cumulative', 'tottime', 'calls'):
+        sort = 'cumulative'
+    return render(
+        request,
+        'core/profile_detail.html',
+        {
+            'filename': filename,
+            'sort': sort,
+            'stats': profiling.format_stats(path, sort),
+        }
+    )
+
+
+@staff_member_required
+def profile_download(request, filename):
+    path = profiling.get_path(filename)
+    if path is None:
+        raise Http404
+    return FileResponse(
+        open(path, 'rb'), as_attachment=True, filename=filename
+    )
+
+
+@staff_member_required
+def slow_query_list(request):
+    return render(
+        request,
+        'core/slow_query_list.html',
+        {
+            'groups': slow_queries.top_offenders(
+                slow_queries.read_log(settings.SLOW_QUERY_LOG_FILE)
+            ),
+            'threshold': settings.SLOW_QUERY_THRESHOLD_MS,
+        }
+    )
+
+
+@staff_member_required
+def memory_watch(request):
+    if request.method == 'POST':
+        try:
+            requests = max(1, int(request.POST.get('requests', 100)))
+        except ValueError:
+            requests = 100
+        memory.watch.start(requests)
+        return redirect('core:memory_watch')
+    return render(
+        request,
+        'core/memory_watch.html',
+        {
+            'watch': memory.watch,
+        }
+    )
@@ -0,0 +1,100 @@
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from . import routers
+
+logger = logging.getLogger('yatube.write_queue')
+
+
+class WriteQueue:
+    """
+    Очередь коротких операций записи с одним потоком-писателем на процесс.
+
+    Накопившиеся операции выполняются в одной транзакции, каждая в своей
+    точке сохранения, так что ошибка одной не откатывает остальные.
+    Future завершается только после фиксации транзакции.
+    """
+
+    def __init__(self, batch_size=50):
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, func, *args, **kwargs):
+        future = Future()
+        self._ensure_thread()
+        self._queue.put((future, func, args, kwargs))
+        return future
+
+    def _ensure_thread(self):
+        pid = os.getpid()
+        if self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                # после fork очередь родителя недоступна писателю
+                self._queue = queue.Queue()
+            self._thread = threading.Thread(
+                target=self._run, name='write-queue', daemon=True
+            )
+            self._pid = pid
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._execute(batch)
+
+    def _execute(self, batch):
+        batch = [item for item in batch
+                 if item[0].set_running_or_notify_cancel()]
+        outcomes = []
+        try:
+            close_old_connections()
+            with transaction.atomic():
+                for future, func, args, kwargs in batch:
+                    try:
+                        with transaction.atomic():
+                            outcomes.append((future, func(*args, **kwargs),
+                                             None))
+                    except Exception as error:
+                        outcomes.append((future, None, error))
+        except Exception as error:
+            logger.exception('Пачка из %s записей не выполнена', len(batch))
+            for future, *_ in batch:
+                future.set_exception(error)
+            return
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+write_queue = WriteQueue()
+
+
+def run_write(func, *args, **kwargs):
+    """Выполняет запись через очередь, если она включена, и ждёт итога."""
+    if not settings.WRITE_QUEUE_ENABLED:
+        return func(*args, **kwargs)
+    # запись идёт в другом потоке, закрепляем запрос за основной базой здесь
+    routers.mark_primary()
+    return write_queue.submit(func, *args, **kwargs).result(
+        timeout=settings.WRITE_QUEUE_TIMEOUT
+    )
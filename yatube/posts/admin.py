@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import Comment, Group, Post
+from .models import ArchivedPost, Comment, Group, Post
+from .tasks import schedule_group_deletion
 
 
 @admin.register(Post)
@@ -27,6 +28,18 @@ class GroupAdmin(admin.ModelAdmin):
         'description',
     )
     search_fields = ('title', 'slug')
+    actions = ('delete_in_background',)
+
+    def delete_in_background(self, request, queryset):
+        groups = list(queryset)
+        for group in groups:
+            schedule_group_deletion(group)
+        self.message_user(
+            request, f'Поставлено на удаление: {len(groups)}'
+        )
+    delete_in_background.short_description = (
+        'Удалить в фоне, отвязывая посты пачками'
+    )
 
 
 @admin.register(Comment)
@@ -39,3 +52,20 @@ class CommentAdmin(admin.ModelAdmin):
         'author',
     )
     search_fields = ('text', 'author', 'post',)
+
+
+@admin.register(ArchivedPost)
+class ArchivedPostAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        '__str__',
+        'pub_date',
+        'author',
+        'group',
+        'compressed',
+        'archived',
+    )
+    list_filter = ('pub_date', 'compressed')
+    list_select_related = ('author', 'group')
+    readonly_fields = ('body',)
+    empty_value_display = '-пусто-'
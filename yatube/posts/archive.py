@@ -0,0 +1,100 @@
+import datetime
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    ArchivedComment, ArchivedPost, Comment, Post, pack_text
+)
+
+DEFAULT_AGE_DAYS = 180
+DEFAULT_BATCH_SIZE = 1000
+
+
+def get_cutoff(days: int = DEFAULT_AGE_DAYS) -> datetime.datetime:
+    return timezone.now() - datetime.timedelta(days=days)
+
+
+def pending(cutoff: datetime.datetime):
+    """
+    Посты, которые подлежат архивации. Самый свежий по id пост не трогаем
+    никогда: счётчик id в SQLite после пересоздания таблицы (ALTER в
+    миграциях) продолжается от max(id), и без него новый пост мог бы
+    получить id архивного.
+    """
+    newest = Post.objects.order_by('-id').values_list('id', flat=True)[:1]
+    return Post.objects.filter(pub_date__lt=cutoff).exclude(
+        id__in=list(newest)
+    )
+
+
+def archive_batch(
+    cutoff: datetime.datetime,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    compress: bool = False,
+):
+    """
+    Переносит самые старые посты (не больше batch_size) вместе с
+    комментариями в архивные таблицы. Каждая пачка - отдельная транзакция,
+    поэтому прерванную архивацию можно просто запустить заново.
+    Возвращает (постов, комментариев).
+    """
+    with transaction.atomic():
+        posts = list(
+            pending(cutoff)
+            .order_by('pub_date', 'id')
+            .values('id', 'text', 'pub_date', 'author_id', 'group_id',
+                    'image')[:batch_size]
+        )
+        if not posts:
+            return 0, 0
+        ids = [post['id'] for post in posts]
+        archived = []
+        for post in posts:
+            body, compressed = pack_text(post.pop('text'), compress)
+            archived.append(
+                ArchivedPost(body=body, compressed=compressed, **post)
+            )
+        ArchivedPost.objects.bulk_create(archived)
+        comments = []
+        for comment in Comment.objects.filter(post_id__in=ids).values(
+            'id', 'text', 'created', 'post_id', 'author_id'
+        ).iterator():
+            body, compressed = pack_text(comment.pop('text'), compress)
+            comments.append(
+                ArchivedComment(body=body, compressed=compressed, **comment)
+            )
+        ArchivedComment.objects.bulk_create(comments)
+        Comment.objects.filter(post_id__in=ids).delete()
+        Post.objects.filter(id__in=ids).delete()
+    return len(posts), len(comments)
+
+
+def archive_posts(
+    cutoff: datetime.datetime,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    compress: bool = False,
+    limit: int = None,
+    pause: float = 0.0,
+    log=None,
+):
+    """Архивирует пачками до исчерпания или до limit постов."""
+    total_posts = total_comments = 0
+    while limit is None or total_posts < limit:
+        size = batch_size
+        if limit is not None:
+            size = min(size, limit - total_posts)
+        posts, comments = archive_batch(cutoff, size, compress)
+        if not posts:
+            break
+        total_posts += posts
+        total_comments += comments
+        if log is not None:
+            log(
+                f'перенесено постов: {total_posts}, '
+                f'комментариев: {total_comments}'
+            )
+        if pause:
+            time.sleep(pause)
+    return total_posts, total_comments
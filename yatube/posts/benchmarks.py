@@ -0,0 +1,173 @@
+import random
+import time
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+
+from .models import Follow, Group, Post, User
+
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+
+def parse_scale(value):
+    value = value.strip().lower()
+    if value in SCALES:
+        return SCALES[value]
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(value[-1:], 1)
+    return int(value.rstrip('km')) * multiplier
+
+
+def percentile(ordered, percent):
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1,
+                       round(percent / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+@contextmanager
+def use_database(name):
+    """Временно переключает базу default на другой файл SQLite."""
+    settings_dict = connections['default'].settings_dict
+    original = settings_dict['NAME']
+    connections['default'].close()
+    settings_dict['NAME'] = name
+    try:
+        yield
+    finally:
+        connections['default'].close()
+        settings_dict['NAME'] = original
+
+
+class QueryCounter:
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class ViewBenchmark:
+    """Запросы ко всем представлениям posts через тестовый клиент."""
+
+    def __init__(self, requests=50, seed=0, warm_cache=False):
+        self.requests = requests
+        self.rng = random.Random(seed)
+        self.warm_cache = warm_cache
+        self.guest = Client()
+        reader = (
+            Follow.objects.values('user_id').order_by('-user_id').first()
+        )
+        self.user = User.objects.get(pk=reader['user_id'])
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.max_post_id = Post.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first()
+        self.group_slugs = list(Group.objects.values_list('slug', flat=True))
+        self.usernames = list(User.objects.filter(
+            pk__in=Post.objects.values('author_id')[:1000]
+        ).values_list('username', flat=True))
+        self.followed = list(User.objects.exclude(pk=self.user.pk).filter(
+            pk__in=Post.objects.values('author_id')[:1000]
+        ).values_list('username', flat=True)[:50])
+
+    def page(self):
+        return self.rng.choice((1, 1, 1, 2, 3, 10))
+
+    def cases(self):
+        return {
+            'index': lambda: self.guest.get(
+                reverse('posts:index'), {'page': self.page()}
+            ),
+            'group_posts': lambda: self.guest.get(reverse(
+                'posts:group_list', args=[self.rng.choice(self.group_slugs)]
+            ), {'page': self.page()}),
+            'profile': lambda: self.guest.get(reverse(
+                'posts:profile', args=[self.rng.choice(self.usernames)]
+            ), {'page': self.page()}),
+            'post_detail': lambda: self.guest.get(reverse(
+                'posts:post_detail',
+                args=[self.rng.randint(1, self.max_post_id)]
+            )),
+            'follow_index': lambda: self.client.get(
+                reverse('posts:follow_index'), {'page': self.page()}
+            ),
+            'post_create': lambda: self.client.post(
+                reverse('posts:post_create'), {'text': 'Пост бенчмарка'}
+            ),
+            'add_comment': lambda: self.client.post(reverse(
+                'posts:add_comment',
+                args=[self.rng.randint(1, self.max_post_id)]
+            ), {'text': 'Комментарий бенчмарка'}),
+            'profile_follow': lambda: self.client.get(reverse(
+                'posts:profile_follow', args=[self.rng.choice(self.followed)]
+            )),
+            'profile_unfollow': lambda: self.client.get(reverse(
+                'posts:profile_unfollow',
+                args=[self.rng.choice(self.followed)]
+            )),
+        }
+
+    def measure(self, case):
+        counter = QueryCounter()
+        latencies = []
+        queries = []
+        errors = 0
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            for _ in range(self.requests):
+                if not self.warm_cache:
+                    cache.clear()
+                counter.count = 0
+                request_started = time.perf_counter()
+                response = case()
+                latencies.append(time.perf_counter() - request_started)
+                queries.append(counter.count)
+                if response.status_code >= 400:
+                    errors += 1
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return {
+            'requests': self.requests,
+            'errors': errors,
+            'throughput_rps': round(self.requests / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+            'queries_avg': round(sum(queries) / len(queries), 2),
+            'queries_max': max(queries),
+        }
+
+    def run(self, views=None):
+        return {
+            name: self.measure(case)
+            for name, case in self.cases().items()
+            if not views or name in views
+        }
+
+
+def compare(current, baseline):
+    """Отношение p50 и запросов к базовому прогону по каждому виду."""
+    rows = []
+    for scale, views in current['results'].items():
+        for view, result in views.items():
+            base = baseline.get('results', {}).get(scale, {}).get(view)
+            if not base:
+                continue
+            rows.append({
+                'scale': scale,
+                'view': view,
+                'p50_ratio': round(
+                    result['p50_ms'] / base['p50_ms'], 3
+                ) if base['p50_ms'] else None,
+                'queries_delta': round(
+                    result['queries_avg'] - base['queries_avg'], 2
+                ),
+            })
+    return rows
@@ -0,0 +1,303 @@
+import hashlib
+import uuid
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from django.views.decorators.http import condition
+
+from .models import (
+    ArchivedComment, ArchivedPost, Comment, Follow, Group, Post, Stamp, User
+)
+
+# поле версии: правка горячего поста обновляет updated, архивный неизменен
+VERSION_FIELDS = {Post: 'updated', ArchivedPost: 'archived'}
+COMMENT_MODELS = {Post: Comment, ArchivedPost: ArchivedComment}
+# метки главной: новые и изменённые посты сразу меняют ключ cache_page,
+# удаления и скрытие авторов - только ETag после истечения кэша страницы
+INDEX_CONTENT_KEY = 'posts:index:content'
+INDEX_REMOVAL_KEY = 'posts:index:removal'
+# названия групп и имена авторов выводятся на всех страницах постов
+RELATED_KEY = 'posts:related'
+
+
+def index_feed():
+    return (Post.objects.filter(author__is_active=True),)
+
+
+def group_feed(group):
+    return (
+        group.posts.filter(author__is_active=True),
+        group.archived_posts.filter(author__is_active=True),
+    )
+
+
+def profile_feed(author):
+    return (author.posts.all(), author.archived_posts.all())
+
+
+def follow_feed(user):
+    return (Post.objects.filter(
+        author__following__user=user, author__is_active=True
+    ),)
+
+
+def feed_stats(request, querysets):
+    """
+    Количество, наибольший id и последняя правка для каждого queryset
+    ленты одним агрегатом. Результат запоминается в запросе, чтобы
+    представление не считало количество для Paginator повторно.
+    """
+    memo = request.__dict__.setdefault('_feed_stats', {})
+    key = tuple(str(queryset.query) for queryset in querysets)
+    if key not in memo:
+        memo[key] = [
+            queryset.aggregate(
+                count=Count('pk'),
+                newest=Max('pk'),
+                version=Max(VERSION_FIELDS[queryset.model]),
+            )
+            for queryset in querysets
+        ]
+    return memo[key]
+
+
+def make_etag(request, *parts):
+    # разметка зависит от зрителя: меню, подписка, форма комментария
+    raw = ':'.join(str(part) for part in (request.user.pk or 0,) + parts)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def last_modified(request, stats, *stamps):
+    """
+    Last-Modified только для анонимов: после входа If-Modified-Since
+    совпал бы, хотя страница уже другая. Вошедшим хватает ETag.
+    Удаление поста дату не сдвигает, его ловит только ETag по количеству;
+    правки групп и авторов сдвигают её через время смены метки.
+    """
+    if request.user.is_authenticated:
+        return None
+    versions = [item['version'] for item in stats if item['version']]
+    versions.extend(stamp.changed for stamp in stamps)
+    return max(versions) if versions else None
+
+
+def feed_parts(stats):
+    return [
+        f"{item['count']}-{item['newest']}-{item['version']}"
+        for item in stats
+    ]
+
+
+def new_stamp():
+    return {'value': uuid.uuid4().hex, 'changed': timezone.now()}
+
+
+def get_stamps(request, *keys):
+    """Метки одним запросом по первичному ключу, запоминаются в запросе."""
+    memo = request.__dict__.setdefault('_stamps', {})
+    missing = [key for key in keys if key not in memo]
+    if missing:
+        memo.update(
+            (stamp.key, stamp)
+            for stamp in Stamp.objects.filter(key__in=missing)
+        )
+        for key in missing:
+            if key not in memo:
+                # метку ещё не меняли: заводим со случайным значением
+                memo[key] = Stamp.objects.get_or_create(
+                    key=key, defaults=new_stamp()
+                )[0]
+    return [memo[key] for key in keys]
+
+
+def bump_stamp(key):
+    values = new_stamp()
+    if not Stamp.objects.filter(key=key).update(**values):
+        Stamp.objects.update_or_create(key=key, defaults=values)
+
+
+def index_stats(request):
+    """
+    Дешёвая версия главной: MAX(id) и MAX(updated) берутся по индексам,
+    без COUNT и без соединения с auth_user. Удаление поста или скрытие
+    автора этих максимумов может не сдвинуть, их ловит метка в базе.
+    """
+    memo = request.__dict__
+    if '_index_stats' not in memo:
+        memo['_index_stats'] = {
+            'newest': Post.objects.aggregate(newest=Max('pk'))['newest'],
+            'version': Post.objects.aggregate(
+                version=Max('updated')
+            )['version'],
+        }
+    return memo['_index_stats']
+
+
+def feed_versions(request, querysets):
+    """
+    Дешёвая версия ленты для API: по каждому queryset отдельными
+    агрегатами MAX(id) и MAX(версии), чтобы каждый шёл по своему индексу,
+    без COUNT. Queryset берутся без фильтра по автору, удаления и
+    скрытие авторов ловит метка удалений. У таблиц без поля версии,
+    как у подписок, вместо неё считается количество строк.
+    """
+    memo = request.__dict__.setdefault('_feed_versions', {})
+    key = tuple(str(queryset.query) for queryset in querysets)
+    if key not in memo:
+        parts = []
+        for queryset in querysets:
+            version = VERSION_FIELDS.get(queryset.model)
+            parts.append(queryset.aggregate(newest=Max('pk'))['newest'])
+            parts.append(queryset.aggregate(
+                version=Max(version) if version else Count('pk')
+            )['version'])
+        memo[key] = parts + [
+            stamp.value
+            for stamp in get_stamps(request, INDEX_REMOVAL_KEY, RELATED_KEY)
+        ]
+    return memo[key]
+
+
+def index_stamps(request):
+    return get_stamps(request, INDEX_CONTENT_KEY, INDEX_REMOVAL_KEY)
+
+
+def index_etag(request):
+    stats = index_stats(request)
+    removal = index_stamps(request)[1]
+    return make_etag(
+        request, stats['newest'], stats['version'], removal.value
+    )
+
+
+def index_last_modified(request):
+    return last_modified(
+        request, [index_stats(request)], index_stamps(request)[1]
+    )
+
+
+def cached_condition(view):
+    """
+    Для страниц из cache_page: сверяет запрос с ETag и Last-Modified,
+    сохранёнными вместе с HTML, так что попадание в кэш отвечает 304
+    без выборки постов.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if response.status_code != 200 or not response.has_header('ETag'):
+            return response
+        return get_conditional_response(
+            request,
+            etag=response['ETag'],
+            last_modified=parse_http_date_safe(
+                response.get('Last-Modified', '')
+            ),
+            response=response,
+        )
+    return wrapper
+
+
+def group_stats(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_stats(request, group_feed(group))
+
+
+def profile_stats(request, username):
+    author = get_object_or_404(User, username=username, is_active=True)
+    return feed_stats(request, profile_feed(author))
+
+
+def profile_following(request, username):
+    # кнопка подписки на странице автора зависит от пары зритель-автор
+    if not request.user.is_authenticated:
+        return False
+    return Follow.objects.filter(
+        user=request.user, author__username=username
+    ).exists()
+
+
+def post_stats(request, post_id):
+    memo = request.__dict__.setdefault('_post_stats', {})
+    if post_id in memo:
+        return memo[post_id]
+    memo[post_id] = None
+    for model, comment_model in COMMENT_MODELS.items():
+        post = model.objects.filter(
+            pk=post_id, author__is_active=True
+        ).values('author_id', VERSION_FIELDS[model]).first()
+        if post is not None:
+            break
+    else:
+        return None
+    author_id = post['author_id']
+    memo[post_id] = {
+        'model': model._meta.model_name,
+        'version': post[VERSION_FIELDS[model]],
+        'comments': comment_model.objects.filter(post_id=post_id).aggregate(
+            count=Count('pk'), newest=Max('pk'), latest=Max('created')
+        ),
+        # в боковой колонке выводится число постов автора
+        'author_posts': (
+            Post.objects.filter(author_id=author_id).count()
+            + ArchivedPost.objects.filter(author_id=author_id).count()
+        ),
+    }
+    return memo[post_id]
+
+
+def feed_condition(get_stats, get_extra=None):
+    """
+    condition() с валидаторами по агрегату ленты и метке групп и авторов;
+    get_extra добавляет в ETag то, что зависит от зрителя, а не от постов.
+    """
+    def etag(request, *args, **kwargs):
+        parts = feed_parts(get_stats(request, *args, **kwargs))
+        parts.append(get_stamps(request, RELATED_KEY)[0].value)
+        if get_extra is not None:
+            parts.append(get_extra(request, *args, **kwargs))
+        return make_etag(request, *parts)
+
+    def modified(request, *args, **kwargs):
+        return last_modified(
+            request, get_stats(request, *args, **kwargs),
+            *get_stamps(request, RELATED_KEY)
+        )
+
+    return condition(etag_func=etag, last_modified_func=modified)
+
+
+def post_etag(request, post_id):
+    stats = post_stats(request, post_id)
+    if stats is None:
+        return None
+    comments = stats['comments']
+    return make_etag(
+        request, stats['model'], post_id, stats['version'],
+        comments['count'], comments['newest'], stats['author_posts'],
+        get_stamps(request, RELATED_KEY)[0].value,
+    )
+
+
+def post_last_modified(request, post_id):
+    stats = post_stats(request, post_id)
+    if stats is None or request.user.is_authenticated:
+        return None
+    related, = get_stamps(request, RELATED_KEY)
+    return max(filter(None, (
+        stats['version'], stats['comments']['latest'], related.changed
+    )))
+
+
+index_condition = condition(
+    etag_func=index_etag, last_modified_func=index_last_modified
+)
+group_condition = feed_condition(group_stats)
+profile_condition = feed_condition(profile_stats, profile_following)
+post_condition = condition(
+    etag_func=post_etag, last_modified_func=post_last_modified
+)
@@ -0,0 +1,132 @@
+import logging
+import time
+
+from django.db import transaction
+from sorl.thumbnail import delete as delete_thumbnails
+
+from .models import (
+    ArchivedComment, ArchivedPost, Comment, Follow, Group, Post, User
+)
+
+BATCH_SIZE = 500
+PAUSE = 0.05
+
+logger = logging.getLogger('yatube.deletion')
+
+
+def release_media(names):
+    """
+    Удаляет картинки и их миниатюры sorl, если на файл больше не ссылается
+    ни один пост: картинки-заглушки сида общие для многих постов.
+    """
+    names = {name for name in names if name}
+    if not names:
+        return
+    names -= set(Post.objects.filter(image__in=names).values_list(
+        'image', flat=True
+    ))
+    names -= set(ArchivedPost.objects.filter(image__in=names).values_list(
+        'image', flat=True
+    ))
+    for name in names:
+        try:
+            delete_thumbnails(name)
+        except OSError:
+            logger.warning('Не удалось удалить файл %s', name)
+
+
+def delete_batches(queryset, batch_size=BATCH_SIZE, pause=PAUSE, media=None):
+    """
+    Удаляет объекты queryset пачками по batch_size, каждая пачка в своей
+    транзакции, с паузой между ними, чтобы блокировка записи SQLite
+    освобождалась для запросов сайта. Возвращает число удалённых строк.
+    """
+    model = queryset.model
+    deleted = 0
+    while True:
+        fields = ['pk', media] if media else ['pk']
+        rows = list(queryset.values_list(*fields)[:batch_size])
+        if not rows:
+            return deleted
+        with transaction.atomic():
+            model.objects.filter(pk__in=[row[0] for row in rows]).delete()
+        if media:
+            release_media(row[1] for row in rows)
+        deleted += len(rows)
+        if pause:
+            time.sleep(pause)
+
+
+def update_batches(queryset, values, batch_size=BATCH_SIZE, pause=PAUSE):
+    updated = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return updated
+        with transaction.atomic():
+            queryset.model.objects.filter(pk__in=ids).update(**values)
+        updated += len(ids)
+        if pause:
+            time.sleep(pause)
+
+
+def hide_user(user):
+    """Аккаунт пропадает из лент сразу, до удаления зависимых объектов."""
+    # save, а не update: по сигналу сбрасываются кэшированные записи
+    user.is_active = False
+    user.save(update_fields=['is_active'])
+
+
+def delete_user(user_id, batch_size=BATCH_SIZE, pause=PAUSE):
+    """
+    Удаляет пользователя и всё, что на него ссылается, пачками: сначала
+    комментарии (свои и к своим постам), затем посты с картинками,
+    архив, подписки в обе стороны и в конце саму запись пользователя.
+    """
+    options = {'batch_size': batch_size, 'pause': pause}
+    counts = {
+        'comments': delete_batches(
+            Comment.objects.filter(author_id=user_id), **options
+        ) + delete_batches(
+            Comment.objects.filter(post__author_id=user_id), **options
+        ),
+        'posts': delete_batches(
+            Post.objects.filter(author_id=user_id), media='image', **options
+        ),
+        'archived_comments': delete_batches(
+            ArchivedComment.objects.filter(author_id=user_id), **options
+        ) + delete_batches(
+            ArchivedComment.objects.filter(post__author_id=user_id),
+            **options
+        ),
+        'archived_posts': delete_batches(
+            ArchivedPost.objects.filter(author_id=user_id),
+            media='image', **options
+        ),
+        'follows': delete_batches(
+            Follow.objects.filter(user_id=user_id), **options
+        ) + delete_batches(
+            Follow.objects.filter(author_id=user_id), **options
+        ),
+    }
+    with transaction.atomic():
+        User.objects.filter(pk=user_id).delete()
+    return counts
+
+
+def delete_group(group_id, batch_size=BATCH_SIZE, pause=PAUSE):
+    """Отвязывает посты от группы пачками вместо одного UPDATE."""
+    options = {'batch_size': batch_size, 'pause': pause}
+    counts = {
+        'posts': update_batches(
+            Post.objects.filter(group_id=group_id), {'group': None},
+            **options
+        ),
+        'archived_posts': update_batches(
+            ArchivedPost.objects.filter(group_id=group_id), {'group': None},
+            **options
+        ),
+    }
+    with transaction.atomic():
+        Group.objects.filter(pk=group_id).delete()
+    return counts
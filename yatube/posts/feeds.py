@@ -0,0 +1,235 @@
+import hashlib
+import heapq
+import io
+import os
+import tempfile
+from itertools import islice
+
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.feedgenerator import get_tag_uri, rfc3339_date
+from django.utils.text import Truncator
+from django.utils.xmlutils import SimplerXMLGenerator
+from django.views.decorators.http import condition
+
+from .conditions import (
+    RELATED_KEY, VERSION_FIELDS, feed_parts, feed_stats, get_stamps,
+    group_feed, index_feed, profile_feed
+)
+from .models import ArchivedPost, Group, User, unpack_text
+from .utils import memoized
+
+ATOM_TYPE = 'application/atom+xml; charset=utf-8'
+# горячая и архивная таблицы отличаются только столбцами текста и версии
+ENTRY_COLUMNS = (
+    'id', 'pub_date', 'author__username', 'author__first_name',
+    'author__last_name', 'group__title',
+)
+
+
+@memoized
+def index_source(request):
+    return {
+        'kind': 'index',
+        'key': '',
+        'title': 'Последние обновления на сайте',
+        'link': reverse('posts:index'),
+        'querysets': index_feed(),
+    }
+
+
+@memoized
+def group_source(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return {
+        'kind': 'group',
+        'key': slug,
+        'title': f'Записи сообщества {group.title}',
+        'link': reverse('posts:group_list', args=(slug,)),
+        'querysets': group_feed(group),
+    }
+
+
+@memoized
+def profile_source(request, username):
+    author = get_object_or_404(User, username=username, is_active=True)
+    return {
+        'kind': 'profile',
+        'key': username,
+        'title': f'Записи пользователя {author.get_full_name() or username}',
+        'link': reverse('posts:profile', args=(username,)),
+        'querysets': profile_feed(author),
+    }
+
+
+def feed_etag(request, source):
+    # ссылки в ленте абсолютные, поэтому версия зависит и от хоста
+    # названия групп и имена авторов входят в записи ленты
+    parts = [
+        source['kind'], source['key'], request.build_absolute_uri('/'),
+        settings.FEED_SIZE, get_stamps(request, RELATED_KEY)[0].value,
+    ] + feed_parts(feed_stats(request, source['querysets']))
+    return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def feed_updated(request, source):
+    versions = [
+        item['version']
+        for item in feed_stats(request, source['querysets'])
+        if item['version']
+    ] + [get_stamps(request, RELATED_KEY)[0].changed]
+    return max(versions)
+
+
+def atom_condition(get_source):
+    """
+    ETag и Last-Modified ленты - из того же агрегата, что у HTML-страниц.
+    Лента одна для всех зрителей, поэтому Last-Modified отдаётся всем.
+    """
+    def etag(request, *args, **kwargs):
+        return feed_etag(request, get_source(request, *args, **kwargs))
+
+    def modified(request, *args, **kwargs):
+        return feed_updated(request, get_source(request, *args, **kwargs))
+    return condition(etag_func=etag, last_modified_func=modified)
+
+
+def rows(queryset, size):
+    archived = queryset.model is ArchivedPost
+    version = VERSION_FIELDS[queryset.model]
+    columns = ENTRY_COLUMNS + (
+        ('body', 'compressed') if archived else ('text',)
+    ) + (version,)
+    for row in (
+        queryset.order_by('-pub_date', '-id').values(*columns)[:size]
+        .iterator()
+    ):
+        if archived:
+            row['text'] = unpack_text(row['body'], row['compressed'])
+        row['updated'] = row[version]
+        yield row
+
+
+def entries(querysets, size):
+    """Последние size постов ленты слиянием горячей и архивной выборок."""
+    merged = heapq.merge(
+        *(rows(queryset, size) for queryset in querysets),
+        key=lambda row: (row['pub_date'], row['id']), reverse=True,
+    )
+    return islice(merged, size)
+
+
+def flush(buffer):
+    chunk = buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+    return chunk
+
+
+def write_atom(request, source, updated):
+    """
+    Atom по одной записи за раз: записи не собираются в список, как
+    в django.contrib.syndication, а сразу уходят клиенту.
+    """
+    buffer = io.StringIO()
+    xml = SimplerXMLGenerator(buffer, 'utf-8', short_empty_elements=True)
+    feed_url = request.build_absolute_uri(request.path)
+    xml.startDocument()
+    xml.startElement('feed', {
+        'xmlns': 'http://www.w3.org/2005/Atom', 'xml:lang': 'ru',
+    })
+    xml.addQuickElement('title', source['title'])
+    xml.addQuickElement('link', '', {
+        'rel': 'alternate',
+        'href': request.build_absolute_uri(source['link']),
+    })
+    xml.addQuickElement('link', '', {'rel': 'self', 'href': feed_url})
+    xml.addQuickElement('id', feed_url)
+    if updated is not None:
+        xml.addQuickElement('updated', rfc3339_date(updated))
+    yield flush(buffer)
+    for row in entries(source['querysets'], settings.FEED_SIZE):
+        link = request.build_absolute_uri(
+            reverse('posts:post_detail', args=(row['id'],))
+        )
+        author = ' '.join(filter(None, (
+            row['author__first_name'], row['author__last_name']
+        ))) or row['author__username']
+        xml.startElement('entry', {})
+        xml.addQuickElement('title', Truncator(row['text']).chars(60))
+        xml.addQuickElement('link', '', {'rel': 'alternate', 'href': link})
+        xml.addQuickElement('id', get_tag_uri(link, row['pub_date']))
+        xml.addQuickElement('published', rfc3339_date(row['pub_date']))
+        xml.addQuickElement('updated', rfc3339_date(row['updated']))
+        xml.startElement('author', {})
+        xml.addQuickElement('name', author)
+        xml.endElement('author')
+        if row['group__title']:
+            xml.addQuickElement('category', '', {
+                'term': row['group__title'],
+            })
+        xml.addQuickElement('content', row['text'], {'type': 'text'})
+        xml.endElement('entry')
+        yield flush(buffer)
+    xml.endElement('feed')
+    yield flush(buffer)
+
+
+def feed_dir(request, source):
+    # имя пользователя может быть "..", поэтому каталог - хэш ключа; у
+    # каждого хоста и схемы свои абсолютные ссылки и свой подкаталог,
+    # чтобы новая версия удаляла только прежние версии того же адреса
+    return os.path.join(
+        settings.FEED_CACHE_DIR,
+        source['kind'],
+        hashlib.md5(source['key'].encode()).hexdigest(),
+        hashlib.md5(request.build_absolute_uri('/').encode()).hexdigest(),
+    )
+
+
+def store(chunks, directory, path):
+    """
+    Отдаёт куски клиенту и пишет их во временный файл рядом; после
+    последнего куска файл становится версией ленты, прежние удаляются.
+    Оборванная отдача оставляет кэш нетронутым.
+    """
+    os.makedirs(directory, exist_ok=True)
+    handle, temp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
+                yield chunk
+        os.chmod(temp, 0o644)
+        os.replace(temp, path)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+    for entry in os.scandir(directory):
+        if entry.name.endswith('.xml') and entry.path != path:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+def atom_response(request, source):
+    """Версия ленты с диска, а при её отсутствии - генерация с записью."""
+    directory = feed_dir(request, source)
+    path = os.path.join(directory, feed_etag(request, source) + '.xml')
+    try:
+        response = FileResponse(open(path, 'rb'), content_type=ATOM_TYPE)
+    except FileNotFoundError:
+        response = StreamingHttpResponse(
+            store(
+                write_atom(request, source, feed_updated(request, source)),
+                directory, path,
+            ),
+            content_type=ATOM_TYPE,
+        )
+    patch_cache_control(response, public=True, max_age=0,
+                        must_revalidate=True)
+    return response
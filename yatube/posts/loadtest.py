@@ -0,0 +1,311 @@
+import io
+import itertools
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.signals import got_request_exception
+from django.db import connections
+from django.http import HttpRequest
+from django.middleware.csrf import get_token
+from django.test import Client
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+
+from .benchmarks import percentile
+from .models import Follow, Post, User
+
+DEFAULT_MIX = {'browse': 70, 'feed': 15, 'comment': 10, 'post': 5}
+
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in DEFAULT_MIX:
+            raise ValueError(f'Неизвестный сценарий {name}')
+        mix[name] = int(weight)
+    return mix
+
+
+class Request:
+    __slots__ = ('method', 'path', 'query', 'body', 'content_type', 'cookie',
+                 'csrf')
+
+    def __init__(self, method, path, query='', body=b'', content_type='',
+                 cookie='', csrf=''):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.body = body
+        self.content_type = content_type
+        self.cookie = cookie
+        self.csrf = csrf
+
+
+class Session:
+    """Куки авторизованного пользователя и CSRF-токен."""
+
+    def __init__(self, user):
+        client = Client()
+        client.force_login(user)
+        request = HttpRequest()
+        self.csrf = get_token(request)
+        self.cookie = '{}={}; {}={}'.format(
+            settings.SESSION_COOKIE_NAME,
+            client.cookies[settings.SESSION_COOKIE_NAME].value,
+            settings.CSRF_COOKIE_NAME,
+            request.META['CSRF_COOKIE'],
+        )
+
+
+class Scenarios:
+
+    def __init__(self, mix, users=20, seed=0):
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.names = list(mix)
+        self.weights = list(itertools.accumulate(mix.values()))
+        self.max_post_id = Post.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 1
+        readers = Follow.objects.values_list(
+            'user', flat=True
+        ).distinct()[:users]
+        self.sessions = [
+            Session(user) for user in User.objects.filter(pk__in=readers)
+        ]
+        if not self.sessions and ({'feed', 'comment', 'post'} & set(mix)):
+            raise ValueError('Нет пользователей с подписками для сценариев')
+
+    def next(self):
+        with self.lock:
+            name = self.rng.choices(self.names, cum_weights=self.weights)[0]
+            page = self.rng.choice((1, 1, 1, 2, 3))
+            post_id = self.rng.randint(1, self.max_post_id)
+            session = self.rng.choice(self.sessions) if self.sessions else None
+        if name == 'browse':
+            return name, Request('GET', '/', f'page={page}')
+        if name == 'feed':
+            return name, Request('GET', '/follow/', f'page={page}',
+                                 cookie=session.cookie)
+        if name == 'comment':
+            return name, Request(
+                'POST', f'/posts/{post_id}/comment/',
+                body='text=Комментарий нагрузочного теста'.encode(),
+                content_type='application/x-www-form-urlencoded',
+                cookie=session.cookie, csrf=session.csrf,
+            )
+        body = encode_multipart(BOUNDARY, {
+            'text': 'Пост нагрузочного теста',
+            'image': named_file('load.gif', SMALL_GIF),
+        })
+        return name, Request(
+            'POST', '/create/', body=body, content_type=MULTIPART_CONTENT,
+            cookie=session.cookie, csrf=session.csrf,
+        )
+
+
+def named_file(name, content):
+    file = io.BytesIO(content)
+    file.name = name
+    return file
+
+
+class WSGITarget:
+    """Вызывает WSGI-приложение напрямую, без сетевого стека."""
+
+    def __init__(self, application):
+        self.application = application
+        self.db_locked = 0
+        self._lock = threading.Lock()
+        got_request_exception.connect(self.on_exception)
+
+    def on_exception(self, sender, **kwargs):
+        error = sys.exc_info()[1]
+        if error is not None and 'database is locked' in str(error):
+            with self._lock:
+                self.db_locked += 1
+
+    def close(self):
+        got_request_exception.disconnect(self.on_exception)
+
+    def __call__(self, request):
+        environ = {
+            'REQUEST_METHOD': request.method,
+            'PATH_INFO': request.path,
+            'QUERY_STRING': request.query,
+            'SERVER_NAME': '127.0.0.1',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1',
+            'CONTENT_LENGTH': str(len(request.body)),
+            'CONTENT_TYPE': request.content_type,
+            'HTTP_COOKIE': request.cookie,
+            'HTTP_X_CSRFTOKEN': request.csrf,
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(request.body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        status = []
+
+        def start_response(status_line, headers, exc_info=None):
+            status.append(int(status_line.split(' ', 1)[0]))
+
+        result = self.application(environ, start_response)
+        try:
+            for _ in result:
+                pass
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return status[0]
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HTTPTarget:
+    """Запросы к запущенному серверу по HTTP."""
+
+    db_locked = None
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(NoRedirect)
+
+    def close(self):
+        pass
+
+    def __call__(self, request):
+        url = self.base_url + request.path
+        if request.query:
+            url += '?' + request.query
+        http_request = urllib.request.Request(
+            url,
+            data=request.body if request.method == 'POST' else None,
+            method=request.method,
+        )
+        for header, value in (
+            ('Cookie', request.cookie),
+            ('X-CSRFToken', request.csrf),
+            ('Content-Type', request.content_type),
+        ):
+            if value:
+                http_request.add_header(header, value)
+        try:
+            with self.opener.open(http_request, timeout=30) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            return error.code
+
+
+def worker(target, scenarios, deadline, results):
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    while time.perf_counter() < deadline:
+        name, request = scenarios.next()
+        started = time.perf_counter()
+        try:
+            status = target(request)
+        except Exception:
+            status = 599
+        latencies[name].append(time.perf_counter() - started)
+        if status >= 400:
+            errors[name] += 1
+    connections.close_all()
+    results.append((latencies, errors))
+
+
+def run(target, scenarios, threads, duration):
+    results = []
+    deadline = time.perf_counter() + duration
+    workers = [
+        threading.Thread(
+            target=worker, args=(target, scenarios, deadline, results)
+        )
+        for _ in range(threads)
+    ]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return merge(results), time.perf_counter() - started
+
+
+def merge(results):
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    for worker_latencies, worker_errors in results:
+        for name, values in worker_latencies.items():
+            latencies[name].extend(values)
+        for name, count in worker_errors.items():
+            errors[name] += count
+    return latencies, errors
+
+
+def histogram(values):
+    counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+    for value in values:
+        milliseconds = value * 1000
+        for index, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+            if milliseconds <= bound:
+                counts[index] += 1
+                break
+        else:
+            counts[-1] += 1
+    labels = [f'<={bound}ms' for bound in HISTOGRAM_BUCKETS_MS] + ['>5000ms']
+    return dict(zip(labels, counts))
+
+
+def summarize(latencies, errors, elapsed, db_locked):
+    scenarios = {}
+    total = 0
+    total_errors = 0
+    for name, values in sorted(latencies.items()):
+        values.sort()
+        total += len(values)
+        total_errors += errors.get(name, 0)
+        scenarios[name] = {
+            'requests': len(values),
+            'errors': errors.get(name, 0),
+            'error_rate': round(errors.get(name, 0) / len(values), 4),
+            'throughput_rps': round(len(values) / elapsed, 2),
+            'p50_ms': round(percentile(values, 50) * 1000, 3),
+            'p95_ms': round(percentile(values, 95) * 1000, 3),
+            'p99_ms': round(percentile(values, 99) * 1000, 3),
+            'max_ms': round(values[-1] * 1000, 3),
+            'histogram': histogram(values),
+        }
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'requests': total,
+        'throughput_rps': round(total / elapsed, 2) if elapsed else 0,
+        'error_rate': round(total_errors / total, 4) if total else 0,
+        'db_locked': db_locked,
+        'scenarios': scenarios,
+    }
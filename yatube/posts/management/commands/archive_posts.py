@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.archive import (
+    DEFAULT_AGE_DAYS, DEFAULT_BATCH_SIZE, archive_posts, get_cutoff, pending
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит посты старше порога вместе с комментариями в архивные '
+        'таблицы. Работает пачками, прерванный запуск можно повторить'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=DEFAULT_AGE_DAYS,
+            help='Архивировать посты старше N дней'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE
+        )
+        parser.add_argument(
+            '--compress', action='store_true',
+            help='Сжимать тексты zlib'
+        )
+        parser.add_argument(
+            '--limit', type=int,
+            help='Перенести не больше N постов за запуск'
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0.0,
+            help='Пауза между пачками в секундах'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать посты, подлежащие архивации'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = get_cutoff(options['days'])
+        if options['dry_run']:
+            self.stdout.write(
+                f'К архивации: {pending(cutoff).count()} постов '
+                f'старше {cutoff:%Y-%m-%d}'
+            )
+            return
+        started = time.perf_counter()
+        posts, comments = archive_posts(
+            cutoff,
+            batch_size=options['batch_size'],
+            compress=options['compress'],
+            limit=options['limit'],
+            pause=options['pause'],
+            log=self.stdout.write if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'В архив перенесено {} постов и {} комментариев за {:.2f} с'
+            .format(posts, comments, time.perf_counter() - started)
+        ))
@@ -0,0 +1,136 @@
+import json
+import os
+import platform
+import subprocess
+from datetime import datetime
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from core.backup import online_backup
+from posts.benchmarks import ViewBenchmark, compare, parse_scale, use_database
+from posts.seeding import seed_database
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет отдельные базы на 10k/100k/1M постов и замеряет все '
+        'представления posts: пропускную способность, p50/p95/p99 и '
+        'количество SQL-запросов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales', default='10k,100k,1m',
+            help='Размеры баз через запятую, например 10k,100k,1m'
+        )
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Количество процессов для заполнения базы'
+        )
+        parser.add_argument(
+            '--views', default='',
+            help='Только перечисленные представления через запятую'
+        )
+        parser.add_argument(
+            '--db-dir', default='bench_data',
+            help='Каталог для баз бенчмарка, базы переиспользуются'
+        )
+        parser.add_argument(
+            '--warm-cache', action='store_true',
+            help='Не очищать кэш перед каждым запросом'
+        )
+        parser.add_argument(
+            '--output', default='',
+            help='Файл для результатов в JSON'
+        )
+        parser.add_argument(
+            '--compare', default='',
+            help='JSON предыдущего прогона для сравнения'
+        )
+
+    def log(self, message):
+        self.stdout.write(message)
+
+    def handle(self, *args, **options):
+        os.makedirs(options['db_dir'], exist_ok=True)
+        views = [view for view in options['views'].split(',') if view]
+        report = {
+            'revision': git_revision(),
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'requests': options['requests'],
+            'results': {},
+        }
+        for scale in options['scales'].split(','):
+            posts = parse_scale(scale)
+            path = os.path.abspath(os.path.join(
+                options['db_dir'], f'bench_{posts}_{options["seed"]}.sqlite3'
+            ))
+            fresh = not os.path.exists(path)
+            # виды записи меняют базу, поэтому каждый прогон идёт на копии
+            # и заполненная база остаётся одинаковой между прогонами
+            run_path = path.replace('.sqlite3', '.run.sqlite3')
+            with use_database(path):
+                if fresh:
+                    call_command('migrate', verbosity=0)
+                    self.log(self.style.MIGRATE_HEADING(
+                        f'Заполнение базы на {posts} постов'
+                    ))
+                    seed_database(
+                        posts, options['seed'], workers=options['workers'],
+                        log=self.log,
+                    )
+                online_backup(run_path)
+            try:
+                with use_database(run_path):
+                    benchmark = ViewBenchmark(
+                        options['requests'], options['seed'],
+                        options['warm_cache'],
+                    )
+                    results = benchmark.run(views)
+            finally:
+                for name in (run_path, run_path + '-wal', run_path + '-shm'):
+                    if os.path.exists(name):
+                        os.remove(name)
+            report['results'][scale] = results
+            self.print_results(scale, results)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if options['compare']:
+            with open(options['compare']) as file:
+                baseline = json.load(file)
+            self.log(self.style.MIGRATE_HEADING(
+                f'Сравнение с {baseline.get("revision")}'
+            ))
+            for row in compare(report, baseline):
+                self.log(
+                    '{scale:>6} {view:<18} p50 x{p50_ratio} '
+                    'запросов {queries_delta:+}'.format(**row)
+                )
+
+    def print_results(self, scale, results):
+        self.log(self.style.MIGRATE_HEADING(f'Масштаб {scale}'))
+        self.log('{:<18} {:>9} {:>9} {:>9} {:>9} {:>8}'.format(
+            'view', 'rps', 'p50 ms', 'p95 ms', 'p99 ms', 'queries'
+        ))
+        for view, result in results.items():
+            self.log(
+                '{view:<18} {throughput_rps:>9} {p50_ms:>9} {p95_ms:>9} '
+                '{p99_ms:>9} {queries_avg:>8}'.format(view=view, **result)
+            )
@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.sitemaps import build_sitemaps
+
+
+class Command(BaseCommand):
+    help = (
+        'Обновляет sitemap.xml и куски sitemap-*.xml.gz в SITEMAP_DIR. '
+        'Переписываются только куски, содержимое которых изменилось'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--base-url', default=settings.SITE_URL,
+            help='Адрес сайта для ссылок, по умолчанию SITE_URL'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=settings.SITEMAP_CHUNK_SIZE,
+            help='Диапазон id одного куска'
+        )
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Переписать все куски, не сверяясь с отпечатками'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written, skipped, removed = build_sitemaps(
+            options['base_url'],
+            size=options['chunk_size'],
+            full=options['full'],
+            log=self.stdout.write if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Кусков записано: {}, без изменений: {}, удалено: {} за {:.2f} с'
+            .format(written, skipped, removed, time.perf_counter() - started)
+        ))
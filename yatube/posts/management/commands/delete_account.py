@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.deletion import (
+    BATCH_SIZE, PAUSE, delete_group, delete_user, hide_user
+)
+from posts.models import Group, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет пользователя или группу пачками с фиксацией между ними, '
+        'не блокируя запись на сайте надолго'
+    )
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--user', help='username удаляемого аккаунта')
+        target.add_argument('--group', help='slug удаляемой группы')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--pause', type=float, default=PAUSE,
+            help='Пауза между пачками в секундах'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        batches = {
+            'batch_size': options['batch_size'], 'pause': options['pause']
+        }
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f'Нет пользователя {options["user"]}')
+            hide_user(user)
+            counts = delete_user(user.pk, **batches)
+        else:
+            group = Group.objects.filter(slug=options['group']).first()
+            if group is None:
+                raise CommandError(f'Нет группы {options["group"]}')
+            counts = delete_group(group.pk, **batches)
+        for name, count in counts.items():
+            self.stdout.write(f'{name}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            'Удалено за {:.1f} с'.format(time.perf_counter() - started)
+        ))
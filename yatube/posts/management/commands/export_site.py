@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.transfer import CHUNK_SIZE, export_site, open_stream
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает пользователей, группы, посты, комментарии и подписки '
+        'в NDJSON потоком, не загружая таблицы в память'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл выгрузки, по умолчанию stdout; .gz включает gzip'
+        )
+        parser.add_argument(
+            '--gzip', action='store_true', default=None,
+            help='Сжимать выгрузку gzip'
+        )
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with open_stream(options['path'], 'w', options['gzip']) as stream:
+            counts = export_site(stream, options['chunk_size'])
+        # stdout может быть занят самой выгрузкой
+        for label, count in counts.items():
+            self.stderr.write(f'{label}: {count}')
+        self.stderr.write(self.style.SUCCESS(
+            'Выгружено {} объектов за {:.2f} с'.format(
+                sum(counts.values()), time.perf_counter() - started
+            )
+        ))
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import Post, User
+from posts.transfer import CHUNK_SIZE, import_site, open_stream
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает выгрузку export_site пачками bulk_create в порядке '
+        'внешних ключей и копирует картинки постов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл выгрузки, по умолчанию stdin; gzip определяется сам'
+        )
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            '--media-from',
+            help='MEDIA_ROOT исходного сайта, откуда копировать картинки'
+        )
+
+    def handle(self, *args, **options):
+        if User.objects.exists() or Post.objects.exists():
+            raise CommandError(
+                'База не пуста: выгрузка переносит идентификаторы как есть'
+            )
+        started = time.perf_counter()
+        with open_stream(options['path'], 'r') as stream:
+            try:
+                counts = import_site(
+                    stream, options['chunk_size'], options['media_from']
+                )
+            except (ValueError, KeyError) as error:
+                raise CommandError(error)
+        for label, count in counts.items():
+            self.stdout.write(f'{label}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            'Загружено {} объектов за {:.2f} с'.format(
+                sum(counts.values()), time.perf_counter() - started
+            )
+        ))
@@ -0,0 +1,112 @@
+import json
+import multiprocessing
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from posts import loadtest
+
+
+def run_process(options, index):
+    scenarios = loadtest.Scenarios(
+        options['mix'], options['users'], options['seed'] + index
+    )
+    target = make_target(options['url'])
+    try:
+        (latencies, errors), elapsed = loadtest.run(
+            target, scenarios, options['threads'], options['duration']
+        )
+    finally:
+        target.close()
+    return dict(latencies), dict(errors), elapsed, target.db_locked
+
+
+def make_target(url):
+    if url:
+        return loadtest.HTTPTarget(url)
+    from yatube.wsgi import application
+    return loadtest.WSGITarget(application)
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест: смесь сценариев (лента, подписки, комментарии, '
+        'посты с картинками) в N потоках или процессах против WSGI-приложения '
+        'или запущенного сервера'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', default='',
+            help='Адрес запущенного сервера; по умолчанию WSGI-вызов напрямую'
+        )
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Количество процессов, в каждом --threads потоков'
+        )
+        parser.add_argument(
+            '--duration', type=float, default=10,
+            help='Длительность в секундах'
+        )
+        parser.add_argument(
+            '--mix', default='browse=70,feed=15,comment=10,post=5',
+            help='Веса сценариев browse, feed, comment, post'
+        )
+        parser.add_argument(
+            '--users', type=int, default=20,
+            help='Сколько пользователей с подписками использовать'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default='')
+
+    def handle(self, *args, **options):
+        try:
+            options['mix'] = loadtest.parse_mix(options['mix'])
+        except ValueError as error:
+            raise CommandError(error)
+        if options['processes'] > 1:
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with context.Pool(options['processes']) as pool:
+                parts = pool.starmap(run_process, [
+                    (options, index) for index in range(options['processes'])
+                ])
+        else:
+            parts = [run_process(options, 0)]
+        latencies, errors = loadtest.merge(
+            [(part[0], part[1]) for part in parts]
+        )
+        db_locked = None
+        if not options['url']:
+            db_locked = sum(part[3] for part in parts)
+        report = loadtest.summarize(
+            latencies, errors, max(part[2] for part in parts), db_locked
+        )
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+    def print_report(self, report):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            'Всего {requests} запросов за {elapsed_s} с: {throughput_rps} '
+            'rps, ошибок {error_rate:.2%}, database is locked: '
+            '{db_locked}'.format(**report)
+        ))
+        self.stdout.write('{:<10} {:>8} {:>8} {:>9} {:>9} {:>9} {:>9}'.format(
+            'scenario', 'reqs', 'rps', 'p50 ms', 'p95 ms', 'p99 ms', 'errors'
+        ))
+        for name, result in report['scenarios'].items():
+            self.stdout.write(
+                '{name:<10} {requests:>8} {throughput_rps:>8} {p50_ms:>9} '
+                '{p95_ms:>9} {p99_ms:>9} {errors:>9}'.format(
+                    name=name, **result
+                )
+            )
+        for name, result in report['scenarios'].items():
+            buckets = ' '.join(
+                f'{label}:{count}'
+                for label, count in result['histogram'].items() if count
+            )
+            self.stdout.write(f'{name:<10} {buckets}')
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.prerender import SECTIONS, render_paths, site_paths
+
+
+class Command(BaseCommand):
+    help = (
+        'Собирает анонимные страницы сайта в PRERENDER_DIR. Дальше их '
+        'обновляют обработчики очереди по сигналам изменений'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*',
+            help='Собрать только эти пути, например /posts/1/'
+        )
+        parser.add_argument(
+            '--only', nargs='+', choices=SECTIONS, default=SECTIONS,
+            help='Разделы сайта для полной сборки'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        statuses = render_paths(
+            options['paths'] or site_paths(options['only']),
+            log=self.stdout.write if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Собрано страниц: {}, пропущено: {} за {:.2f} с'.format(
+                statuses.pop(200, 0), sum(statuses.values()),
+                time.perf_counter() - started,
+            )
+        ))
@@ -0,0 +1,84 @@
+import time
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.benchmarks import parse_scale
+from posts.models import Post, User
+from posts.seeding import SEED_EPOCH, seed_database
+
+
+def parse_now(value):
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Неверная дата: {value}')
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует пользователей, группы, посты, комментарии и подписки '
+        'со степенным распределением подписчиков'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', default='100k', help='Количество постов: 100k, 1m'
+        )
+        parser.add_argument('--users', type=parse_scale)
+        parser.add_argument('--groups', type=parse_scale)
+        parser.add_argument('--comments', type=parse_scale)
+        parser.add_argument(
+            '--follows-per-user', type=int,
+            help='Среднее количество подписок пользователя'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Количество процессов, пишущих свои диапазоны id'
+        )
+        parser.add_argument('--chunk-size', type=int, default=10000)
+        parser.add_argument(
+            '--images', type=float, default=0.0,
+            help='Доля постов с картинкой-заглушкой, например 0.1'
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней распределить даты публикации'
+        )
+        parser.add_argument(
+            '--now', type=parse_now, default=SEED_EPOCH,
+            help='Дата последнего поста, например 2025-01-01 (UTC)'
+        )
+
+    def handle(self, *args, **options):
+        if User.objects.exists() or Post.objects.exists():
+            raise CommandError(
+                'База не пуста: seed задаёт идентификаторы явно'
+            )
+        overrides = {
+            key: options[key]
+            for key in ('users', 'groups', 'comments', 'follows_per_user')
+            if options[key] is not None
+        }
+        started = time.perf_counter()
+        counts = seed_database(
+            parse_scale(options['posts']),
+            seed=options['seed'],
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            images=options['images'],
+            days=options['days'],
+            now=options['now'],
+            log=self.stdout.write,
+            **overrides,
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            'Готово за {:.1f} с: {} постов ({:.0f} в секунду)'.format(
+                elapsed, counts['posts'], counts['posts'] / elapsed
+            )
+        ))
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_post_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Stamp',
+            fields=[
+                ('key', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Ключ')),
+                ('value', models.CharField(max_length=32, verbose_name='Значение')),
+                ('changed', models.DateTimeField(verbose_name='Изменена')),
+            ],
+            options={
+                'verbose_name': 'Метка версии',
+                'verbose_name_plural': 'Метки версий',
+            },
+        ),
+    ]
@@ -1,3 +1,5 @@
+import zlib
+
 from django.contrib.auth import get_user_model
 from django.db import models
 
@@ -25,6 +27,12 @@ class Post(models.Model):
     pub_date = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True,
+        db_index=True,
+    )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+        db_index=True,
     )
     author = models.ForeignKey(
         User,
@@ -105,3 +113,112 @@ class Follow(models.Model):
                 name='author_not_user'
             )
         ]
+
+
+def pack_text(text: str, compress: bool = False):
+    """Возвращает (body, compressed); сжатие остаётся, только если выгодно."""
+    data = text.encode()
+    if compress:
+        packed = zlib.compress(data, 6)
+        if len(packed) < len(data):
+            return packed, True
+    return data, False
+
+
+def unpack_text(body, compressed: bool) -> str:
+    data = bytes(body)
+    if compressed:
+        data = zlib.decompress(data)
+    return data.decode()
+
+
+class ArchivedText(models.Model):
+    """Текст, который при архивации может быть сжат zlib."""
+    body = models.BinaryField('Текст')
+    compressed = models.BooleanField('Сжат zlib', default=False)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def text(self) -> str:
+        return unpack_text(self.body, self.compressed)
+
+
+class ArchivedPost(ArchivedText):
+    """
+    Холодная часть ленты: посты старше порога переносятся сюда вместе с
+    комментариями и сохраняют исходный id, чтобы ссылки не ломались.
+    """
+    id = models.IntegerField(primary_key=True)
+    pub_date = models.DateTimeField('Дата публикации')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Автор',
+        related_name='archived_posts'
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='archived_posts',
+        verbose_name='Группа',
+    )
+    image = models.ImageField(
+        'Картинка',
+        upload_to='posts/',
+        blank=True,
+    )
+    archived = models.DateTimeField('Дата архивации', auto_now_add=True)
+
+    is_archived = True
+
+    def __str__(self) -> str:
+        return self.text[:15]
+
+    class Meta:
+        ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['author', '-pub_date']),
+        ]
+        verbose_name = 'Архивный пост'
+        verbose_name_plural = 'Архивные посты'
+
+
+class ArchivedComment(ArchivedText):
+    id = models.IntegerField(primary_key=True)
+    created = models.DateTimeField('Дата публикации')
+    post = models.ForeignKey(
+        ArchivedPost,
+        related_name='comments',
+        on_delete=models.CASCADE,
+        verbose_name='Пост'
+    )
+    author = models.ForeignKey(
+        User,
+        related_name='archived_comments',
+        on_delete=models.CASCADE,
+        verbose_name='Автор'
+    )
+
+    class Meta:
+        ordering = ['created']
+        verbose_name = 'Архивный комментарий'
+        verbose_name_plural = 'Архивные комментарии'
+
+
+class Stamp(models.Model):
+    """
+    Метка версии страниц для ETag и ключей кэша. Лежит в базе, а не в
+    локальном кэше процесса, чтобы изменение, обработанное одним
+    воркером, меняло ETag у всех.
+    """
+    key = models.CharField('Ключ', max_length=100, primary_key=True)
+    value = models.CharField('Значение', max_length=32)
+    changed = models.DateTimeField('Изменена')
+
+    class Meta:
+        verbose_name = 'Метка версии'
+        verbose_name_plural = 'Метки версий'
@@ -0,0 +1,79 @@
+from django.urls import reverse
+
+from core import prerender as pages
+
+from .conditions import INDEX_CONTENT_KEY, bump_stamp
+from .models import ArchivedPost, Group, Post, User
+
+STATIC_PAGES = ('about:author', 'about:tech')
+SECTIONS = ('index', 'about', 'groups', 'profiles', 'posts')
+
+
+def index_path():
+    return reverse('posts:index')
+
+
+def group_path(slug):
+    return reverse('posts:group_list', args=(slug,))
+
+
+def profile_path(username):
+    return reverse('posts:profile', args=(username,))
+
+
+def post_path(post_id):
+    return reverse('posts:post_detail', args=(post_id,))
+
+
+def post_paths(queryset):
+    """Страницы постов горячей и архивной таблиц потоком по id."""
+    for model in (Post, ArchivedPost):
+        ids = queryset(model).order_by('pk').values_list('pk', flat=True)
+        for post_id in ids.iterator():
+            yield post_path(post_id)
+
+
+def site_paths(sections=SECTIONS):
+    """Все анонимные страницы сайта, которые можно собрать заранее."""
+    if 'index' in sections:
+        yield index_path()
+    if 'about' in sections:
+        for name in STATIC_PAGES:
+            yield reverse(name)
+    if 'groups' in sections:
+        slugs = Group.objects.order_by('pk').values_list('slug', flat=True)
+        for slug in slugs.iterator():
+            yield group_path(slug)
+    if 'profiles' in sections:
+        names = User.objects.filter(is_active=True).order_by('pk')
+        for username in names.values_list('username', flat=True).iterator():
+            yield profile_path(username)
+    if 'posts' in sections:
+        yield from post_paths(
+            lambda model: model.objects.filter(author__is_active=True)
+        )
+
+
+def author_paths(author_id):
+    # на странице поста число постов автора, оно меняется с каждым постом
+    return post_paths(lambda model: model.objects.filter(author_id=author_id))
+
+
+def group_post_paths(group_id):
+    # на странице поста название и ссылка группы
+    return post_paths(lambda model: model.objects.filter(group_id=group_id))
+
+
+def render_paths(paths, log=None):
+    """Собирает страницы по списку путей. Возвращает {код ответа: число}."""
+    statuses = {}
+    index = index_path()
+    for path in paths:
+        if path == index:
+            # cache_page главной в этом процессе мог не видеть изменения
+            bump_stamp(INDEX_CONTENT_KEY)
+        status = pages.render(path)
+        statuses[status] = statuses.get(status, 0) + 1
+        if log:
+            log(f'{status} {path}')
+    return statuses
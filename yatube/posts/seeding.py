@@ -0,0 +1,249 @@
+import itertools
+import multiprocessing
+import os
+import random
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections, transaction
+
+from .models import Comment, Follow, Group, Post, User
+
+SEED_PASSWORD = 'yatube-seed'
+PLACEHOLDER_COUNT = 16
+# конец интервала дат по умолчанию: с фиксированной точкой отсчёта
+# одинаковый seed даёт одинаковые строки в любой день
+SEED_EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+_state = {}
+
+
+def scale_counts(posts):
+    return {
+        'posts': posts,
+        'users': max(10, posts // 20),
+        'groups': max(2, posts // 2000),
+        'comments': posts // 2,
+        'follows_per_user': 10,
+    }
+
+
+def zipf_weights(size, exponent=1.1):
+    """Накопленные веса степенного распределения популярности."""
+    return list(itertools.accumulate(
+        1 / (rank ** exponent) for rank in range(1, size + 1)
+    ))
+
+
+def bulk_insert(model, objects):
+    # размер пачки INSERT подбирает бэкенд: у SQLite есть лимит параметров
+    with transaction.atomic():
+        model.objects.bulk_create(objects)
+
+
+@contextmanager
+def raw_dates(models):
+    """Отключает auto_now/auto_now_add, чтобы сохранить заданные даты."""
+    patched = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(
+                field, 'auto_now_add', False
+            ):
+                patched.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in patched:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def post_date(post_id):
+    return _state['first_date'] + _state['span'] * (
+        post_id / _state['counts']['posts']
+    )
+
+
+def chunk_rng(table, start):
+    # генератор на каждый диапазон: результат не зависит от числа процессов
+    return random.Random(f'{_state["seed"]}-{table}-{start}')
+
+
+def make_placeholders(count=PLACEHOLDER_COUNT):
+    from PIL import Image
+
+    directory = os.path.join(settings.MEDIA_ROOT, 'posts', 'seed')
+    os.makedirs(directory, exist_ok=True)
+    names = []
+    rng = random.Random(0)
+    for index in range(count):
+        name = f'posts/seed/placeholder_{index}.png'
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        if not os.path.exists(path):
+            color = tuple(rng.randrange(256) for _ in range(3))
+            Image.new('RGB', (960, 339), color).save(path, 'PNG')
+        names.append(name)
+    return names
+
+
+def seed_users(start, stop):
+    password = _state['password']
+    bulk_insert(User, [
+        User(id=user_id, username=f'user{user_id}', password=password,
+             first_name='Пользователь', last_name=str(user_id),
+             email=f'user{user_id}@example.com',
+             date_joined=_state['first_date'])
+        for user_id in range(start, stop)
+    ])
+
+
+def seed_groups(start, stop):
+    bulk_insert(Group, [
+        Group(id=group_id, title=f'Группа {group_id}',
+              slug=f'group-{group_id}', description='Описание группы')
+        for group_id in range(start, stop)
+    ])
+
+
+def seed_posts(start, stop):
+    rng = chunk_rng('posts', start)
+    counts = _state['counts']
+    user_ids = range(1, counts['users'] + 1)
+    authors = rng.choices(
+        user_ids, cum_weights=_state['popularity'], k=stop - start
+    )
+    images = _state['images']
+    posts = []
+    for post_id, author_id in zip(range(start, stop), authors):
+        has_image = images and rng.random() < _state['image_ratio']
+        posts.append(Post(
+            id=post_id,
+            author_id=author_id,
+            group_id=(rng.randint(1, counts['groups'])
+                      if rng.random() < 0.7 else None),
+            text=f'Пост {post_id} пользователя {author_id}',
+            pub_date=post_date(post_id),
+            updated=post_date(post_id),
+            image=rng.choice(images) if has_image else '',
+        ))
+    with raw_dates((Post,)):
+        bulk_insert(Post, posts)
+
+
+def seed_comments(start, stop):
+    rng = chunk_rng('comments', start)
+    counts = _state['counts']
+    comments = []
+    for comment_id in range(start, stop):
+        post_id = rng.randint(1, counts['posts'])
+        comments.append(Comment(
+            id=comment_id,
+            post_id=post_id,
+            author_id=rng.randint(1, counts['users']),
+            text=f'Комментарий {comment_id}',
+            # в течение суток после поста
+            created=post_date(post_id) + timedelta(
+                seconds=rng.randint(60, 86400)
+            ),
+        ))
+    with raw_dates((Comment,)):
+        bulk_insert(Comment, comments)
+
+
+def seed_follows(start, stop):
+    """Число подписок у пользователя и популярность авторов - по Парето."""
+    rng = chunk_rng('follows', start)
+    counts = _state['counts']
+    user_ids = range(1, counts['users'] + 1)
+    mean = counts['follows_per_user']
+    follows = []
+    for user_id in range(start, stop):
+        amount = min(len(user_ids) - 1,
+                     int(rng.paretovariate(1.5) * mean / 3))
+        authors = set(rng.choices(
+            user_ids, cum_weights=_state['popularity'], k=amount
+        ))
+        authors.discard(user_id)
+        follows.extend(
+            Follow(user_id=user_id, author_id=author_id)
+            for author_id in sorted(authors)
+        )
+    bulk_insert(Follow, follows)
+
+
+SEEDERS = {
+    'users': seed_users,
+    'groups': seed_groups,
+    'posts': seed_posts,
+    'comments': seed_comments,
+    'follows': seed_follows,
+}
+
+
+def run_chunk(table, start, stop):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout = 60000')
+    SEEDERS[table](start, stop)
+    return table, stop - start
+
+
+def chunks(table, total, size):
+    return [
+        (table, start, min(start + size, total + 1))
+        for start in range(1, total + 1, size)
+    ]
+
+
+def seed_database(posts, seed=0, chunk_size=10000, workers=1, images=0.0,
+                  days=365, now=SEED_EPOCH, log=print, **overrides):
+    """
+    Заполняет пустую базу. Идентификаторы и даты задаются явно, каждая
+    пачка пишет свой диапазон, поэтому одинаковый seed даёт одинаковые
+    данные при любом количестве процессов и в любой день.
+    """
+    counts = {**scale_counts(posts), **overrides}
+    _state.update(
+        seed=seed,
+        counts=counts,
+        password=make_password(SEED_PASSWORD, salt='yatubeseed'),
+        popularity=zipf_weights(counts['users']),
+        images=make_placeholders() if images else [],
+        image_ratio=images,
+        first_date=now - timedelta(days=days),
+        span=timedelta(days=days),
+    )
+    phases = (
+        ('users', 'groups'),
+        ('posts',),
+        ('comments', 'follows'),
+    )
+    pool = None
+    if workers > 1:
+        connections.close_all()
+        pool = multiprocessing.get_context('fork').Pool(workers)
+    try:
+        for phase in phases:
+            tasks = []
+            for table in phase:
+                total = counts[table] if table != 'follows' else (
+                    counts['users']
+                )
+                size = chunk_size if table != 'follows' else max(
+                    1, chunk_size // counts['follows_per_user']
+                )
+                tasks.extend(chunks(table, total, size))
+                log(f'{table}: {total}')
+            if pool is None:
+                for task in tasks:
+                    run_chunk(*task)
+            else:
+                pool.starmap(run_chunk, tasks)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return counts
@@ -0,0 +1,169 @@
+from django.conf import settings
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from .conditions import (
+    INDEX_CONTENT_KEY, INDEX_REMOVAL_KEY, RELATED_KEY, bump_stamp
+)
+from .models import ArchivedPost, Comment, Group, Post, User
+from .prerender import group_path, index_path, post_path, profile_path
+from .tasks import schedule_prerender
+
+# поля пользователя, видимые в карточках постов и профиле
+INDEX_USER_FIELDS = {'is_active', 'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Post)
+def index_content_changed(sender, instance, **kwargs):
+    bump_stamp(INDEX_CONTENT_KEY)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=ArchivedPost)
+def index_removal_changed(sender, instance, **kwargs):
+    bump_stamp(INDEX_REMOVAL_KEY)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    # название и описание группы видны и на страницах постов
+    bump_stamp(INDEX_REMOVAL_KEY)
+    bump_stamp(RELATED_KEY)
+
+
+@receiver(post_save, sender=User)
+def index_author_changed(sender, instance, update_fields=None, **kwargs):
+    # вход сохраняет last_login, страницы от него не меняются
+    if update_fields is None or INDEX_USER_FIELDS & set(update_fields):
+        bump_stamp(INDEX_REMOVAL_KEY)
+        bump_stamp(RELATED_KEY)
+
+
+# Какие готовые страницы устаревают при изменении объекта. Сами
+# страницы собирает очередь; без PRERENDER_ENABLED сигналы молчат.
+
+
+@receiver(pre_save, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    # пост, перенесённый в другую группу, пропадает со старой страницы
+    if settings.PRERENDER_ENABLED and instance.pk:
+        instance._previous_group = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group__slug', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, created=False, **kwargs):
+    if not settings.PRERENDER_ENABLED:
+        return
+    paths = {post_path(instance.pk), index_path()}
+    for slug in (
+        instance.group and instance.group.slug,
+        getattr(instance, '_previous_group', None),
+    ):
+        if slug:
+            paths.add(group_path(slug))
+    # правка не меняет число постов автора на страницах других его постов
+    counted = created or kwargs['signal'] is post_delete
+    schedule_prerender(
+        paths, authors=(instance.author_id,) if counted else (),
+        profiles=(instance.author_id,),
+    )
+
+
+@receiver(post_delete, sender=ArchivedPost)
+def archived_post_deleted(sender, instance, **kwargs):
+    # удаление пачкой шлёт сигнал на каждый пост: автора не загружаем
+    if not settings.PRERENDER_ENABLED:
+        return
+    schedule_prerender(
+        {post_path(instance.pk)},
+        authors=(instance.author_id,), profiles=(instance.author_id,),
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    schedule_prerender({post_path(instance.post_id)})
+
+
+@receiver(pre_save, sender=Group)
+def remember_slug(sender, instance, **kwargs):
+    if settings.PRERENDER_ENABLED and instance.pk:
+        instance._previous_slug = Group.objects.filter(
+            pk=instance.pk
+        ).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    paths = {group_path(instance.slug), index_path()}
+    previous = getattr(instance, '_previous_slug', None)
+    if previous and previous != instance.slug:
+        paths.add(group_path(previous))
+    schedule_prerender(
+        paths, groups=() if created else (instance.pk,)
+    )
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_posts(sender, instance, **kwargs):
+    # после удаления посты уже не найти по группе
+    if settings.PRERENDER_ENABLED:
+        instance._post_paths = [
+            post_path(post_id)
+            for model in (Post, ArchivedPost)
+            for post_id in model.objects.filter(
+                group_id=instance.pk
+            ).values_list('pk', flat=True).iterator()
+        ]
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    schedule_prerender(
+        {group_path(instance.slug), index_path()}
+        | set(getattr(instance, '_post_paths', ()))
+    )
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, update_fields=None, **kwargs):
+    # вход сохраняет только last_login, имя при этом не читаем
+    if not settings.PRERENDER_ENABLED or not instance.pk or (
+        update_fields is not None and 'username' not in update_fields
+    ):
+        return
+    instance._previous_username = User.objects.filter(
+        pk=instance.pk
+    ).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    # скрытый или переименованный аккаунт должен пропасть со всех
+    # готовых страниц сразу, вместе со старым адресом профиля
+    if created or not settings.PRERENDER_ENABLED:
+        return
+    previous = getattr(instance, '_previous_username', None)
+    renamed = previous is not None and previous != instance.username
+    if instance.is_active and not renamed:
+        return
+    paths = {profile_path(instance.username), index_path()}
+    if renamed:
+        paths.add(profile_path(previous))
+    for related in ('posts__author', 'archived_posts__author'):
+        paths.update(
+            group_path(slug) for slug in Group.objects.filter(
+                **{related: instance}
+            ).values_list('slug', flat=True).distinct()
+        )
+    schedule_prerender(
+        paths,
+        authors=(instance.pk,),
+    )
@@ -0,0 +1,234 @@
+import gzip
+import hashlib
+import heapq
+import io
+import json
+import os
+import tempfile
+from collections import defaultdict
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, ExpressionWrapper, F, IntegerField, Max
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import ArchivedPost, Group, Post, User
+
+INDEX_NAME = 'sitemap.xml'
+MANIFEST_NAME = 'manifest.json'
+XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+# подставляется в reverse вместо аргумента: годится и для int, и для slug
+PLACEHOLDER = 1234567890
+
+
+def post_sources():
+    # архивный пост живёт по тому же адресу и с тем же id, что и горячий
+    return (
+        (Post.objects.filter(author__is_active=True), 'id', 'updated'),
+        (
+            ArchivedPost.objects.filter(author__is_active=True),
+            'id', 'archived',
+        ),
+    )
+
+
+def group_sources():
+    return ((Group.objects.all(), 'slug', None),)
+
+
+def profile_sources():
+    return ((User.objects.filter(is_active=True), 'username', None),)
+
+
+# раздел: (источники, имя url). Источник - queryset, столбец аргумента
+# url и столбец версии; без версии отпечаток считается по самим строкам
+SECTIONS = {
+    'posts': (post_sources, 'posts:post_detail'),
+    'groups': (group_sources, 'posts:group_list'),
+    'profiles': (profile_sources, 'posts:profile'),
+}
+
+
+def chunk_name(section, chunk):
+    return f'sitemap-{section}-{chunk:04d}.xml.gz'
+
+
+def fingerprints(sources, size, base_url):
+    """
+    Отпечаток и дата каждого куска раздела. Куски - диапазоны id по size,
+    так что правка задевает ровно один кусок. Для таблиц с версией это
+    один GROUP BY на таблицу, остальные читаются потоком по id.
+    """
+    parts = defaultdict(list)
+    lastmod = {}
+    for number, (queryset, column, version) in enumerate(sources):
+        if version:
+            rows = queryset.annotate(chunk=ExpressionWrapper(
+                F('pk') / size, output_field=IntegerField()
+            )).values('chunk').annotate(
+                count=Count('pk'), newest=Max('pk'), version=Max(version),
+            ).order_by('chunk')
+            for row in rows:
+                chunk = row['chunk']
+                parts[chunk].append(
+                    f"{number}:{row['count']}-{row['newest']}-"
+                    f"{row['version'].isoformat()}"
+                )
+                lastmod[chunk] = max(
+                    row['version'], lastmod.get(chunk, row['version'])
+                )
+            continue
+        digests = {}
+        for pk, value in queryset.order_by('pk').values_list(
+            'pk', column
+        ).iterator():
+            digests.setdefault(pk // size, hashlib.md5()).update(
+                f'{pk}:{value};'.encode()
+            )
+        for chunk, digest in digests.items():
+            parts[chunk].append(f'{number}:{digest.hexdigest()}')
+    return {
+        chunk: hashlib.md5(
+            ':'.join([base_url, str(size)] + chunk_parts).encode()
+        ).hexdigest()
+        for chunk, chunk_parts in parts.items()
+    }, lastmod
+
+
+def chunk_rows(sources, chunk, size):
+    """Строки куска всех источников, слитые по id."""
+    streams = []
+    for queryset, column, version in sources:
+        columns = ('pk', column) + ((version,) if version else ())
+        streams.append(
+            queryset.filter(pk__gte=chunk * size, pk__lt=(chunk + 1) * size)
+            .order_by('pk').values_list(*columns).iterator()
+        )
+    return heapq.merge(*streams, key=lambda row: row[0])
+
+
+def atomic_open(path, mode='wb'):
+    handle, temp = tempfile.mkstemp(
+        dir=os.path.dirname(path), suffix='.tmp'
+    )
+    os.chmod(temp, 0o644)
+    return os.fdopen(handle, mode), temp
+
+
+def write_chunk(path, rows, base_url, url_name):
+    """
+    Пишет кусок сразу в gzip, строку за строкой. mtime=0 делает файл
+    одинаковым при одинаковом содержимом. Возвращает число адресов.
+    """
+    template = base_url + reverse(url_name, args=(PLACEHOLDER,))
+    head, tail = template.split(str(PLACEHOLDER))
+    raw, temp = atomic_open(path)
+    count = 0
+    try:
+        with raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as packed:
+            with io.TextIOWrapper(packed, encoding='utf-8') as output:
+                output.write(
+                    '<?xml version="1.0" encoding="UTF-8"?>\n'
+                    f'<urlset xmlns="{XMLNS}">\n'
+                )
+                for row in rows:
+                    loc = escape(
+                        head + quote(str(row[1]), safe="!$&'()*+,;=~:@")
+                        + tail
+                    )
+                    output.write(f'<url><loc>{loc}</loc>')
+                    if len(row) > 2:
+                        output.write(
+                            '<lastmod>'
+                            f"{row[2].isoformat(timespec='seconds')}"
+                            '</lastmod>'
+                        )
+                    output.write('</url>\n')
+                    count += 1
+                output.write('</urlset>\n')
+        os.replace(temp, path)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+    return count
+
+
+def write_index(path, chunks, base_url):
+    raw, temp = atomic_open(path, 'w')
+    with raw:
+        raw.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<sitemapindex xmlns="{XMLNS}">\n'
+        )
+        for name, entry in sorted(chunks.items()):
+            raw.write(
+                f'<sitemap><loc>{escape(base_url)}/{name}</loc>'
+                f"<lastmod>{entry['lastmod']}</lastmod></sitemap>\n"
+            )
+        raw.write('</sitemapindex>\n')
+    os.replace(temp, path)
+
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME)) as manifest:
+            return json.load(manifest)
+    except FileNotFoundError:
+        return {}
+
+
+def build_sitemaps(base_url, size=None, full=False, log=None):
+    """
+    Обновляет индекс и куски в SITEMAP_DIR. Переписываются только куски
+    с изменившимся отпечатком (или все при full), исчезнувшие удаляются.
+    Возвращает (записано, пропущено, удалено).
+    """
+    size = size or settings.SITEMAP_CHUNK_SIZE
+    base_url = base_url.rstrip('/')
+    directory = settings.SITEMAP_DIR
+    os.makedirs(directory, exist_ok=True)
+    previous = {} if full else read_manifest(directory)
+    chunks = {}
+    written = skipped = 0
+    for section, (get_sources, url_name) in SECTIONS.items():
+        sources = get_sources()
+        prints, lastmod = fingerprints(sources, size, base_url)
+        for chunk, fingerprint in sorted(prints.items()):
+            name = chunk_name(section, chunk)
+            path = os.path.join(directory, name)
+            known = previous.get(name)
+            if (
+                known and known['fingerprint'] == fingerprint
+                and os.path.exists(path)
+            ):
+                chunks[name] = known
+                skipped += 1
+                continue
+            urls = write_chunk(
+                path, chunk_rows(sources, chunk, size), base_url, url_name
+            )
+            chunks[name] = {
+                'fingerprint': fingerprint,
+                'urls': urls,
+                'lastmod': lastmod.get(chunk, timezone.now()).isoformat(
+                    timespec='seconds'
+                ),
+            }
+            written += 1
+            if log:
+                log(f'{name}: {urls} адресов')
+    removed = 0
+    for name in set(read_manifest(directory)) - set(chunks):
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+        removed += 1
+    write_index(os.path.join(directory, INDEX_NAME), chunks, base_url)
+    raw, temp = atomic_open(os.path.join(directory, MANIFEST_NAME), 'w')
+    with raw:
+        json.dump(chunks, raw, indent=1, sort_keys=True)
+    os.replace(temp, os.path.join(directory, MANIFEST_NAME))
+    return written, skipped, removed
@@ -0,0 +1,136 @@
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from sorl.thumbnail import get_thumbnail
+
+from core.models import Task
+from core.task_queue import enqueue, task
+
+from . import deletion, prerender
+from .models import Post, User
+
+# должно совпадать с тегом thumbnail в includes/post.html и post_detail.html
+THUMBNAILS = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+
+
+@task(priority=5)
+def warm_thumbnails(post_id):
+    """Готовит миниатюры заранее, чтобы их не резал первый зритель."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    for geometry, options in THUMBNAILS:
+        get_thumbnail(post.image, geometry, **options)
+
+
+@task(priority=-10, max_attempts=5)
+def delete_user(user_id):
+    deletion.delete_user(user_id)
+
+
+@task(priority=-10, max_attempts=5)
+def delete_group(group_id):
+    deletion.delete_group(group_id)
+
+
+@task(priority=-5)
+def prerender_pages(paths):
+    prerender.render_paths(paths)
+
+
+@task(priority=-8)
+def prerender_author(author_id):
+    prerender.render_paths(prerender.author_paths(author_id))
+
+
+@task(priority=-8)
+def prerender_group(group_id):
+    prerender.render_paths(prerender.group_post_paths(group_id))
+
+
+_pending = threading.local()
+
+
+def schedule_prerender(paths=(), authors=(), groups=(), profiles=()):
+    """
+    Копит затронутые страницы до конца транзакции и ставит их одной
+    задачей: архивация пачки постов даёт одну задачу, а не сотню.
+    Страницы постов автора и группы собираются отдельными задачами
+    с dedupe_key, серия правок схлопывается в одну. Профили передаются
+    id авторов, имена для них читаются одним запросом при отправке.
+    """
+    if not settings.PRERENDER_ENABLED:
+        return
+    if not hasattr(_pending, 'paths'):
+        reset_pending()
+    _pending.paths.update(paths)
+    _pending.authors.update(authors)
+    _pending.groups.update(groups)
+    _pending.profiles.update(profiles)
+    # откат транзакции теряет колбэк, но не накопленное: уйдёт со следующим
+    transaction.on_commit(flush_prerender)
+
+
+def reset_pending():
+    _pending.paths, _pending.authors = set(), set()
+    _pending.groups, _pending.profiles = set(), set()
+
+
+def enqueue_collapsed(func, object_id, dedupe_key):
+    # уже идущая задача могла пройти изменённую страницу, нужна ещё одна
+    queued = enqueue(func, object_id, dedupe_key=dedupe_key)
+    if queued.status == Task.RUNNING:
+        enqueue(func, object_id)
+
+
+def flush_prerender():
+    if not hasattr(_pending, 'paths'):
+        return
+    paths, authors, groups = _pending.paths, _pending.authors, _pending.groups
+    profiles = _pending.profiles
+    reset_pending()
+    paths.update(
+        prerender.profile_path(username)
+        for username in User.objects.filter(
+            pk__in=profiles
+        ).values_list('username', flat=True)
+    )
+    if paths:
+        enqueue(prerender_pages, sorted(paths))
+    for author_id in sorted(authors):
+        enqueue_collapsed(
+            prerender_author, author_id, f'prerender-author-{author_id}'
+        )
+    for group_id in sorted(groups):
+        enqueue_collapsed(
+            prerender_group, group_id, f'prerender-group-{group_id}'
+        )
+
+
+def schedule_thumbnails(post):
+    if post.image:
+        enqueue(
+            warm_thumbnails, post.pk, dedupe_key=f'thumbnails-{post.pk}'
+        )
+
+
+def publish_post(post):
+    """Пост и задача миниатюр пишутся вместе, одним обращением к писателю."""
+    with transaction.atomic():
+        post.save()
+        schedule_thumbnails(post)
+
+
+def schedule_user_deletion(user):
+    """Аккаунт скрывается сразу, удаление идёт в обработчике очереди."""
+    deletion.hide_user(user)
+    return enqueue(delete_user, user.pk, dedupe_key=f'delete-user-{user.pk}')
+
+
+def schedule_group_deletion(group):
+    return enqueue(
+        delete_group, group.pk, dedupe_key=f'delete-group-{group.pk}'
+    )
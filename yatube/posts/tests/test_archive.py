@@ -0,0 +1,109 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.archive import archive_posts, get_cutoff
+from posts.models import (
+    ArchivedComment, ArchivedPost, Comment, Group, Post, User
+)
+from posts.utils import ChainedQuerySets
+
+
+class ArchiveTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', slug='archive-group', description='Описание'
+        )
+        self.old = []
+        for number in range(12):
+            post = Post.objects.create(
+                author=self.author,
+                group=self.group,
+                text=f'Старый пост {number} ' + 'текст ' * 20,
+            )
+            Post.objects.filter(id=post.id).update(
+                pub_date=timezone.now() - timedelta(days=400 + number)
+            )
+            self.old.append(post)
+        self.comment = Comment.objects.create(
+            post=self.old[0], author=self.author, text='Комментарий'
+        )
+        self.fresh = Post.objects.create(
+            author=self.author, group=self.group, text='Свежий пост'
+        )
+        self.client = Client()
+
+    def test_archive_moves_old_posts_and_comments(self):
+        """Старые посты и комментарии переносятся в архив пачками"""
+        posts, comments = archive_posts(
+            get_cutoff(365), batch_size=5, compress=True
+        )
+        self.assertEqual((posts, comments), (12, 1))
+        self.assertEqual(list(Post.objects.all()), [self.fresh])
+        self.assertFalse(Comment.objects.exists())
+        archived = ArchivedPost.objects.get(id=self.old[0].id)
+        self.assertTrue(archived.compressed)
+        self.assertEqual(archived.text, self.old[0].text)
+        self.assertEqual(
+            ArchivedComment.objects.get(id=self.comment.id).text,
+            'Комментарий'
+        )
+
+    def test_archive_command_is_resumable(self):
+        """Повторный запуск команды продолжает с места остановки"""
+        call_command('archive_posts', days=365, limit=5, stdout=StringIO())
+        self.assertEqual(ArchivedPost.objects.count(), 5)
+        call_command('archive_posts', days=365, stdout=StringIO())
+        self.assertEqual(ArchivedPost.objects.count(), 12)
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_newest_post_is_never_archived(self):
+        """Самый свежий по id пост остаётся в горячей таблице"""
+        archive_posts(timezone.now() + timedelta(days=1))
+        self.assertEqual(list(Post.objects.all()), [self.fresh])
+
+    def test_views_read_archive(self):
+        """Страница поста и профиль читают и горячие, и архивные посты"""
+        archive_posts(get_cutoff(365))
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.old[0].id,))
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['is_archived'])
+        self.assertEqual(response.context['posts_count'], 13)
+        self.assertContains(response, 'Комментарий')
+        response = self.client.get(
+            reverse('posts:profile', args=(self.author.username,)),
+            {'page': 2},
+        )
+        page = response.context['page_obj']
+        self.assertEqual(page.paginator.count, 13)
+        self.assertEqual(
+            [post.id for post in page],
+            [post.id for post in self.old[9:]],
+        )
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [self.fresh]
+        )
+
+    def test_chained_querysets_slices(self):
+        """Срез цепочки queryset переходит через границу таблиц"""
+        archive_posts(get_cutoff(365))
+        chain = ChainedQuerySets(
+            self.author.posts.all(), self.author.archived_posts.all()
+        )
+        self.assertEqual(len(chain), 13)
+        self.assertEqual(
+            [post.id for post in chain[0:3]],
+            [self.fresh.id, self.old[0].id, self.old[1].id],
+        )
+        self.assertEqual(chain[12].id, self.old[11].id)
@@ -0,0 +1,258 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from posts import loadtest, transfer
+from posts.archive import archive_posts
+from posts.benchmarks import ViewBenchmark, parse_scale, percentile
+from posts.conditions import RELATED_KEY
+from posts.models import Comment, Follow, Group, Post, Stamp, User
+from posts.seeding import SEED_EPOCH, scale_counts, seed_database
+from yatube.wsgi import application
+
+
+class SeedingTest(TestCase):
+
+    def test_seed_database(self):
+        """Заполнение создаёт заданное количество объектов"""
+        counts = seed_database(200, seed=1, log=lambda message: None)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(User.objects.count(), counts['users'])
+        self.assertEqual(Comment.objects.count(), counts['comments'])
+        self.assertTrue(Follow.objects.exists())
+        self.assertFalse(
+            Follow.objects.filter(user_id=F('author_id')).exists()
+        )
+
+    def test_seed_pub_dates_follow_ids(self):
+        """Даты публикации распределены и растут вместе с id"""
+        seed_database(100, days=10, log=lambda message: None)
+        dates = list(Post.objects.order_by('id').values_list(
+            'pub_date', flat=True
+        ))
+        self.assertEqual(dates, sorted(dates))
+        self.assertGreater(dates[-1] - dates[0], timedelta(days=9))
+
+    def test_seed_is_repeatable(self):
+        """Одинаковый seed даёт одинаковые строки, включая все даты"""
+        def snapshot():
+            seed_database(120, seed=3, workers=1, chunk_size=25,
+                          log=lambda message: None)
+            rows = {
+                model._meta.label_lower: list(
+                    model.objects.order_by(*order).values(*fields)
+                )
+                for model, order, fields in (
+                    (User, ('pk',), ()),
+                    (Group, ('pk',), ()),
+                    (Post, ('pk',), ()),
+                    (Comment, ('pk',), ()),
+                    # id подписок выдаёт база, сравниваем сами пары
+                    (Follow, ('user_id', 'author_id'),
+                     ('user_id', 'author_id')),
+                )
+            }
+            for model in (Follow, Comment, Post, Group, User):
+                model.objects.all().delete()
+            return rows
+
+        first = snapshot()
+        self.assertEqual(snapshot(), first)
+        self.assertEqual(first['posts.post'][-1]['pub_date'], SEED_EPOCH)
+        self.assertEqual(first['posts.post'][-1]['updated'], SEED_EPOCH)
+
+    def test_seed_command_refuses_non_empty_database(self):
+        """Команда seed не пишет в непустую базу"""
+        User.objects.create_user(username='existing')
+        with self.assertRaises(CommandError):
+            call_command('seed', '--posts', '10')
+
+    def test_scale_counts(self):
+        """Размеры зависят от количества постов"""
+        self.assertEqual(scale_counts(100_000)['users'], 5_000)
+
+
+class BenchmarkTest(TestCase):
+
+    def test_helpers(self):
+        """Разбор масштаба и перцентили"""
+        self.assertEqual(parse_scale('100k'), 100_000)
+        self.assertEqual(parse_scale('1M'), 1_000_000)
+        self.assertEqual(percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(percentile([1, 2, 3, 4], 99), 4)
+
+    def test_benchmark_all_views(self):
+        """Бенчмарк проходит по всем представлениям posts без ошибок"""
+        seed_database(200, log=lambda message: None)
+        results = ViewBenchmark(requests=2).run()
+        self.assertEqual(len(results), 9)
+        for view, result in results.items():
+            with self.subTest(view=view):
+                self.assertEqual(result['errors'], 0)
+                self.assertGreater(result['queries_avg'], 0)
+
+
+class LoadTestTest(TestCase):
+
+    def test_parse_mix(self):
+        """Смесь сценариев разбирается из строки"""
+        self.assertEqual(
+            loadtest.parse_mix('browse=3,post=1'), {'browse': 3, 'post': 1}
+        )
+        with self.assertRaises(ValueError):
+            loadtest.parse_mix('unknown=1')
+
+    def test_summarize(self):
+        """Отчёт содержит перцентили, гистограмму и долю ошибок"""
+        report = loadtest.summarize(
+            {'browse': [0.001, 0.002, 0.003, 0.2]}, {'browse': 1}, 2.0, 0
+        )
+        browse = report['scenarios']['browse']
+        self.assertEqual(report['throughput_rps'], 2.0)
+        self.assertEqual(browse['error_rate'], 0.25)
+        self.assertEqual(browse['histogram']['<=200ms'], 1)
+        self.assertEqual(browse['p50_ms'], 2.0)
+
+    def test_wsgi_target(self):
+        """Сценарий выполняется через WSGI-вызов приложения"""
+        seed_database(50, log=lambda message: None)
+        scenarios = loadtest.Scenarios({'feed': 1}, users=2)
+        target = loadtest.WSGITarget(application)
+        self.addCleanup(target.close)
+        name, request = scenarios.next()
+        self.assertEqual(name, 'feed')
+        self.assertEqual(target(request), 200)
+
+
+class TransferSetUp:
+
+    def setUp(self):
+        seed_database(60, seed=2, log=lambda message: None)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        # загрузка пересобирает sitemap и ленты, они пишутся во временный
+        # каталог, а не рядом с проектом
+        derived = self.settings(
+            SITEMAP_DIR=os.path.join(self.directory, 'sitemaps'),
+            FEED_CACHE_DIR=os.path.join(self.directory, 'feeds'),
+            PRERENDER_DIR=os.path.join(self.directory, 'prerendered'),
+        )
+        derived.enable()
+        self.addCleanup(derived.disable)
+
+    def clear(self):
+        for model in reversed(transfer.MODELS):
+            model.objects.all().delete()
+
+    def snapshot(self):
+        return {
+            model._meta.label_lower: list(
+                model.objects.order_by('pk').values()
+            )
+            for model in transfer.MODELS
+        }
+
+
+class TransferTest(TransferSetUp, TestCase):
+
+    def test_export_import_round_trip(self):
+        """Выгрузка и загрузка через gzip сохраняют объекты и даты"""
+        archive_posts(SEED_EPOCH - timedelta(days=200), compress=True)
+        path = os.path.join(self.directory, 'site.ndjson.gz')
+        before = self.snapshot()
+        call_command('export_site', path, stderr=StringIO())
+        with open(path, 'rb') as dump:
+            self.assertEqual(dump.read(2), transfer.GZIP_MAGIC)
+        self.clear()
+        call_command('import_site', path, chunk_size=7, stdout=StringIO())
+        self.assertEqual(self.snapshot(), before)
+
+    def test_import_refuses_non_empty_database(self):
+        """Загрузка не пишет в непустую базу"""
+        path = os.path.join(self.directory, 'site.ndjson')
+        call_command('export_site', path, stderr=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('import_site', path, stdout=StringIO())
+
+    def test_import_checks_model_order(self):
+        """Строки в неправильном порядке внешних ключей отклоняются"""
+        stream = StringIO(
+            '{"model": "posts.group", "fields": {"id": 1, "title": "t", '
+            '"slug": "t", "description": "d"}}\n'
+            '{"model": "auth.user", "fields": {"id": 1}}\n'
+        )
+        self.clear()
+        with self.assertRaises(ValueError):
+            transfer.import_site(stream)
+
+
+class TransferTransactionTest(TransferSetUp, TransactionTestCase):
+
+    def export(self):
+        stream = StringIO()
+        transfer.export_site(stream)
+        return stream.getvalue()
+
+    def test_export_reads_one_snapshot(self):
+        """Все таблицы выгружаются внутри одной транзакции"""
+        atomic = []
+
+        class Stream(StringIO):
+            def write(self, text):
+                atomic.append(connection.in_atomic_block)
+                return super().write(text)
+
+        transfer.export_site(Stream())
+        self.assertTrue(atomic)
+        self.assertTrue(all(atomic))
+        self.assertFalse(connection.in_atomic_block)
+
+    def test_failed_import_leaves_database_empty(self):
+        """Ошибка в конце файла откатывает всю загрузку"""
+        dump = self.export()
+        self.clear()
+        with self.assertRaises(ValueError):
+            transfer.import_site(StringIO(
+                dump + '{"model": "posts.unknown", "fields": {}}\n'
+            ), chunk_size=7)
+        for model in transfer.MODELS:
+            self.assertFalse(model.objects.exists(), model)
+        transfer.import_site(StringIO(dump), chunk_size=7)
+        self.assertEqual(Post.objects.count(), 60)
+
+    @override_settings(PRERENDER_ENABLED=True)
+    def test_import_rebuilds_derived(self):
+        """После загрузки пересобраны sitemap, страницы и ленты"""
+        dump = self.export()
+        self.clear()
+        stale = {
+            os.path.join(settings.FEED_CACHE_DIR, 'index', 'old.xml'),
+            os.path.join(settings.PRERENDER_DIR, 'posts', '999', 'index.html'),
+        }
+        for path in stale:
+            os.makedirs(os.path.dirname(path))
+            open(path, 'w').close()
+        related = Stamp.objects.filter(key=RELATED_KEY).first()
+        transfer.import_site(StringIO(dump))
+        for path in stale:
+            self.assertFalse(os.path.exists(path), path)
+        self.assertTrue(os.path.exists(
+            os.path.join(settings.SITEMAP_DIR, 'sitemap.xml')
+        ))
+        post = Post.objects.order_by('pk').first()
+        self.assertTrue(os.path.exists(os.path.join(
+            settings.PRERENDER_DIR, 'posts', str(post.pk), 'index.html'
+        )))
+        self.assertNotEqual(
+            Stamp.objects.get(key=RELATED_KEY).value,
+            related and related.value,
+        )
@@ -0,0 +1,171 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from posts.conditions import INDEX_REMOVAL_KEY
+from posts.models import Comment, Group, Post, Stamp, User
+
+
+class ConditionalGetTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', slug='cond', description='Описание'
+        )
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост'
+        )
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:post_detail', args=(self.post.id,)),
+        )
+        self.client = Client()
+
+    def get(self, url, **headers):
+        cache.clear()
+        return self.client.get(url, **headers)
+
+    def test_matching_etag_returns_304_without_rendering(self):
+        """Совпавший ETag даёт 304 без шаблона и без выборки постов"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.get(url)['ETag']
+                # главная при этом отвечает из cache_page, остальные - по
+                # валидатору condition()
+                with CaptureQueriesContext(connection) as queries:
+                    with self.assertTemplateNotUsed('base.html'):
+                        response = self.client.get(
+                            url, HTTP_IF_NONE_MATCH=etag
+                        )
+                self.assertEqual(response.status_code, 304)
+                self.assertIn('Cookie', response['Vary'])
+                self.assertFalse([
+                    query for query in queries
+                    if '"posts_post"."text"' in query['sql']
+                ])
+
+    def test_if_modified_since_for_anonymous(self):
+        """Аноним с If-Modified-Since получает 304"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                modified = self.get(url)['Last-Modified']
+                response = self.get(url, HTTP_IF_MODIFIED_SINCE=modified)
+                self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate_etag(self):
+        """Новый пост, правка и комментарий меняют ETag"""
+        index, post_url = self.urls[0], self.urls[3]
+        etags = {url: self.get(url)['ETag'] for url in (index, post_url)}
+        Post.objects.create(author=self.author, text='Ещё пост')
+        response = self.get(index, HTTP_IF_NONE_MATCH=etags[index])
+        self.assertEqual(response.status_code, 200)
+        post_etag = self.get(post_url)['ETag']
+        self.assertNotEqual(post_etag, etags[post_url])
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий'
+        )
+        response = self.get(post_url, HTTP_IF_NONE_MATCH=post_etag)
+        self.assertEqual(response.status_code, 200)
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        response = self.get(post_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Исправленный пост')
+
+    def test_etag_depends_on_viewer(self):
+        """Вошедший пользователь получает свой ETag и без Last-Modified"""
+        anonymous = self.get(self.urls[0])
+        self.client.force_login(self.author)
+        response = self.get(
+            self.urls[0], HTTP_IF_NONE_MATCH=anonymous['ETag'],
+            HTTP_IF_MODIFIED_SINCE=http_date(),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], anonymous['ETag'])
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_cached_index_etag_follows_new_posts(self):
+        """
+        Попадание в кэш главной - только запрос меток, а новый пост,
+        созданный пока страница в кэше, сразу даёт новый ETag
+        """
+        index = self.urls[0]
+        first = self.client.get(index)
+        with self.assertNumQueries(2):
+            cached = self.client.get(index)
+            not_modified = self.client.get(
+                index, HTTP_IF_NONE_MATCH=first['ETag']
+            )
+        self.assertEqual(cached['ETag'], first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        Post.objects.create(author=self.author, text='Свежий пост')
+        response = self.client.get(index, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertContains(response, 'Свежий пост')
+
+    def test_follow_changes_profile_etag(self):
+        """После подписки профиль автора не отвечает 304"""
+        reader = User.objects.create_user(username='reader')
+        self.client.force_login(reader)
+        profile = self.urls[2]
+        etag = self.get(profile)['ETag']
+        self.client.get(
+            reverse('posts:profile_follow', args=(self.author.username,))
+        )
+        response = self.get(profile, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Отписаться')
+
+    def test_group_and_author_edits_change_validators(self):
+        """Правка группы и имени автора не даёт устаревший 304"""
+        group_url, profile_url, post_url = self.urls[1:]
+        # Last-Modified с точностью до секунды: прежние версии - час назад
+        hour_ago = timezone.now() - timedelta(hours=1)
+        self.get(group_url)
+        Post.objects.update(updated=hour_ago)
+        Stamp.objects.update(changed=hour_ago)
+        responses = {url: self.get(url) for url in self.urls[1:]}
+        self.group.title = 'Новое название'
+        self.group.description = 'Новое описание'
+        self.group.save()
+        for url in (group_url, post_url):
+            with self.subTest(url=url):
+                response = self.get(
+                    url, HTTP_IF_NONE_MATCH=responses[url]['ETag']
+                )
+                self.assertEqual(response.status_code, 200)
+                response = self.get(
+                    url,
+                    HTTP_IF_MODIFIED_SINCE=responses[url]['Last-Modified'],
+                )
+                self.assertEqual(response.status_code, 200)
+        responses = {url: self.get(url) for url in (profile_url, post_url)}
+        self.author.first_name = 'Лев'
+        self.author.save()
+        for url, response in responses.items():
+            with self.subTest(url=url):
+                response = self.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Лев')
+
+    def test_removal_stamp_is_shared(self):
+        """Метка удалений хранится в базе и видна всем процессам"""
+        etag = self.get(self.urls[0])['ETag']
+        stamp = Stamp.objects.get(key=INDEX_REMOVAL_KEY).value
+        Post.objects.create(author=self.author, text='Удаляемый').delete()
+        self.assertNotEqual(
+            Stamp.objects.get(key=INDEX_REMOVAL_KEY).value, stamp
+        )
+        response = self.get(self.urls[0], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
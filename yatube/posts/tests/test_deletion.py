@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import Client, TestCase
+from django.test import override_settings
+from django.urls import reverse
+
+from posts.archive import archive_posts, get_cutoff
+from core.models import Task
+from core.task_queue import work
+from posts.deletion import delete_group, delete_user, hide_user
+from posts.models import (
+    ArchivedPost, Comment, Follow, Group, Post, User
+)
+from posts.tasks import schedule_user_deletion
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class DeletionTest(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='doomed', description='Описание'
+        )
+        self.posts = []
+        for number in range(5):
+            post = Post(author=self.author, group=self.group, text='Пост')
+            post.image.save(
+                f'deleted_{number}.gif', ContentFile(SMALL_GIF), save=False
+            )
+            post.save()
+            self.posts.append(post)
+        self.kept = Post.objects.create(
+            author=self.reader,
+            group=self.group,
+            text='Пост читателя',
+            image=self.posts[0].image.name,
+        )
+        Comment.objects.create(
+            post=self.posts[0], author=self.reader, text='Чужой комментарий'
+        )
+        Comment.objects.create(
+            post=self.kept, author=self.author, text='Комментарий автора'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.author, author=self.reader)
+
+    def media_exists(self, post):
+        return os.path.exists(
+            os.path.join(TEMP_MEDIA_ROOT, post.image.name)
+        )
+
+    def test_hidden_user_disappears_from_feeds(self):
+        """Скрытый аккаунт сразу пропадает из лент и профиля"""
+        hide_user(self.author)
+        client = Client()
+        response = client.get(reverse('posts:index'))
+        self.assertEqual(list(response.context['page_obj']), [self.kept])
+        response = client.get(
+            reverse('posts:group_list', args=(self.group.slug,))
+        )
+        self.assertEqual(list(response.context['page_obj']), [self.kept])
+        response = client.get(
+            reverse('posts:profile', args=(self.author.username,))
+        )
+        self.assertEqual(response.status_code, 404)
+        response = client.get(
+            reverse('posts:post_detail', args=(self.posts[1].id,))
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_delete_user_in_batches(self):
+        """Зависимые объекты удаляются пачками, общие картинки остаются"""
+        archive_posts(get_cutoff(-1), batch_size=2)
+        self.assertTrue(ArchivedPost.objects.filter(
+            author=self.author
+        ).exists())
+        counts = delete_user(self.author.pk, batch_size=2, pause=0)
+        self.assertEqual(counts['comments'] + counts['archived_comments'], 2)
+        self.assertEqual(counts['posts'] + counts['archived_posts'], 5)
+        self.assertEqual(counts['follows'], 2)
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertFalse(ArchivedPost.objects.filter(
+            author_id=self.author.pk
+        ).exists())
+        self.assertTrue(Post.objects.filter(pk=self.kept.pk).exists())
+        self.assertTrue(self.media_exists(self.posts[0]))
+        self.assertFalse(self.media_exists(self.posts[1]))
+
+    def test_delete_group_in_batches(self):
+        """Посты группы отвязываются пачками, затем группа удаляется"""
+        counts = delete_group(self.group.pk, batch_size=2, pause=0)
+        self.assertEqual(counts['posts'], 6)
+        self.assertFalse(Group.objects.filter(pk=self.group.pk).exists())
+        self.assertEqual(Post.objects.filter(group__isnull=True).count(), 6)
+
+
+class BackgroundDeletionTest(TestCase):
+
+    def test_schedule_user_deletion(self):
+        """Аккаунт скрывается сразу, удаляет его обработчик очереди"""
+        author = User.objects.create_user(username='author')
+        Post.objects.create(author=author, text='Пост')
+        first = schedule_user_deletion(author)
+        self.assertEqual(schedule_user_deletion(author), first)
+        self.assertFalse(User.objects.get(pk=author.pk).is_active)
+        self.assertEqual(work(burst=True), (1, 0))
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+        self.assertFalse(User.objects.filter(pk=author.pk).exists())
+        self.assertFalse(Post.objects.exists())
@@ -0,0 +1,144 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.archive import archive_posts, get_cutoff
+from posts.deletion import hide_user
+from posts.models import Group, Post, User
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+TEMP_FEED_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(FEED_CACHE_DIR=TEMP_FEED_DIR, FEED_SIZE=3)
+class AtomFeedTest(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_FEED_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        self.group = Group.objects.create(
+            title='Группа', slug='feed', description='Описание'
+        )
+        self.posts = []
+        for number in range(5):
+            post = Post.objects.create(
+                author=self.author, group=self.group, text=f'Пост {number}'
+            )
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=timezone.now() - timedelta(days=400 - number)
+            )
+            self.posts.append(post)
+        self.urls = (
+            reverse('posts:index_atom'),
+            reverse('posts:group_atom', args=(self.group.slug,)),
+            reverse('posts:profile_atom', args=(self.author.username,)),
+        )
+        self.client = Client()
+
+    def fetch(self, url, data=None, **headers):
+        response = self.client.get(url, data, **headers)
+        body = b''.join(response.streaming_content)
+        return response, body
+
+    def titles(self, body):
+        root = ElementTree.fromstring(body)
+        return [
+            entry.find(f'{ATOM}title').text
+            for entry in root.iter(f'{ATOM}entry')
+        ]
+
+    def test_feeds_list_latest_posts(self):
+        """Во всех лентах FEED_SIZE последних постов, новые первыми."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response, body = self.fetch(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(
+                    response['Content-Type'].startswith(
+                        'application/atom+xml'
+                    )
+                )
+                self.assertEqual(
+                    self.titles(body), ['Пост 4', 'Пост 3', 'Пост 2']
+                )
+        self.assertIn(b'<name>\xd0\x9b\xd0\xb5\xd0\xb2', body)
+
+    def test_second_request_is_served_from_file(self):
+        """Повторная выдача читает готовый файл, без выборки постов."""
+        url = self.urls[1]
+        _, first = self.fetch(url)
+        # группа, агрегаты версии горячей и архивной таблиц и метка
+        with self.assertNumQueries(4):
+            _, second = self.fetch(url)
+        self.assertEqual(first, second)
+
+    def test_etag_and_new_version(self):
+        """Совпавший ETag - 304, новый пост меняет версию ленты."""
+        url = self.urls[2]
+        response, _ = self.fetch(url)
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(author=self.author, text='Свежий')
+        response, body = self.fetch(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.titles(body)[0], 'Свежий')
+        directory = os.path.join(TEMP_FEED_DIR, 'profile')
+        files = [
+            name for _, _, names in os.walk(directory) for name in names
+        ]
+        self.assertEqual(files, [response['ETag'].strip('"') + '.xml'])
+
+    def test_hosts_keep_their_own_versions(self):
+        """Лента для другой схемы не удаляет файл первой."""
+        url = self.urls[0]
+        self.fetch(url)
+        self.fetch(url, secure=True)
+        directory = os.path.join(TEMP_FEED_DIR, 'index')
+        files = [
+            name for _, _, names in os.walk(directory) for name in names
+        ]
+        self.assertEqual(len(files), 2)
+        # только агрегат версии и метка: файл первой схемы остался на диске
+        with self.assertNumQueries(2):
+            self.fetch(url)
+
+    def test_query_string_not_in_cached_feed(self):
+        """Параметры первого запроса не попадают в общий файл ленты."""
+        url = self.urls[1]
+        _, body = self.fetch(url, {'x': 'poison'})
+        self.assertNotIn(b'poison', body)
+        _, body = self.fetch(url)
+        self.assertNotIn(b'poison', body)
+        root = ElementTree.fromstring(body)
+        self.assertEqual(
+            root.find(f'{ATOM}id').text, 'http://testserver' + url
+        )
+
+    def test_archived_posts_in_group_feed(self):
+        """Лента группы сливает горячие и архивные посты."""
+        Post.objects.create(author=self.author, text='Без группы')
+        archive_posts(get_cutoff(398))
+        _, body = self.fetch(self.urls[1])
+        self.assertEqual(self.titles(body), ['Пост 4', 'Пост 3', 'Пост 2'])
+
+    def test_hidden_author_has_no_feed(self):
+        """У скрытого аккаунта ленты нет."""
+        hide_user(self.author)
+        response = self.client.get(self.urls[2])
+        self.assertEqual(response.status_code, 404)
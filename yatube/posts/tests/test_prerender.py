@@ -0,0 +1,187 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Task
+from core.task_queue import work
+from posts.archive import archive_posts, get_cutoff
+from posts.deletion import hide_user
+from posts.models import ArchivedPost, Comment, Group, Post, User
+from posts.prerender import render_paths
+from posts.signals import archived_post_deleted
+
+TEMP_PRERENDER_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def page_file(path):
+    return os.path.join(
+        TEMP_PRERENDER_DIR, *filter(None, path.split('/')), 'index.html'
+    )
+
+
+def read_page(path):
+    with open(page_file(path), encoding='utf-8') as page:
+        return page.read()
+
+
+class PrerenderSetUp:
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_PRERENDER_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(TEMP_PRERENDER_DIR, ignore_errors=True)
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', slug='static', description='Описание'
+        )
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Готовый пост'
+        )
+        self.post_url = reverse('posts:post_detail', args=(self.post.pk,))
+        self.client = Client()
+
+
+@override_settings(
+    PRERENDER_ENABLED=True, PRERENDER_DIR=TEMP_PRERENDER_DIR
+)
+class PrerenderTest(PrerenderSetUp, TestCase):
+
+    def test_command_renders_anonymous_pages(self):
+        """Команда собирает ленты, группы, профили, посты и about"""
+        out = StringIO()
+        call_command('prerender', stdout=out)
+        self.assertIn('Собрано страниц: 6', out.getvalue())
+        for path in (
+            '/', '/group/static/', '/profile/author/', self.post_url,
+        ):
+            with self.subTest(path=path):
+                self.assertIn('Готовый пост', read_page(path))
+                self.assertNotIn('Выйти', read_page(path))
+        self.assertTrue(os.path.exists(page_file('/about/author/')))
+
+    def test_fast_path_skips_view(self):
+        """Аноним получает файл без запросов к базе и без шаблонов"""
+        render_paths([self.post_url])
+        with self.assertNumQueries(0):
+            with self.assertTemplateNotUsed('base.html'):
+                response = self.client.get(self.post_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.content.decode(), read_page(self.post_url)
+        )
+        self.assertEqual(response['Vary'], 'Cookie')
+        response = self.client.get(
+            self.post_url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_bypass(self):
+        """Вошедшим и запросам с параметрами страницу строит view"""
+        render_paths(['/'])
+        with self.assertTemplateUsed('posts/index.html'):
+            self.client.get('/', {'page': 1})
+        self.client.force_login(self.author)
+        with self.assertTemplateUsed('posts/index.html'):
+            response = self.client.get('/')
+        self.assertContains(response, 'Выйти')
+
+    def test_missing_page_is_removed(self):
+        """Страница, которой больше нет, удаляется с диска"""
+        render_paths([self.post_url])
+        Post.objects.filter(pk=self.post.pk).delete()
+        self.assertEqual(render_paths([self.post_url]), {404: 1})
+        self.assertFalse(os.path.exists(page_file(self.post_url)))
+        self.assertEqual(self.client.get(self.post_url).status_code, 404)
+
+
+@override_settings(
+    PRERENDER_ENABLED=True, PRERENDER_DIR=TEMP_PRERENDER_DIR
+)
+class PrerenderSignalsTest(PrerenderSetUp, TransactionTestCase):
+
+    def test_changes_rebuild_affected_pages(self):
+        """
+        Пост, комментарий и скрытие автора ставят в очередь только
+        затронутые страницы
+        """
+        call_command('prerender', stdout=StringIO())
+        Task.objects.all().delete()
+        other = Post.objects.create(author=self.author, text='Второй пост')
+        self.assertEqual(
+            sorted(Task.objects.values_list('name', flat=True)),
+            ['posts.tasks.prerender_author', 'posts.tasks.prerender_pages'],
+        )
+        pages = Task.objects.get(name='posts.tasks.prerender_pages')
+        self.assertEqual(
+            sorted(json.loads(pages.payload)['args'][0]),
+            sorted([
+                '/', '/profile/author/',
+                reverse('posts:post_detail', args=(other.pk,)),
+            ]),
+        )
+        work(burst=True)
+        self.assertIn('Второй пост', read_page('/'))
+        self.assertIn('Второй пост', read_page('/profile/author/'))
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий'
+        )
+        work(burst=True)
+        self.assertIn('Комментарий', read_page(self.post_url))
+        hide_user(self.author)
+        work(burst=True)
+        for path in ('/profile/author/', self.post_url):
+            with self.subTest(path=path):
+                self.assertFalse(os.path.exists(page_file(path)))
+        self.assertNotIn('Готовый пост', read_page('/group/static/'))
+
+    def test_rename_removes_old_profile(self):
+        """После смены имени старый профиль удаляется, новый собирается"""
+        call_command('prerender', stdout=StringIO())
+        Task.objects.all().delete()
+        self.assertTrue(os.path.exists(page_file('/profile/author/')))
+        self.author.username = 'renamed'
+        self.author.save()
+        work(burst=True)
+        self.assertFalse(os.path.exists(page_file('/profile/author/')))
+        self.assertIn('Готовый пост', read_page('/profile/renamed/'))
+        self.assertIn('renamed', read_page('/'))
+
+    def test_archived_delete_reads_authors_once(self):
+        """Удаление архивных постов пачкой не читает автора каждого поста"""
+        for number in range(3):
+            Post.objects.create(author=self.author, text=f'Старый {number}')
+        Post.objects.update(pub_date=timezone.now() - timedelta(days=400))
+        archive_posts(get_cutoff(365))
+        with CaptureQueriesContext(connection) as queries:
+            ArchivedPost.objects.all().delete()
+        self.assertEqual(len([
+            query for query in queries
+            if query['sql'].startswith('SELECT')
+            and 'FROM "auth_user"' in query['sql']
+        ]), 1)
+        with override_settings(PRERENDER_ENABLED=False):
+            Post.objects.create(author=self.author, text='Старый')
+            Post.objects.update(
+                pub_date=timezone.now() - timedelta(days=400)
+            )
+            archive_posts(get_cutoff(365))
+            post = ArchivedPost.objects.get()
+            with self.assertNumQueries(0):
+                archived_post_deleted(ArchivedPost, post)
@@ -0,0 +1,149 @@
+import gzip
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.utils import timezone
+
+from posts.archive import archive_posts, get_cutoff
+from posts.deletion import hide_user
+from posts.models import Group, Post, User
+from posts.sitemaps import build_sitemaps
+
+SITEMAP = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+BASE_URL = 'https://yatube.test'
+TEMP_SITEMAP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(SITEMAP_DIR=TEMP_SITEMAP_DIR, SITEMAP_CHUNK_SIZE=10)
+class SitemapTest(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_SITEMAP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(TEMP_SITEMAP_DIR, ignore_errors=True)
+        self.author = User.objects.create_user(username='author')
+        self.other = User.objects.create_user(username='other.user')
+        self.group = Group.objects.create(
+            title='Группа', slug='maps', description='Описание'
+        )
+        self.posts = [
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+            for number in range(25)
+        ]
+        # отдельный кусок, который опустеет после скрытия автора
+        self.other_post = Post.objects.create(
+            id=100, author=self.other, text='Чужой'
+        )
+
+    def read(self, name):
+        with gzip.open(os.path.join(TEMP_SITEMAP_DIR, name)) as chunk:
+            root = ElementTree.parse(chunk).getroot()
+        return [url.find(f'{SITEMAP}loc').text for url in root]
+
+    def post_urls(self):
+        return [
+            url
+            for name in sorted(os.listdir(TEMP_SITEMAP_DIR))
+            if name.startswith('sitemap-posts-')
+            for url in self.read(name)
+        ]
+
+    def chunk_of(self, post):
+        return f'sitemap-posts-{post.pk // 10:04d}.xml.gz'
+
+    def test_index_and_chunks(self):
+        """Индекс ссылается на куски, в кусках все посты, группы и авторы"""
+        self.assertEqual(build_sitemaps(BASE_URL), (6, 0, 0))
+        index = ElementTree.parse(
+            os.path.join(TEMP_SITEMAP_DIR, 'sitemap.xml')
+        ).getroot()
+        names = sorted(
+            entry.find(f'{SITEMAP}loc').text.rsplit('/', 1)[1]
+            for entry in index
+        )
+        self.assertEqual(names, sorted(
+            name for name in os.listdir(TEMP_SITEMAP_DIR)
+            if name.endswith('.gz')
+        ))
+        self.assertEqual(self.post_urls(), [
+            f'{BASE_URL}/posts/{post.pk}/'
+            for post in self.posts + [self.other_post]
+        ])
+        self.assertEqual(
+            self.read('sitemap-groups-0000.xml.gz'),
+            [f'{BASE_URL}/group/maps/'],
+        )
+        self.assertEqual(
+            self.read('sitemap-profiles-0000.xml.gz'),
+            [f'{BASE_URL}/profile/author/', f'{BASE_URL}/profile/other.user/'],
+        )
+
+    def test_only_changed_chunks_are_rewritten(self):
+        """Повторный запуск ничего не пишет, правка - только свой кусок"""
+        build_sitemaps(BASE_URL)
+        self.assertEqual(build_sitemaps(BASE_URL), (0, 6, 0))
+        post = self.posts[15]
+        post.text = 'Исправлен'
+        post.save()
+        self.group.slug = 'renamed'
+        self.group.save()
+        self.assertEqual(build_sitemaps(BASE_URL), (2, 4, 0))
+        self.assertEqual(
+            self.read('sitemap-groups-0000.xml.gz'),
+            [f'{BASE_URL}/group/renamed/'],
+        )
+
+    def test_archive_hidden_author_and_empty_chunk(self):
+        """
+        Архивный пост остаётся в sitemap, посты скрытого автора уходят,
+        опустевший кусок удаляется
+        """
+        build_sitemaps(BASE_URL)
+        Post.objects.filter(pk=self.posts[0].pk).update(
+            pub_date=timezone.now() - timedelta(days=400)
+        )
+        archive_posts(get_cutoff(365))
+        hide_user(self.other)
+        empty = self.chunk_of(self.other_post)
+        self.assertEqual(build_sitemaps(BASE_URL), (2, 3, 1))
+        self.assertFalse(
+            os.path.exists(os.path.join(TEMP_SITEMAP_DIR, empty))
+        )
+        self.assertEqual(self.post_urls(), [
+            f'{BASE_URL}/posts/{post.pk}/' for post in self.posts
+        ])
+
+    def test_command_and_views(self):
+        """Команда строит файлы, сайт отдаёт их и robots.txt"""
+        out = StringIO()
+        call_command('build_sitemaps', base_url=BASE_URL, stdout=out)
+        self.assertIn('записано: 6', out.getvalue())
+        client = Client()
+        response = client.get('/sitemap.xml')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            f'{BASE_URL}/sitemap-posts-0000.xml.gz',
+            b''.join(response.streaming_content).decode(),
+        )
+        response = client.get('/sitemap-posts-0000.xml.gz')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content))[:5],
+            b'<?xml',
+        )
+        self.assertEqual(
+            client.get('/sitemap-posts-0099.xml.gz').status_code, 404
+        )
+        robots = client.get('/robots.txt').content.decode()
+        self.assertIn('Sitemap: http://testserver/sitemap.xml', robots)
+        self.assertIn('Disallow: /*?page=', robots)
@@ -0,0 +1,197 @@
+import datetime
+import gzip
+import io
+import json
+import os
+import shutil
+import sys
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, reset_queries, transaction
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .conditions import (
+    INDEX_CONTENT_KEY, INDEX_REMOVAL_KEY, RELATED_KEY, bump_stamp
+)
+from .models import (
+    ArchivedComment, ArchivedPost, ArchivedText, Comment, Follow, Group,
+    Post, User, pack_text, unpack_text
+)
+from .prerender import render_paths, site_paths
+from .seeding import bulk_insert, raw_dates
+from .sitemaps import build_sitemaps
+
+# порядок важен: импорт вставляет модели ровно в нём, от родителей к детям
+MODELS = (User, Group, Post, Comment, Follow, ArchivedPost, ArchivedComment)
+LABELS = {model._meta.label_lower: model for model in MODELS}
+CHUNK_SIZE = 2000
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+class Encoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder обрезает время до миллисекунд, выгрузка - без потерь
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def open_stream(path, mode='r', compress=None):
+    """
+    Текстовый поток NDJSON. '-' - stdin/stdout, gzip при записи включается
+    суффиксом .gz или флагом, при чтении определяется по сигнатуре.
+    """
+    if path == '-':
+        stdio = sys.stdin if mode == 'r' else sys.stdout
+        raw = open(stdio.fileno(), mode + 'b', closefd=False)
+    else:
+        raw = open(path, mode + 'b')
+    if mode == 'r':
+        compress = raw.peek(2)[:2] == GZIP_MAGIC
+    elif compress is None:
+        compress = path.endswith('.gz')
+    if compress:
+        raw = gzip.GzipFile(fileobj=raw, mode=mode + 'b')
+    return io.TextIOWrapper(raw, encoding='utf-8')
+
+
+def dump_row(model, row):
+    if issubclass(model, ArchivedText):
+        body = bytes(row.pop('body'))
+        row['text'] = unpack_text(body, row['compressed'])
+    return row
+
+
+def load_row(model, fields, media_from=None):
+    for field in model._meta.concrete_fields:
+        value = fields.get(field.attname)
+        if not isinstance(value, str):
+            continue
+        if isinstance(field, models.DateTimeField):
+            fields[field.attname] = parse_datetime(value)
+        elif isinstance(field, models.DateField):
+            fields[field.attname] = parse_date(value)
+        elif isinstance(field, models.FileField) and value and media_from:
+            copy_media(media_from, value)
+    if issubclass(model, ArchivedText):
+        fields['body'], fields['compressed'] = pack_text(
+            fields.pop('text'), fields.get('compressed', False)
+        )
+    return model(**fields)
+
+
+def copy_media(media_from, name):
+    target = os.path.join(settings.MEDIA_ROOT, name)
+    source = os.path.join(media_from, name)
+    if os.path.exists(target) or not os.path.exists(source):
+        return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.copyfile(source, target)
+
+
+def export_site(stream, chunk_size=CHUNK_SIZE):
+    """
+    Пишет все модели построчно. values().iterator() не наполняет кэш
+    queryset, поэтому в памяти держится не больше chunk_size строк.
+    Все таблицы читаются в одной транзакции, то есть из одного снимка
+    базы: пост, записанный посреди выгрузки, не окажется в ней без
+    своего автора или с комментариями к несуществующему посту.
+    """
+    counts = {}
+    with transaction.atomic():
+        for model in MODELS:
+            label = model._meta.label_lower
+            fields = [field.attname for field in model._meta.concrete_fields]
+            rows = model.objects.order_by('pk').values(*fields).iterator(
+                chunk_size=chunk_size
+            )
+            count = 0
+            for row in rows:
+                stream.write(json.dumps(
+                    {'model': label, 'fields': dump_row(model, row)},
+                    cls=Encoder,
+                    ensure_ascii=False,
+                ))
+                stream.write('\n')
+                count += 1
+            counts[label] = count
+    return counts
+
+
+def reset_sequences():
+    statements = connection.ops.sequence_reset_sql(no_style(), MODELS)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def import_site(stream, chunk_size=CHUNK_SIZE, media_from=None):
+    """
+    Читает NDJSON построчно и вставляет пачками по chunk_size в порядке
+    MODELS. Вся загрузка - одна транзакция: ошибка в середине файла
+    оставляет базу пустой, и импорт можно просто повторить.
+    bulk_create не шлёт сигналы сохранения, поэтому после импорта
+    сбрасываются последовательности id и пересобирается всё, что
+    строится из базы: см. rebuild_derived.
+    """
+    counts = {}
+    buffer = []
+    current = None
+
+    def flush():
+        if buffer:
+            bulk_insert(current, buffer)
+            label = current._meta.label_lower
+            counts[label] = counts.get(label, 0) + len(buffer)
+            buffer.clear()
+            # при DEBUG журнал запросов хранит до 9000 многострочных INSERT
+            reset_queries()
+
+    with transaction.atomic(), raw_dates(MODELS):
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            model = LABELS.get(record['model'])
+            if model is None:
+                raise ValueError(
+                    f'Строка {number}: неизвестная модель {record["model"]}'
+                )
+            if model is not current:
+                if current is not None and (
+                    MODELS.index(model) < MODELS.index(current)
+                ):
+                    raise ValueError(
+                        f'Строка {number}: {record["model"]} после '
+                        f'{current._meta.label_lower}, нарушен порядок'
+                    )
+                flush()
+                current = model
+            buffer.append(load_row(model, record['fields'], media_from))
+            if len(buffer) >= chunk_size:
+                flush()
+        flush()
+        reset_sequences()
+    rebuild_derived()
+    return counts
+
+
+def rebuild_derived():
+    """
+    Кэш, метки версий, ленты, sitemap и готовые страницы после загрузки:
+    сигналов не было, и всё это описывает прежнюю базу. Ленты строятся
+    заново при первом запросе, sitemap и страницы - сразу.
+    """
+    cache.clear()
+    for key in (INDEX_CONTENT_KEY, INDEX_REMOVAL_KEY, RELATED_KEY):
+        bump_stamp(key)
+    shutil.rmtree(settings.FEED_CACHE_DIR, ignore_errors=True)
+    build_sitemaps(settings.SITE_URL, full=True)
+    if settings.PRERENDER_ENABLED:
+        # страницы удалённых путей иначе так и отдавались бы с диска
+        shutil.rmtree(settings.PRERENDER_DIR, ignore_errors=True)
+        render_paths(site_paths())
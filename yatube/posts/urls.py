@@ -1,4 +1,4 @@
-from django.urls import path
+from django.urls import path, re_path
 
 from . import views
 
@@ -6,8 +6,15 @@ app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('feed/', views.index_atom, name='index_atom'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path('group/<slug:slug>/feed/', views.group_atom, name='group_atom'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'profile/<str:username>/feed/',
+        views.profile_atom,
+        name='profile_atom'
+    ),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path(
         'posts/<int:post_id>/comment/', views.add_comment, name='add_comment'
@@ -15,6 +22,11 @@ urlpatterns = [
     path('create/', views.post_create, name='post_create'),
     path('posts/<post_id>/edit/', views.post_edit, name='post_edit'),
     path('follow/', views.follow_index, name='follow_index'),
+    re_path(
+        r'^(?P<name>sitemap(?:-[a-z]+-\d+\.xml\.gz|\.xml))$',
+        views.sitemap,
+        name='sitemap'
+    ),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
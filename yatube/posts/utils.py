@@ -1,12 +1,73 @@
+from functools import wraps
+
 import django
 from django.core.paginator import Paginator
 
+# ключ cache_page главной: генератор страниц сбрасывает его перед сборкой
+INDEX_CACHE_PREFIX = 'index_page'
+
+
+def memoized(get_source):
+    """Источник ленты ищется один раз: и для ETag, и для ответа."""
+    @wraps(get_source)
+    def wrapper(request, *args, **kwargs):
+        memo = request.__dict__.setdefault('_memoized', {})
+        # condition передаёт параметры пути именованными, view - по порядку
+        key = (get_source,) + args + tuple(kwargs.values())
+        if key not in memo:
+            memo[key] = get_source(request, *args, **kwargs)
+        return memo[key]
+    return wrapper
+
 
 def get_page(
         queryset: django.db.models.query.QuerySet,
         obj_per_page: int,
         request: django.http.HttpRequest,
+        count: int = None,
 ) -> django.core.paginator.Paginator:
     paginator = Paginator(queryset, obj_per_page)
+    if count is not None:
+        # количество уже посчитано валидатором conditional GET
+        paginator.count = count
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
+
+
+class ChainedQuerySets:
+    """
+    Последовательность из нескольких queryset подряд - горячие посты, затем
+    архивные. Paginator берёт у неё count() и срез, поэтому на страницу
+    уходит по одному запросу с LIMIT/OFFSET в каждую затронутую таблицу.
+    """
+
+    def __init__(self, *querysets, counts=None):
+        self.querysets = querysets
+        self._counts = counts
+
+    def counts(self):
+        if self._counts is None:
+            self._counts = [queryset.count() for queryset in self.querysets]
+        return self._counts
+
+    def count(self) -> int:
+        return sum(self.counts())
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        start, stop = item.start or 0, item.stop
+        result = []
+        for queryset, size in zip(self.querysets, self.counts()):
+            end = size if stop is None else min(stop, size)
+            if start < end:
+                result.extend(queryset[start:end])
+            start = max(start - size, 0)
+            if stop is not None:
+                stop -= size
+                if stop <= 0:
+                    break
+        return result
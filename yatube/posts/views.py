@@ -1,17 +1,48 @@
+import os
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.cache import patch_cache_control
 from django.views.decorators.cache import cache_page
-
+from django.views.decorators.vary import vary_on_cookie
+
+from core.write_queue import run_write
+
+from .conditions import (
+    cached_condition, follow_feed, group_condition, group_feed, group_stats,
+    index_condition, index_feed, index_stamps, post_condition, post_stats,
+    profile_condition, profile_feed, profile_stats
+)
+from .feeds import (
+    atom_condition, atom_response, group_source, index_source,
+    profile_source
+)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import get_page
+from .models import ArchivedPost, Follow, Group, Post, User
+from .tasks import publish_post, schedule_thumbnails
+from .utils import INDEX_CACHE_PREFIX, ChainedQuerySets, get_page
 
 AMOUNT_POSTS = 10
 
 
-@cache_page(20, key_prefix='index_page')
+@vary_on_cookie
 def index(request):
-    posts = Post.objects.all()
+    # Метка новых постов входит в ключ кэша: ETag, сохранённый вместе
+    # с HTML, всегда описывает именно этот HTML, а попадание в кэш
+    # отвечает 304 одним запросом меток по первичному ключу.
+    prefix = f'{INDEX_CACHE_PREFIX}:{index_stamps(request)[0].value}'
+    cached = cache_page(20, key_prefix=prefix)(
+        index_condition(vary_on_cookie(index_page))
+    )
+    return cached_condition(cached)(request)
+
+
+def index_page(request):
+    # Главная лента читает только горячую таблицу: архивные посты старше
+    # порога архивации и на первые страницы не попадают.
+    posts, = index_feed()
     page_obj = get_page(posts, AMOUNT_POSTS, request)
     return render(
         request,
@@ -22,9 +53,14 @@ def index(request):
     )
 
 
+@vary_on_cookie
+@group_condition
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    page_obj = get_page(group.posts.all(), AMOUNT_POSTS, request)
+    posts = ChainedQuerySets(*group_feed(group), counts=[
+        item['count'] for item in group_stats(request, slug)
+    ])
+    page_obj = get_page(posts, AMOUNT_POSTS, request)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -32,9 +68,15 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@vary_on_cookie
+@profile_condition
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    page_obj = get_page(author.posts.all(), AMOUNT_POSTS, request)
+    # неактивный аккаунт скрыт сразу, даже пока его посты ещё удаляются
+    author = get_object_or_404(User, username=username, is_active=True)
+    posts = ChainedQuerySets(*profile_feed(author), counts=[
+        item['count'] for item in profile_stats(request, username)
+    ])
+    page_obj = get_page(posts, AMOUNT_POSTS, request)
     following = request.user.is_authenticated and Follow.objects.filter(
         user=request.user,
         author=author,
@@ -47,16 +89,40 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@atom_condition(index_source)
+def index_atom(request):
+    return atom_response(request, index_source(request))
+
+
+@atom_condition(group_source)
+def group_atom(request, slug):
+    return atom_response(request, group_source(request, slug))
+
+
+@atom_condition(profile_source)
+def profile_atom(request, username):
+    return atom_response(request, profile_source(request, username))
+
+
+@vary_on_cookie
+@post_condition
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = Post.objects.filter(id=post_id, author__is_active=True).first()
+    is_archived = post is None
+    if is_archived:
+        post = get_object_or_404(
+            ArchivedPost, id=post_id, author__is_active=True
+        )
     form = CommentForm(
         request.POST,
-        instance=post
+        instance=None if is_archived else post
     )
     context = {
         'post': post,
         'form': form,
-        'comments': post.comments.all()
+        'comments': post.comments.all(),
+        'is_archived': is_archived,
+        'posts_count': post_stats(request, post_id)['author_posts'],
     }
     return render(
         request,
@@ -81,7 +147,7 @@ def post_create(request):
         )
     post = form.save(commit=False)
     post.author = request.user
-    post.save()
+    run_write(publish_post, post)
     return redirect(
         'posts:profile',
         post.author.username
@@ -101,6 +167,8 @@ def post_edit(request, post_id):
     )
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            schedule_thumbnails(post)
         return redirect('posts:post_detail', post.id)
     context = {
         'form': form,
@@ -121,7 +189,7 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        run_write(comment.save)
     return redirect(
         'posts:post_detail',
         post_id=post_id
@@ -130,7 +198,7 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
+    posts, = follow_feed(request.user)
     page_obj = get_page(posts, AMOUNT_POSTS, request)
     context = {
         'page_obj': page_obj,
@@ -142,7 +210,8 @@ def follow_index(request):
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
-        Follow.objects.get_or_create(
+        run_write(
+            Follow.objects.get_or_create,
             user=request.user,
             author=author,
         )
@@ -156,11 +225,28 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
-        Follow.objects.filter(
-            user=request.user,
-            author=author,
-        ).delete()
+        run_write(
+            Follow.objects.filter(
+                user=request.user,
+                author=author,
+            ).delete
+        )
     return redirect(
         'posts:profile',
         author.username
     )
+
+
+def sitemap(request, name):
+    """
+    Готовый файл из SITEMAP_DIR. В бою его отдаёт веб-сервер, сюда
+    доходят только промахи и разработка.
+    """
+    try:
+        response = FileResponse(
+            open(os.path.join(settings.SITEMAP_DIR, name), 'rb')
+        )
+    except FileNotFoundError:
+        raise Http404
+    patch_cache_control(response, public=True, max_age=3600)
+    return response
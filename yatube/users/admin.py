@@ -0,0 +1,26 @@
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin
+
+from posts.tasks import schedule_user_deletion
+
+User = get_user_model()
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class DeferredDeletionUserAdmin(UserAdmin):
+    actions = ('delete_in_background',)
+
+    def delete_in_background(self, request, queryset):
+        users = list(queryset.exclude(pk=request.user.pk))
+        for user in users:
+            schedule_user_deletion(user)
+        self.message_user(
+            request,
+            f'Скрыто и поставлено на удаление: {len(users)}'
+        )
+    delete_in_background.short_description = (
+        'Скрыть и удалить в фоне пачками'
+    )
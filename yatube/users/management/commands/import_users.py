@@ -0,0 +1,69 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.provisioning import (
+    CHUNK_SIZE, import_users, measure_scaling, read_records
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт пользователей из CSV или NDJSON с полями username, email, '
+        'password, first_name, last_name; пароли хешируются пулом процессов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?')
+        parser.add_argument(
+            '--format', choices=('csv', 'ndjson'),
+            help='По умолчанию определяется по расширению'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Процессов для хеширования паролей'
+        )
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            '--scaling', default='',
+            help='Только замерить хеширование для списка процессов: 1,2,4'
+        )
+        parser.add_argument('--sample', type=int, default=200)
+
+    def handle(self, *args, **options):
+        if options['scaling']:
+            return self.report_scaling(options)
+        if not options['path']:
+            raise CommandError('Укажите файл с пользователями')
+        started = time.perf_counter()
+        try:
+            created, skipped = import_users(
+                read_records(options['path'], options['format']),
+                workers=options['workers'],
+                chunk_size=options['chunk_size'],
+                log=self.stdout.write if options['verbosity'] > 1 else None,
+            )
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            'Создано {} пользователей, пропущено {} за {:.1f} с '
+            '({:.0f} в секунду, процессов: {})'.format(
+                created, skipped, elapsed, created / elapsed,
+                options['workers'],
+            )
+        ))
+
+    def report_scaling(self, options):
+        try:
+            counts = [int(value) for value in options['scaling'].split(',')]
+        except ValueError:
+            raise CommandError('--scaling: список чисел через запятую')
+        baseline = None
+        for workers, rate in measure_scaling(counts, options['sample']):
+            baseline = baseline or rate
+            self.stdout.write(
+                f'{workers:>3} процессов: {rate:8.1f} пользователей/с, '
+                f'ускорение x{rate / baseline:.2f}'
+            )
@@ -0,0 +1,158 @@
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.db import connections, transaction
+from django.db.models import Q
+
+User = get_user_model()
+
+FIELDS = ('username', 'email', 'password', 'first_name', 'last_name')
+# пароль в базу попадает хешем, его проверять не нужно
+VALIDATED_FIELDS = ('username', 'email', 'first_name', 'last_name')
+CHUNK_SIZE = 1000
+
+
+def read_records(path, fmt=None):
+    """Построчно читает CSV с заголовком или NDJSON."""
+    if fmt is None:
+        fmt = 'csv' if path.endswith('.csv') else 'ndjson'
+    with open(path, encoding='utf-8', newline='') as source:
+        if fmt == 'csv':
+            yield from csv.DictReader(source)
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def is_valid(record):
+    """
+    Валидаторы полей модели: символы username, формат email и max_length.
+    bulk_create их не вызывает, а SQLite длину строк не ограничивает.
+    """
+    for name in VALIDATED_FIELDS:
+        try:
+            User._meta.get_field(name).run_validators(record[name])
+        except ValidationError:
+            return False
+    return True
+
+
+def select_new(records, seen):
+    """
+    Отбрасывает записи без username, с недопустимыми полями и повторы
+    внутри файла, затем одним запросом на пачку - пользователей, чьи
+    username или email уже заняты.
+    """
+    fresh = []
+    for record in records:
+        record = {
+            field: (record.get(field) or '').strip() for field in FIELDS
+        }
+        record['email'] = User.objects.normalize_email(record['email'])
+        username, email = record['username'], record['email']
+        if not username or username in seen['usernames'] or (
+            email and email in seen['emails']
+        ) or not is_valid(record):
+            continue
+        seen['usernames'].add(username)
+        if email:
+            seen['emails'].add(email)
+        fresh.append(record)
+    taken = User.objects.filter(
+        Q(username__in=[record['username'] for record in fresh])
+        | Q(email__in=[record['email'] for record in fresh if record['email']])
+    ).values_list('username', 'email')
+    taken_usernames = {username for username, _ in taken}
+    taken_emails = {email for _, email in taken if email}
+    return [
+        record for record in fresh
+        if record['username'] not in taken_usernames
+        and record['email'] not in taken_emails
+    ]
+
+
+def hash_password(password):
+    # пустой пароль - неиспользуемый, вход только через сброс пароля
+    return make_password(password or None)
+
+
+def make_pool(workers):
+    if workers <= 1:
+        return None
+    # пул форкается до открытия соединений, детям база не нужна
+    connections.close_all()
+    return multiprocessing.get_context('fork').Pool(workers)
+
+
+def hash_passwords(passwords, pool=None):
+    if pool is None:
+        return [hash_password(password) for password in passwords]
+    return pool.map(hash_password, passwords, chunksize=16)
+
+
+def import_users(records, workers=None, chunk_size=CHUNK_SIZE, log=None):
+    """
+    Создаёт пользователей пачками: хеши PBKDF2 считаются пулом процессов,
+    уникальность проверяется одним запросом на пачку, вставка - bulk_create.
+    Возвращает (создано, пропущено).
+    """
+    workers = workers or os.cpu_count()
+    created = skipped = 0
+    seen = {'usernames': set(), 'emails': set()}
+    pool = make_pool(workers)
+    try:
+        for chunk in chunks(records, chunk_size):
+            fresh = select_new(chunk, seen)
+            skipped += len(chunk) - len(fresh)
+            hashes = hash_passwords(
+                [record['password'] for record in fresh], pool
+            )
+            users = []
+            for record, password in zip(fresh, hashes):
+                record['password'] = password
+                users.append(User(**record))
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+            created += len(users)
+            if log is not None:
+                log(f'создано: {created}, пропущено: {skipped}')
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return created, skipped
+
+
+def measure_scaling(worker_counts, sample=200):
+    """Пользователей в секунду при хешировании sample паролей."""
+    passwords = [f'password-{number}' for number in range(sample)]
+    results = []
+    for workers in worker_counts:
+        pool = make_pool(workers)
+        try:
+            started = time.perf_counter()
+            hash_passwords(passwords, pool)
+            elapsed = time.perf_counter() - started
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        results.append((workers, sample / elapsed))
+    return results
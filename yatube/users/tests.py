@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from users.provisioning import import_users, select_new
+
+User = get_user_model()
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']
+)
+class ImportUsersTestClass(TestCase):
+
+    def setUp(self):
+        User.objects.create_user(username='taken', email='taken@example.com')
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_import_csv(self):
+        """Пользователи из CSV создаются с рабочими паролями"""
+        path = os.path.join(self.directory, 'users.csv')
+        with open(path, 'w', encoding='utf-8') as source:
+            source.write(
+                'username,email,password,first_name\n'
+                'anna,anna@example.com,secret-1,Анна\n'
+                'boris,,,\n'
+            )
+        call_command('import_users', path, workers=1, stdout=StringIO())
+        anna = User.objects.get(username='anna')
+        self.assertTrue(anna.check_password('secret-1'))
+        self.assertEqual(anna.first_name, 'Анна')
+        self.assertFalse(
+            User.objects.get(username='boris').has_usable_password()
+        )
+
+    def test_duplicates_are_skipped(self):
+        """Занятые username и email и повторы в файле пропускаются"""
+        records = [
+            {'username': 'taken', 'email': 'new@example.com'},
+            {'username': 'other', 'email': 'taken@example.com'},
+            {'username': 'fresh', 'email': 'fresh@example.com'},
+            {'username': 'fresh', 'email': 'again@example.com'},
+            {'username': '', 'email': 'nobody@example.com'},
+        ]
+        seen = {'usernames': set(), 'emails': set()}
+        with self.assertNumQueries(1):
+            fresh = select_new(records, seen)
+        self.assertEqual([record['username'] for record in fresh], ['fresh'])
+        created, skipped = import_users(records, workers=1, chunk_size=2)
+        self.assertEqual((created, skipped), (1, 4))
+
+    def test_invalid_rows_are_skipped(self):
+        """Недопустимые username, email и слишком длинные поля пропускаются"""
+        records = [
+            {'username': 'with space'},
+            {'username': 'x' * 151},
+            {'username': 'mail', 'email': 'not-an-email'},
+            {'username': 'long', 'first_name': 'И' * 31},
+            {'username': 'valid.user+1@', 'email': 'valid@example.com'},
+        ]
+        seen = {'usernames': set(), 'emails': set()}
+        fresh = select_new(records, seen)
+        self.assertEqual(
+            [record['username'] for record in fresh], ['valid.user+1@']
+        )
+        self.assertEqual(import_users(records, workers=1), (1, 4))
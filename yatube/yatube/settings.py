@@ -30,17 +30,22 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
     # 'debug_toolbar',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.PrerenderMiddleware',
+    'core.middleware.ServerTimingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'core.middleware.ReplicaMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     # 'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
@@ -54,7 +59,8 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backend.InstrumentedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -72,13 +78,68 @@ TEMPLATES = [
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
+# WAL, настроенные pragma и постоянные подключения для боевого SQLite
+SQLITE_PRODUCTION_PROFILE = os.getenv(
+    'SQLITE_PRODUCTION_PROFILE', default=''
+) == '1'
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': int(os.getenv(
+            'DB_CONN_MAX_AGE',
+            default='600' if SQLITE_PRODUCTION_PROFILE else '0',
+        )),
     }
 }
 
+# реплики только для чтения: пути к копиям SQLite через запятую
+DATABASE_REPLICAS = []
+for index, replica_name in enumerate(
+    filter(None, os.getenv('DB_REPLICA_NAMES', default='').split(',')), 1
+):
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'NAME': f'file:{replica_name}?mode=ro',
+        'READ_ONLY': True,
+        'PATH': replica_name,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{index}')
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+REPLICA_READ_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:follow_index',
+    'posts:post_detail',
+    'api:index',
+    'api:group_posts',
+    'api:profile',
+    'api:follow',
+    'api:post_detail',
+)
+REPLICA_STICKY_COOKIE = 'primary_pin'
+# как часто refresh_replicas --interval копирует базу в реплики
+REPLICA_REFRESH_SECONDS = float(
+    os.getenv('REPLICA_REFRESH_SECONDS', default='5')
+)
+# запись попадает в реплику не позже чем через интервал и время копирования,
+# закрепление за основной базой держится дольше с запасом
+REPLICA_STICKY_SECONDS = max(10, int(2 * REPLICA_REFRESH_SECONDS) + 1)
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -112,8 +173,15 @@ STATIC_URL = '/static/'
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
-#  подключаем движок filebased.EmailBackend
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# письма из представлений ложатся в очередь, отправляет их обработчик
+# run_workers через MAIL_SPOOL_BACKEND (по умолчанию filebased.EmailBackend)
+EMAIL_BACKEND = 'core.mail.SpoolEmailBackend'
+MAIL_SPOOL_BACKEND = os.getenv(
+    'MAIL_SPOOL_BACKEND',
+    default='django.core.mail.backends.filebased.EmailBackend',
+)
+MAIL_BATCH_SIZE = int(os.getenv('MAIL_BATCH_SIZE', default='50'))
+MAIL_MAX_ATTEMPTS = int(os.getenv('MAIL_MAX_ATTEMPTS', default='5'))
 
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
@@ -127,8 +195,113 @@ STATICFILES_DIRS = (
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# готовые версии Atom-лент: файл на версию, переживает перезапуск
+FEED_CACHE_DIR = os.getenv(
+    'FEED_CACHE_DIR', default=os.path.join(BASE_DIR, 'feeds')
+)
+# сколько последних постов попадает в ленту
+FEED_SIZE = int(os.getenv('FEED_SIZE', default='50'))
+
+# адрес сайта для ссылок в sitemap: команда работает вне запроса
+SITE_URL = os.getenv('SITE_URL', default='http://localhost:8000')
+# готовые sitemap.xml и куски sitemap-*.xml.gz, их может отдавать nginx
+SITEMAP_DIR = os.getenv(
+    'SITEMAP_DIR', default=os.path.join(BASE_DIR, 'sitemaps')
+)
+# диапазон id одного куска, не больше 50 000 адресов по протоколу
+SITEMAP_CHUNK_SIZE = int(os.getenv('SITEMAP_CHUNK_SIZE', default='50000'))
+
+# готовые анонимные страницы: быстрый путь в middleware и перестройка
+# изменившихся страниц обработчиками очереди
+PRERENDER_ENABLED = os.getenv('PRERENDER_ENABLED', default='') == '1'
+PRERENDER_DIR = os.getenv(
+    'PRERENDER_DIR', default=os.path.join(BASE_DIR, 'prerendered')
+)
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.InstrumentedLocMemCache',
     }
 }
+
+THUMBNAIL_BACKEND = 'core.thumbnail.InstrumentedThumbnailBackend'
+
+# доля запросов, для которых собирается Server-Timing и пишется строка
+# лога yatube.requests (0 - отключено, 1 - каждый запрос)
+SERVER_TIMING_SAMPLE_RATE = float(
+    os.getenv('SERVER_TIMING_SAMPLE_RATE', default='0.01')
+)
+
+# каталог для агрегации метрик между процессами (например, в /dev/shm)
+METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR', default='')
+
+METRICS_ALLOWED_IPS = INTERNAL_IPS
+
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+
+# профилировать каждый N-й запрос к представлению (0 - отключено)
+PROFILING_SAMPLE_EVERY = int(os.getenv('PROFILING_SAMPLE_EVERY', default='0'))
+
+# запросы дольше порога пишутся в журнал медленных запросов (0 - отключено)
+SLOW_QUERY_THRESHOLD_MS = float(
+    os.getenv('SLOW_QUERY_THRESHOLD_MS', default='100')
+)
+SLOW_QUERY_LOG_FILE = os.path.join(BASE_DIR, 'slow_queries.log')
+
+# поузловое профилирование шаблонов в Server-Timing (подменяет движок)
+TEMPLATE_PROFILING = os.getenv('TEMPLATE_PROFILING', default='') == '1'
+
+# запись комментариев, постов и подписок через поток-писатель процесса
+WRITE_QUEUE_ENABLED = os.getenv('WRITE_QUEUE_ENABLED', default='') == '1'
+WRITE_QUEUE_TIMEOUT = float(os.getenv('WRITE_QUEUE_TIMEOUT', default='5'))
+
+# очередь задач в базе: опрос таблицы, пауза перед повтором и её потолок,
+# через сколько секунд задача упавшего обработчика возвращается в очередь
+TASK_QUEUE_POLL_INTERVAL = float(
+    os.getenv('TASK_QUEUE_POLL_INTERVAL', default='1')
+)
+TASK_RETRY_BACKOFF = float(os.getenv('TASK_RETRY_BACKOFF', default='5'))
+TASK_RETRY_BACKOFF_MAX = float(
+    os.getenv('TASK_RETRY_BACKOFF_MAX', default='600')
+)
+TASK_LOCK_TIMEOUT = int(os.getenv('TASK_LOCK_TIMEOUT', default='900'))
+
+# сколько постов и пользователей вместе можно запросить в /api/v1/batch/
+API_BATCH_LIMIT = int(os.getenv('API_BATCH_LIMIT', default='100'))
+# время жизни записей постов и авторов в кэше пакетного запроса, секунды
+API_BATCH_CACHE_SECONDS = int(
+    os.getenv('API_BATCH_CACHE_SECONDS', default='300')
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG_FILE,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'encoding': 'utf-8',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'yatube': {
+            'handlers': ['console'],
+            'level': os.getenv('YATUBE_LOG_LEVEL', default='WARNING'),
+        },
+        # сводка по запросам пишется на INFO, уровень yatube её бы скрыл
+        'yatube.requests': {
+            'level': os.getenv('YATUBE_REQUEST_LOG_LEVEL', default='INFO'),
+        },
+        'yatube.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}